@@ -0,0 +1,486 @@
+import argparse
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from config import Config
+from indicators import Indicators
+from strategy import TurtleSoupStrategy
+from strategy_sr import SRStrategy
+from risk_manager import RiskManager
+from trade_manager import TradeManager
+from bar_store import BarStore
+from fvg_zones import FVGZones
+
+# Contract specs (same fields as mt5.symbol_info) used when none are given
+DEFAULT_SPECS = {
+    "XAUUSD": SimpleNamespace(point=0.01, trade_tick_value=1.0, trade_contract_size=100,
+                              volume_min=0.01, volume_max=100.0, volume_step=0.01),
+    "BTCUSD": SimpleNamespace(point=0.01, trade_tick_value=0.01, trade_contract_size=1,
+                              volume_min=0.01, volume_max=100.0, volume_step=0.01),
+}
+FX_SPEC = SimpleNamespace(point=0.00001, trade_tick_value=1.0, trade_contract_size=100000,
+                          volume_min=0.01, volume_max=100.0, volume_step=0.01)
+
+# Parameters each precomputed signal series depends on (the cache key of Backtest.prepare)
+HTF_SIGNAL_PARAMS = ('swing_period', 'sr_lookback', 'vol_len', 'box_width_atr')
+LTF_SIGNAL_PARAMS = ('fvg_length', 'fvg_mitigation')
+
+class BacktestParams:
+    """
+    Strategy and risk settings of a backtest run. Defaults are the live settings.
+    """
+    def __init__(self, **overrides):
+        self.swing_period = Config.SWING_PERIOD
+        self.fvg_length = Config.FVG_LENGTH
+        self.fvg_mitigation = Config.FVG_MITIGATION_LEVEL
+        self.mss_length = Config.MSS_LENGTH
+        self.sr_lookback = 20
+        self.vol_len = 2
+        self.box_width_atr = 1.0
+        self.trailing_enable = Config.TRAILING_ENABLE
+        self.trailing_activate_rr = Config.TRAILING_ACTIVATE_RR
+        self.trailing_dist_rr = Config.TRAILING_DIST_RR
+        self.trailing_min_step_rr = Config.TRAILING_MIN_STEP_RR
+        self.risk_percent = Config.RISK_PERCENT
+        self.daily_loss_limit = Config.DAILY_LOSS_LIMIT
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown backtest parameter: {name}")
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+def to_epoch(times):
+    """
+    Datetime column -> int64 epoch seconds.
+    """
+    return np.asarray(times).astype('datetime64[s]').astype(np.int64)
+
+def load_csv_bars(data_dir, symbol, timeframe):
+    """
+    Loads {data_dir}/{symbol}_{timeframe}.csv with the MT5 rates columns
+    (time as epoch seconds or a datetime string). Returns None if missing.
+    """
+    path = os.path.join(data_dir, f"{symbol}_{timeframe}.csv")
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path)
+    if np.issubdtype(df['time'].dtype, np.number):
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+    else:
+        df['time'] = pd.to_datetime(df['time'])
+    return df.sort_values('time').reset_index(drop=True)
+
+def htf_bias_series(df, params):
+    """
+    HTF bias after each bar closes: entry i equals
+    TurtleSoupStrategy(df[:i+1]).analyze_htf() (1 = BULLISH, -1 = BEARISH, 0 = None),
+    computed from a single pass over the full history.
+
+    Centered swings/pivots are only visible once their right-hand window has
+    closed, so each bar only uses what the live bot could have seen:
+    - a swing at k is known from bar k + swing_period on,
+    - rows up to i - sr_lookback have their final S/R levels, the last
+      sr_lookback rows carry the level active at row i - sr_lookback.
+    """
+    p = params.swing_period
+    lookback = params.sr_lookback
+    d = TurtleSoupStrategy(df.copy(), swing_period=p, sr_lookback=lookback, vol_len=params.vol_len,
+                           box_width_atr=params.box_width_atr).df
+    n = len(d)
+    high = d['high'].to_numpy()
+    low = d['low'].to_numpy()
+    close = d['close'].to_numpy()
+    width = d['atr'].to_numpy() * params.box_width_atr
+    bias = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return bias
+
+    # Index of the last confirmed swing at each bar (NaN if none yet)
+    confirmed = np.zeros(n, dtype=bool)
+    positions = np.arange(n, dtype=float)
+    last_high = np.full(n, np.nan)
+    last_low = np.full(n, np.nan)
+    if n > p:
+        confirmed[p:] = d['is_swing_high'].to_numpy()[:n-p]
+        last_high[p:] = SRStrategy.carry_forward(positions[:n-p], confirmed[p:])
+        confirmed[p:] = d['is_swing_low'].to_numpy()[:n-p]
+        last_low[p:] = SRStrategy.carry_forward(positions[:n-p], confirmed[p:])
+
+    setups = [
+        # (last swing index, price, breach above?, S/R level, break test, final break flags, bias)
+        (last_high, high, True, d['sr_support'].to_numpy(),
+         lambda c, level, w: c < level - w, d['broken_support'].to_numpy(), -1),
+        (last_low, low, False, d['sr_resistance'].to_numpy(),
+         lambda c, level, w: c > level + w, d['broken_resistance'].to_numpy(), 1),
+    ]
+    rows = np.arange(n)
+    final_end = rows - lookback
+    for last_swing, prices, above, levels, breaks, broken, direction in setups:
+        # Sweep bar of each bar's last confirmed swing (n if not swept yet)
+        has_swing = ~np.isnan(last_swing)
+        sweep = Indicators.first_breaches(prices, above)[np.where(has_swing, last_swing, 0).astype(np.int64)]
+        active = has_swing & (sweep <= rows) & (bias == 0)
+        sweep = np.minimum(sweep, n)
+
+        # Breakouts since the sweep on rows with final flags (up to i - lookback)
+        broken_count = np.concatenate([[0], np.cumsum(broken)])
+        hit = active & (final_end >= sweep) & (broken_count[np.clip(final_end + 1, 0, n)] - broken_count[sweep] > 0)
+
+        # ... and on the provisional tail, against the level active at i - lookback
+        level = np.where(final_end >= 0, levels[np.clip(final_end, 0, n - 1)], np.nan)
+        tail = np.maximum(np.maximum(sweep, final_end + 1), lookback)
+        for j in range(lookback):
+            r = rows - j
+            valid = active & (r >= tail) & (r >= 0)
+            r = np.clip(r, 0, n - 1)
+            with np.errstate(invalid='ignore'):
+                hit |= valid & breaks(close[r], level, width[r])
+        bias[hit] = direction
+    return bias
+
+def ltf_zone_series(df, params):
+    """
+    FVG zone check_ltf_entry would trade on each bar:
+    sell_top[i] = top of the bearish FVG matched for a BEARISH bias at bar i,
+    buy_bottom[i] = bottom of the bullish FVG matched for a BULLISH bias (NaN if none).
+    FVG flags never look ahead, so one FVGZones pass over the full history is exact.
+    """
+    d = Indicators.find_fvg(df.copy())
+    n = len(d)
+    sell_top = np.full(n, np.nan)
+    buy_bottom = np.full(n, np.nan)
+    zones = FVGZones(params.fvg_length, params.fvg_mitigation)
+    columns = [d[name].to_numpy() for name in ('high', 'low', 'bearish_fvg', 'bullish_fvg', 'fvg_top', 'fvg_bottom')]
+    for i, (high, low, bearish, bullish, top, bottom) in enumerate(zip(*columns)):
+        # Skip the lookups while a side has no live zone
+        if zones.bearish.live and not bearish: # No entry on the bar that creates the bearish FVG
+            zone = zones.bearish.first_containing(high)
+            if zone is not None:
+                sell_top[i] = zone.top
+        if zones.bullish.live:
+            zone = zones.bullish.first_containing(low)
+            if zone is not None:
+                buy_bottom[i] = zone.bottom
+        zones.close_bar(i, high, low, bearish, bullish, top, bottom)
+    return sell_top, buy_bottom
+
+class BacktestResult:
+    def __init__(self, ledger, equity, params, elapsed):
+        self.ledger = ledger
+        self.equity = equity
+        self.params = params
+        self.elapsed = elapsed
+
+    def summary(self):
+        ledger = self.ledger
+        equity = self.equity['equity'] if not self.equity.empty else pd.Series([0.0])
+        start = self.equity['balance'].iloc[0] if not self.equity.empty else 0.0
+        peak = equity.cummax()
+        drawdown = ((peak - equity) / peak).max() * 100 if len(equity) else 0.0
+        wins = ledger[ledger['profit'] > 0]['profit'].sum() if not ledger.empty else 0.0
+        losses = -ledger[ledger['profit'] < 0]['profit'].sum() if not ledger.empty else 0.0
+        return {
+            'trades': len(ledger),
+            'win_rate': (ledger['profit'] > 0).mean() * 100 if not ledger.empty else 0.0,
+            'net_profit': ledger['profit'].sum() if not ledger.empty else 0.0,
+            'profit_factor': wins / losses if losses > 0 else float('inf') if wins > 0 else 0.0,
+            'max_drawdown_pct': drawdown,
+            'final_equity': equity.iloc[-1] if len(equity) else start,
+            'elapsed_s': self.elapsed,
+        }
+
+class Backtest:
+    """
+    Replays stored bars through the live trading rules of main.py:
+    HTF confluence, RR / lot-cap tiers (RiskManager.confluence_tier), RiskManager
+    sizing, TradeManager trailing stops and the daily loss limit.
+
+    data: {symbol: {timeframe: rates DataFrame}} for Config.HTF_TIMEFRAMES and
+    Config.LTF_TIMEFRAMES. The smallest LTF of each symbol is its price feed and
+    sets the 'scan' clock, like the 60s main loop on M1.
+
+    Signals are precomputed once per (symbol, timeframe) over the whole history
+    (htf_bias_series / ltf_zone_series), then the clock replays them.
+    Simplifications: timeframes are evaluated when their bars close (the live bot
+    also sees the forming bar), and SL/TP inside one feed bar are resolved SL first.
+    """
+    def __init__(self, data, params=None, initial_balance=10000.0, specs=None, slippage_points=0, cache=None):
+        """
+        cache: optional dict shared between runs on the same data; signal series
+        are reused when the parameters they depend on are unchanged.
+        """
+        self.data = data
+        self.params = params or BacktestParams()
+        self.initial_balance = initial_balance
+        self.specs = specs or {}
+        self.slippage_points = slippage_points
+        self.cache = cache if cache is not None else {}
+
+    def signals(self, kind, symbol, tf, df):
+        names = HTF_SIGNAL_PARAMS if kind == 'htf' else LTF_SIGNAL_PARAMS
+        key = (kind, symbol, tf) + tuple(getattr(self.params, name) for name in names)
+        if key not in self.cache:
+            series = htf_bias_series if kind == 'htf' else ltf_zone_series
+            self.cache[key] = series(df, self.params)
+        return self.cache[key]
+
+    def spec(self, symbol):
+        return self.specs.get(symbol) or DEFAULT_SPECS.get(symbol) or FX_SPEC
+
+    def prepare(self):
+        """
+        Per-symbol signal series and price feed.
+        """
+        symbols = {}
+        for symbol, frames in self.data.items():
+            htf = []
+            for tf in Config.HTF_TIMEFRAMES:
+                df = frames.get(tf)
+                if df is not None and len(df):
+                    close_times = to_epoch(df['time']) + Config.TIMEFRAME_SECONDS[tf]
+                    htf.append((tf, close_times, self.signals('htf', symbol, tf, df)))
+            ltf = []
+            for tf in Config.LTF_TIMEFRAMES:
+                df = frames.get(tf)
+                if df is not None and len(df):
+                    close_times = to_epoch(df['time']) + Config.TIMEFRAME_SECONDS[tf]
+                    sell_top, buy_bottom = self.signals('ltf', symbol, tf, df)
+                    ltf.append((tf, close_times, df['close'].to_numpy(), sell_top, buy_bottom))
+            if not ltf:
+                continue
+            feed_tf = min((tf for tf, *_ in ltf), key=lambda tf: Config.TIMEFRAME_SECONDS[tf])
+            feed = frames[feed_tf]
+            spread = feed['spread'].to_numpy() if 'spread' in feed else np.zeros(len(feed))
+            symbols[symbol] = {
+                'htf': htf,
+                'ltf': ltf,
+                'feed_times': to_epoch(feed['time']) + Config.TIMEFRAME_SECONDS[feed_tf],
+                'open': feed['open'].to_numpy(),
+                'high': feed['high'].to_numpy(),
+                'low': feed['low'].to_numpy(),
+                'close': feed['close'].to_numpy(),
+                'spread': spread * self.spec(symbol).point,
+            }
+        return symbols
+
+    def run(self):
+        started = time.perf_counter()
+        params = self.params
+        symbols = self.prepare()
+        if not symbols:
+            return BacktestResult(pd.DataFrame(), pd.DataFrame(), params, 0.0)
+
+        clock = np.unique(np.concatenate([s['feed_times'] for s in symbols.values()]))
+        feed_pos = {symbol: 0 for symbol in symbols}
+        last_close = {}
+        last_spread = {}
+        positions = {symbol: [] for symbol in symbols}
+        ledger = []
+        equity_times = np.empty(len(clock), dtype=np.int64)
+        equity_balance = np.empty(len(clock))
+        equity_values = np.empty(len(clock))
+
+        balance = self.initial_balance
+        current_day = None
+        daily_start_balance = balance
+        paused_until = -1
+
+        for step, now in enumerate(clock):
+            # Bars of the price feeds that closed at this scan
+            updated = []
+            for symbol, s in symbols.items():
+                pos = feed_pos[symbol]
+                if pos < len(s['feed_times']) and s['feed_times'][pos] == now:
+                    feed_pos[symbol] = pos + 1
+                    last_close[symbol] = s['close'][pos]
+                    last_spread[symbol] = s['spread'][pos]
+                    updated.append(symbol)
+                    # Broker-side SL/TP hits during the bar
+                    balance += self._check_exits(symbol, positions[symbol], s, pos, now, ledger)
+
+            # 0. Manage Open Positions (Trailing Stop) - skipped while paused, like main.py's sleep
+            if params.trailing_enable and now >= paused_until:
+                for symbol in updated:
+                    self._trail(positions[symbol], last_close[symbol], last_spread[symbol])
+
+            equity = balance + sum(self._unrealized(symbol, p, last_close[symbol], last_spread[symbol])
+                                   for symbol, open_positions in positions.items() for p in open_positions)
+            equity_times[step] = now
+            equity_balance[step] = balance
+            equity_values[step] = equity
+
+            # 1. Daily Loss Limit Check
+            day = now // 86400
+            if day != current_day:
+                current_day = day
+                daily_start_balance = balance
+            if now < paused_until:
+                continue
+            daily_loss_percent = ((daily_start_balance - equity) / daily_start_balance) * 100 if daily_start_balance > 0 else 100.0
+            if daily_loss_percent >= params.daily_loss_limit:
+                paused_until = now + 3600
+                continue
+
+            for symbol in updated:
+                s = symbols[symbol]
+                # 3. Analyze Higher Timeframes (HTF) as of their last closed bar
+                biases = []
+                for tf, close_times, bias in s['htf']:
+                    i = int(np.searchsorted(close_times, now, side='right')) - 1
+                    if i >= 0 and bias[i] != 0:
+                        biases.append('BULLISH' if bias[i] > 0 else 'BEARISH')
+                htf_bias, confluence_score = TurtleSoupStrategy.combine_biases(biases)
+                if not htf_bias:
+                    continue
+
+                # 4. Execute on Lower Timeframes (LTF)
+                rr_ratio, max_lot_cap = RiskManager.confluence_tier(confluence_score)
+                for tf, close_times, closes, sell_top, buy_bottom in s['ltf']:
+                    i = int(np.searchsorted(close_times, now, side='left'))
+                    if i >= len(close_times) or close_times[i] != now:
+                        continue # No bar of this timeframe closed at this scan
+                    edge = sell_top[i] if htf_bias == 'BEARISH' else buy_bottom[i]
+                    if np.isnan(edge):
+                        continue
+                    signal = TurtleSoupStrategy.build_signal('SELL' if htf_bias == 'BEARISH' else 'BUY',
+                                                             edge, closes[i], rr_ratio)
+                    spec = self.spec(symbol)
+                    volume = RiskManager.size_from_spec(spec, abs(signal['sl'] - signal['entry']),
+                                                        params.risk_percent, balance, max_lot_cap)
+                    if volume is None:
+                        volume = 0.01 # Same fallback as RiskManager.calculate_lot_size
+                    if volume > 0:
+                        self._open(symbol, positions[symbol], signal, volume, tf, confluence_score,
+                                   now, last_spread[symbol], spec)
+                    break
+
+        # Close whatever is still open at the last price
+        for symbol, open_positions in positions.items():
+            for p in list(open_positions):
+                exit_price = last_close[symbol] + (last_spread[symbol] if not p['is_buy'] else 0.0)
+                balance += self._close(symbol, open_positions, p, exit_price, clock[-1], 'END', ledger)
+
+        equity = pd.DataFrame({
+            'time': pd.to_datetime(equity_times, unit='s'),
+            'balance': equity_balance,
+            'equity': equity_values,
+        })
+        ledger = pd.DataFrame(ledger, columns=['symbol', 'timeframe', 'type', 'score', 'volume',
+                                               'open_time', 'close_time', 'entry', 'exit', 'initial_sl',
+                                               'sl', 'tp', 'r_multiple', 'profit', 'reason'])
+        return BacktestResult(ledger, equity, params, time.perf_counter() - started)
+
+    def _open(self, symbol, open_positions, signal, volume, tf, score, now, spread, spec):
+        is_buy = signal['signal'] == 'BUY'
+        slippage = self.slippage_points * spec.point
+        # Bars are bid prices: buys fill at the ask
+        entry = signal['entry'] + spread + slippage if is_buy else signal['entry'] - slippage
+        open_positions.append({
+            'is_buy': is_buy, 'volume': volume, 'entry': entry, 'sl': signal['sl'], 'initial_sl': signal['sl'],
+            'initial_risk': abs(entry - signal['sl']), # Recorded at entry, like TradeManager
+            'tp': signal['tp'], 'comment': f"Turtle Soup {tf} Score:{score}", 'timeframe': tf,
+            'score': score, 'open_time': now,
+        })
+
+    def _check_exits(self, symbol, open_positions, s, pos, now, ledger):
+        profit = 0.0
+        high = s['high'][pos]
+        low = s['low'][pos]
+        open_ = s['open'][pos]
+        spread = s['spread'][pos]
+        for p in list(open_positions):
+            if p['is_buy']:
+                if p['sl'] > 0 and low <= p['sl']:
+                    profit += self._close(symbol, open_positions, p, min(open_, p['sl']), now, 'SL', ledger)
+                elif p['tp'] > 0 and high >= p['tp']:
+                    profit += self._close(symbol, open_positions, p, max(open_, p['tp']), now, 'TP', ledger)
+            else:
+                # Sells close at the ask
+                if p['sl'] > 0 and high + spread >= p['sl']:
+                    profit += self._close(symbol, open_positions, p, max(open_ + spread, p['sl']), now, 'SL', ledger)
+                elif p['tp'] > 0 and low + spread <= p['tp']:
+                    profit += self._close(symbol, open_positions, p, min(open_ + spread, p['tp']), now, 'TP', ledger)
+        return profit
+
+    def _trail(self, open_positions, close, spread):
+        for p in open_positions:
+            if p['sl'] == 0 or p['initial_risk'] <= 0:
+                continue
+            current_price = close if p['is_buy'] else close + spread
+            _, new_sl = TradeManager.trailing_stop(p['is_buy'], p['entry'], current_price, p['sl'], p['initial_risk'],
+                                                   self.params.trailing_activate_rr, self.params.trailing_dist_rr,
+                                                   self.params.trailing_min_step_rr)
+            if new_sl is not None:
+                p['sl'] = new_sl
+
+    def _unrealized(self, symbol, p, close, spread):
+        exit_price = close if p['is_buy'] else close + spread
+        return self._profit(symbol, p, exit_price)
+
+    def _profit(self, symbol, p, exit_price):
+        spec = self.spec(symbol)
+        move = exit_price - p['entry'] if p['is_buy'] else p['entry'] - exit_price
+        return move / spec.point * spec.trade_tick_value * p['volume']
+
+    def _close(self, symbol, open_positions, p, exit_price, now, reason, ledger):
+        open_positions.remove(p)
+        profit = self._profit(symbol, p, exit_price)
+        risk = abs(p['entry'] - p['initial_sl'])
+        move = exit_price - p['entry'] if p['is_buy'] else p['entry'] - exit_price
+        ledger.append({
+            'symbol': symbol, 'timeframe': p['timeframe'], 'type': 'BUY' if p['is_buy'] else 'SELL',
+            'score': p['score'], 'volume': p['volume'],
+            'open_time': pd.to_datetime(p['open_time'], unit='s'), 'close_time': pd.to_datetime(now, unit='s'),
+            'entry': p['entry'], 'exit': exit_price, 'initial_sl': p['initial_sl'], 'sl': p['sl'], 'tp': p['tp'],
+            'r_multiple': move / risk if risk > 0 else np.nan, 'profit': profit, 'reason': reason,
+        })
+        return profit
+
+def load_data(data_dir, symbols, store_dir=None):
+    """
+    {symbol: {timeframe: DataFrame}} from CSV files in data_dir, or from the
+    bar store in store_dir (memory-mapped, no parsing) when it is given.
+    """
+    store = BarStore(store_dir) if store_dir else None
+    data = {}
+    for symbol in symbols:
+        frames = {}
+        for tf in Config.HTF_TIMEFRAMES + Config.LTF_TIMEFRAMES:
+            if store is not None:
+                df = store.read(symbol, tf)
+                df = df if len(df) else None
+            else:
+                df = load_csv_bars(data_dir, symbol, tf)
+            if df is not None:
+                frames[tf] = df
+        if frames:
+            data[symbol] = frames
+        else:
+            print(f"No data for {symbol} in {store_dir or data_dir}")
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the Turtle Soup strategy on stored bars.")
+    parser.add_argument('--data-dir', default='data', help="Directory with {SYMBOL}_{TF}.csv files")
+    parser.add_argument('--store', default=None, help="Read bars from this bar store directory instead")
+    parser.add_argument('--symbols', nargs='+', default=Config.SYMBOLS)
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--out', default='backtest_output', help="Directory for ledger/equity CSVs")
+    args = parser.parse_args()
+
+    data = load_data(args.data_dir, args.symbols, args.store)
+    result = Backtest(data, initial_balance=args.balance).run()
+    for key, value in result.summary().items():
+        print(f"{key:>18}: {value:.2f}" if isinstance(value, float) else f"{key:>18}: {value}")
+
+    os.makedirs(args.out, exist_ok=True)
+    result.ledger.to_csv(os.path.join(args.out, 'ledger.csv'), index=False)
+    result.equity.to_csv(os.path.join(args.out, 'equity.csv'), index=False)
+    print(f"Ledger and equity curve written to {args.out}/")
+
+if __name__ == "__main__":
+    main()
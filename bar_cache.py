@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from bar_store import RATES_DTYPE
+from bar_columns import column_dtype, narrow
+
+class BarBuffer:
+    """
+    Column-wise bar history for one (symbol, timeframe).
+    New bars are written after the last one; once the arrays are full the
+    newest `keep` bars are moved back to the front, so appends are amortized
+    O(1) and the latest bars are always one contiguous slice.
+    Columns are kept in their compact dtypes (see bar_columns.column_dtype).
+    """
+    def __init__(self, keep):
+        self.keep = keep
+        self.capacity = 2 * keep
+        self.columns = {}
+        self.epoch = np.empty(0, dtype=np.int64) # bar open times as epoch seconds (view of the time column)
+        self.start = 0
+        self.end = 0
+        self.requested = 0 # largest num_bars served by a full fetch
+
+    def __len__(self):
+        return self.end - self.start
+
+    def last_time(self):
+        """
+        Open time (epoch seconds) of the last cached bar, i.e. the forming bar.
+        """
+        return int(self.epoch[self.end - 1])
+
+    def first_time(self):
+        """
+        Open time (epoch seconds) of the oldest cached bar.
+        """
+        return int(self.epoch[self.start])
+
+    def records(self, since):
+        """
+        Cached bars with open time >= since (epoch seconds) as an MT5 rates array.
+        """
+        first = self.start + int(np.searchsorted(self.epoch[self.start:self.end], since, side='left'))
+        rates = np.zeros(self.end - first, dtype=RATES_DTYPE)
+        rates['time'] = self.epoch[first:self.end]
+        for name in RATES_DTYPE.names[1:]:
+            if name in self.columns:
+                rates[name] = self.columns[name][first:self.end]
+        return rates
+
+    def replace(self, rates, requested):
+        """
+        Drops everything and stores a full download.
+        """
+        self.keep = max(self.keep, requested)
+        self.capacity = max(self.capacity, 2 * self.keep, len(rates))
+        self.columns = {}
+        for name in rates.dtype.names:
+            self.columns[name] = np.empty(self.capacity, dtype=column_dtype(name, rates.dtype[name]))
+        self.epoch = self.columns['time'].view(np.int64)
+        self.start = 0
+        self.end = 0
+        self.requested = requested
+        self.merge(rates)
+
+    def merge(self, rates):
+        """
+        Writes bars that start at or after the forming bar: the overlapping bar
+        is overwritten (it may have changed since the last fetch), the rest are appended.
+        """
+        if len(rates) == 0:
+            return
+        cached = self.epoch[self.start:self.end]
+        pos = self.start + int(np.searchsorted(cached, int(rates['time'][0]), side='left'))
+        if pos + len(rates) > self.capacity:
+            # Out of room: move the newest `keep` bars to the front of the arrays
+            retained = min(pos - self.start, self.keep, max(self.capacity - len(rates), 0))
+            for array in self.columns.values():
+                array[:retained] = array[pos - retained:pos]
+            self.start = 0
+            pos = retained
+            rates = rates[-(self.capacity - pos):]
+        end = pos + len(rates)
+        for name, array in self.columns.items():
+            array[pos:end] = narrow(rates[name], array.dtype)
+        self.end = end
+
+    def frame(self, num_bars):
+        """
+        DataFrame over the last num_bars cached bars. The columns are read-only
+        views of the cache: the frame is valid until the next fetch for this key.
+        """
+        first = max(self.start, self.end - num_bars)
+        data = {}
+        for name, array in self.columns.items():
+            view = array[first:self.end]
+            view.flags.writeable = False
+            data[name] = view
+        return pd.DataFrame(data, copy=False)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.columns.values())
+
+class BarCache:
+    """
+    Per-(symbol, timeframe) bar buffers plus fetch statistics.
+    """
+    def __init__(self):
+        self.buffers = {}
+        self.hits = 0           # served with a delta fetch
+        self.misses = 0         # needed a full download
+        self.bytes_fetched = 0  # size of the rate arrays received from the terminal
+
+    def get(self, symbol, timeframe, num_bars):
+        """
+        Returns the buffer if it can serve num_bars with a delta fetch, else None.
+        """
+        buffer = self.buffers.get((symbol, timeframe))
+        if buffer is None or len(buffer) == 0 or num_bars > buffer.requested:
+            return None
+        return buffer
+
+    def store_full(self, symbol, timeframe, rates, num_bars, fetched=True):
+        """
+        fetched=False for bars that came from disk rather than the terminal.
+        """
+        key = (symbol, timeframe)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = BarBuffer(num_bars)
+            self.buffers[key] = buffer
+        buffer.replace(rates, num_bars)
+        if fetched:
+            self.misses += 1
+            self.bytes_fetched += rates.nbytes
+        return buffer
+
+    def store_delta(self, buffer, rates):
+        buffer.merge(rates)
+        self.hits += 1
+        self.bytes_fetched += rates.nbytes
+        return buffer
+
+    def invalidate(self, symbol=None, timeframe=None):
+        for key in list(self.buffers):
+            if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                del self.buffers[key]
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'bytes_fetched': self.bytes_fetched,
+            'cached_bars': sum(len(b) for b in self.buffers.values()),
+            'cached_bytes': sum(b.nbytes for b in self.buffers.values()),
+        }
@@ -0,0 +1,92 @@
+import numpy as np
+from config import Config
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+VOLUME_COLUMNS = ('tick_volume', 'real_volume')
+
+def column_dtype(name, dtype):
+    """
+    Dtype a rates column is kept in: prices in Config.BAR_PRICE_DTYPE,
+    volumes in Config.BAR_VOLUME_DTYPE, bar times as datetime64[s] (whose
+    int64 view is the epoch time), anything else as delivered.
+    """
+    if name == 'time':
+        return np.dtype('datetime64[s]')
+    if name in PRICE_COLUMNS:
+        return np.dtype(Config.BAR_PRICE_DTYPE)
+    if name in VOLUME_COLUMNS:
+        return np.dtype(Config.BAR_VOLUME_DTYPE)
+    return np.dtype(dtype)
+
+def narrow(values, dtype):
+    """
+    values cast to dtype. Integers saturate at the limits of dtype instead of wrapping around.
+    """
+    values = np.asarray(values)
+    if dtype.kind in 'iu' and values.dtype != dtype:
+        info = np.iinfo(dtype)
+        values = np.clip(values, info.min, info.max)
+    return values.astype(dtype, copy=False)
+
+def rate_columns(rates):
+    """
+    Columns of an MT5 rates array (epoch seconds) in their compact dtypes.
+    """
+    return {name: narrow(rates[name], column_dtype(name, rates.dtype[name])) for name in rates.dtype.names}
+
+def price_dtype(values):
+    """
+    Float dtype for levels derived from prices stored as values (never narrower than float32).
+    """
+    return np.result_type(np.asarray(values).dtype, np.float32)
+
+class PackedFlags:
+    """
+    Named boolean columns stored as the bits of one unsigned integer column,
+    e.g. ten flags in two bytes per bar instead of ten.
+    aliases maps a flag name to another flag that always holds the same value.
+    """
+    def __init__(self, names, aliases=None):
+        self.aliases = dict(aliases or {})
+        owners = [name for name in names if name not in self.aliases]
+        for size in (8, 16, 32, 64):
+            if len(owners) <= size:
+                self.dtype = np.dtype(f'uint{size}')
+                break
+        else:
+            raise ValueError(f"{len(owners)} flags do not fit in 64 bits")
+        self.names = list(names)
+        self.bits = {name: self.dtype.type(1 << k) for k, name in enumerate(owners)}
+        for name, target in self.aliases.items():
+            self.bits[name] = self.bits[target]
+
+    def empty(self, capacity):
+        return np.zeros(capacity, dtype=self.dtype)
+
+    def get(self, words, name):
+        """
+        Flag of one word (bool) or of an array of words (bool array).
+        """
+        return (words & self.bits[name]) != 0
+
+    def put(self, words, index, name, values):
+        """
+        Sets the flag at words[index] (a position or a slice) to values.
+        """
+        bit = self.bits[name]
+        words[index] = np.where(values, words[index] | bit, words[index] & ~bit)
+
+    def pack(self, columns, capacity):
+        """
+        Words for a dict of bool arrays (name -> values), in an array of length capacity.
+        """
+        words = self.empty(capacity)
+        for name, bit in self.bits.items():
+            if name in self.aliases:
+                continue
+            values = np.asarray(columns[name], dtype=bool)
+            words[:len(values)] |= np.where(values, bit, self.dtype.type(0))
+        return words
+
+    def unpack(self, words):
+        return {name: self.get(words, name) for name in self.names}
@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+from config import Config
+
+# Record layout of MT5 rates arrays (copy_rates_*), one fixed-width record per bar
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+MAGIC = b'TSBARS01'
+HEADER_SIZE = 64 # magic + record size, padded so records start aligned
+
+class BarStore:
+    """
+    Closed bars on disk, one file per (symbol, timeframe):
+    a 64-byte header followed by RATES_DTYPE records in time order.
+
+    Files are only ever appended to (merge() rewrites a file to fill gaps),
+    and reads are memory-mapped, so slicing a time range is zero-copy.
+    """
+    def __init__(self, root=Config.BAR_STORE_DIR):
+        self.root = root
+        self.maps = {} # (symbol, timeframe) -> (file size, memmap)
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.bars")
+
+    def records(self, symbol, timeframe):
+        """
+        Read-only memmap of all stored bars, or None if nothing is stored.
+        A torn record at the end (interrupted write) is ignored.
+        """
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+        size = os.path.getsize(path)
+        cached = self.maps.get((symbol, timeframe))
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        count = (size - HEADER_SIZE) // RATES_DTYPE.itemsize
+        if count <= 0:
+            return None
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:8] != MAGIC or int.from_bytes(header[8:16], 'little') != RATES_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a bar store file")
+        records = np.memmap(path, dtype=RATES_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        self.maps[(symbol, timeframe)] = (size, records)
+        return records
+
+    def last_time(self, symbol, timeframe):
+        records = self.records(symbol, timeframe)
+        return int(records['time'][-1]) if records is not None else None
+
+    def slice(self, symbol, timeframe, start=None, end=None):
+        """
+        Records with start <= time < end (epoch seconds or datetimes), as a view.
+        """
+        records = self.records(symbol, timeframe)
+        if records is None:
+            return np.empty(0, dtype=RATES_DTYPE)
+        times = records['time']
+        first = 0 if start is None else int(np.searchsorted(times, self._epoch(start), side='left'))
+        last = len(records) if end is None else int(np.searchsorted(times, self._epoch(end), side='left'))
+        return records[first:last]
+
+    def tail(self, symbol, timeframe, count):
+        records = self.records(symbol, timeframe)
+        if records is None:
+            return np.empty(0, dtype=RATES_DTYPE)
+        return records[-count:]
+
+    def read(self, symbol, timeframe, start=None, end=None):
+        """
+        DataFrame in MarketData.get_rates layout. Price/volume columns are views
+        of the file; only the time column is converted.
+        """
+        records = self.slice(symbol, timeframe, start, end)
+        data = {}
+        for name in RATES_DTYPE.names:
+            data[name] = pd.to_datetime(records['time'], unit='s') if name == 'time' else records[name]
+        return pd.DataFrame(data, copy=False)
+
+    def append(self, symbol, timeframe, rates):
+        """
+        Appends the closed bars of `rates` that are newer than the last stored bar.
+        Returns the number of bars written.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+        rates = self._as_records(rates)
+        last = self.last_time(symbol, timeframe)
+        if last is not None:
+            rates = rates[rates['time'] > last]
+            if len(rates) == 0:
+                return 0
+        path = self.path(symbol, timeframe)
+        os.makedirs(self.root, exist_ok=True)
+        self.maps.pop((symbol, timeframe), None)
+        with open(path, 'ab') as f:
+            end = f.tell()
+            if end < HEADER_SIZE:
+                f.truncate(0)
+                f.write(self._header())
+            else:
+                # Drop a torn record left by an interrupted write
+                f.truncate(HEADER_SIZE + (end - HEADER_SIZE) // RATES_DTYPE.itemsize * RATES_DTYPE.itemsize)
+            f.write(rates.tobytes())
+        return len(rates)
+
+    def merge(self, symbol, timeframe, rates):
+        """
+        Inserts bars anywhere in the history (e.g. to fill a gap) by rewriting
+        the file. Stored bars win over `rates` for the same time. Returns bars added.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+        rates = self._as_records(rates)
+        stored = self.records(symbol, timeframe)
+        before = 0 if stored is None else len(stored)
+        combined = rates if stored is None else np.concatenate([np.asarray(stored), rates])
+        # np.unique keeps the first occurrence, i.e. the stored bar
+        _, first = np.unique(combined['time'], return_index=True)
+        combined = combined[first]
+        if len(combined) == before:
+            return 0
+        path = self.path(symbol, timeframe)
+        os.makedirs(self.root, exist_ok=True)
+        self.maps.pop((symbol, timeframe), None)
+        stored = None # release the map before the file is replaced
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._header())
+            f.write(combined.tobytes())
+        os.replace(tmp_path, path)
+        return len(combined) - before
+
+    def gaps(self, symbol, timeframe, min_missing=1):
+        """
+        (last bar before, first bar after) epoch pairs wherever at least
+        min_missing bars are missing. Market closures (weekends, holidays)
+        show up here too; raise min_missing to skip them.
+        """
+        records = self.records(symbol, timeframe)
+        if records is None or len(records) < 2:
+            return []
+        times = np.asarray(records['time'])
+        step = Config.TIMEFRAME_SECONDS[timeframe]
+        missing = np.diff(times) // step - 1
+        at = np.flatnonzero(missing >= min_missing)
+        return [(int(times[i]), int(times[i + 1])) for i in at]
+
+    @staticmethod
+    def _as_records(rates):
+        if rates.dtype == RATES_DTYPE:
+            return np.ascontiguousarray(rates)
+        records = np.empty(len(rates), dtype=RATES_DTYPE)
+        for name in RATES_DTYPE.names:
+            records[name] = rates[name]
+        return records
+
+    @staticmethod
+    def _header():
+        return MAGIC + RATES_DTYPE.itemsize.to_bytes(8, 'little') + bytes(HEADER_SIZE - 16)
+
+    @staticmethod
+    def _epoch(value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return int(pd.Timestamp(value).timestamp())
@@ -0,0 +1,407 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import broker
+from config import Config
+from bar_store import RATES_DTYPE
+from indicators import Indicators
+from strategy import TurtleSoupStrategy
+from strategy_sr import SRStrategy
+from incremental import IncrementalIndicators
+from kernels import rolling_extrema, carry_forward, first_breaches
+from panel import Panel
+from verify_logic import create_random_data, identify_mss_swings_loop, find_fvg_loop, sr_levels_loop, analyze_htf_loop, ltf_entry_loop
+
+SIZES = [500, 5000, 100000]
+SUITE_SIZES = [500, 5000, 100000, 1000000]
+KINDS = ['trending', 'ranging', 'gappy']
+BASELINE_PATH = "data/benchmark_baseline.json" # Timings are machine specific, keep them out of the repo
+
+def time_call(func, df, repeat=3):
+    """
+    Best-of-N wall time (seconds) for func(df) on a fresh copy of df.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        func(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# ---------------------------------------------------------------- generators
+
+def generate_bars(n, kind='trending', seed=0, timeframe='M1', start='2023-01-02'):
+    """
+    Synthetic OHLCV frame shaped like MarketData.get_rates output, reproducible per seed:
+    - trending: geometric random walk with drift regimes of a few thousand bars,
+    - ranging: mean-reverting noise around slow cycles,
+    - gappy: trending bars without weekends, with random missing bars and price gaps across them.
+    """
+    rng = np.random.default_rng(seed)
+    step = Config.TIMEFRAME_SECONDS[timeframe]
+    total = n if kind != 'gappy' else int(n * 1.5) + 100
+    times = pd.Timestamp(start).to_datetime64().astype('datetime64[s]') + np.arange(total) * np.timedelta64(step, 's')
+
+    if kind == 'ranging':
+        t = np.arange(total)
+        # AR(1)-like noise from an exponential kernel, bounded around slow cycles
+        noise = np.convolve(rng.normal(0, 0.0004, total), 0.97 ** np.arange(200))[:total]
+        close = 1.1 + 0.004 * np.sin(2 * np.pi * t / 1440) + 0.002 * np.sin(2 * np.pi * t / 97) + noise
+    else:
+        # Geometric walk, stays positive over a million bars
+        regimes = rng.choice([-1.0, 0.0, 1.0], size=total // 2000 + 1)
+        drift = np.repeat(regimes, 2000)[:total] * 0.00003
+        close = 1.1 * np.exp(np.cumsum(drift + rng.normal(0, 0.0005, total)))
+
+    jumps = np.zeros(total)
+    if kind == 'gappy':
+        days = times.astype('datetime64[D]').astype(np.int64)
+        keep = ((days + 4) % 7 < 5) & (rng.random(total) > 0.02) # Weekends off, 2% of bars missing
+        keep_pos = np.flatnonzero(keep)[:n]
+        gap = np.diff(keep_pos, prepend=keep_pos[0]) > 1
+        close = close[keep_pos]
+        times = times[keep_pos]
+        jumps = np.where(gap, rng.normal(0, 0.003, len(keep_pos)), 0.0)
+        close = close * np.exp(np.cumsum(jumps))
+        jumps = close * (1 - np.exp(-jumps)) # In price units
+    close = close[:n]
+    times = times[:n]
+    jumps = jumps[:n]
+
+    open_ = np.concatenate([close[:1], close[:-1]])
+    # A gap bar opens at the new level: most of the jump is outside the bar
+    open_ = open_ + 0.8 * jumps
+    wick_up = close * np.abs(rng.normal(0, 0.0005, n))
+    wick_down = close * np.abs(rng.normal(0, 0.0005, n))
+    return pd.DataFrame({
+        'time': times.astype('datetime64[ns]'),
+        'open': open_,
+        'high': np.maximum(open_, close) + wick_up,
+        'low': np.minimum(open_, close) - wick_down,
+        'close': close,
+        'tick_volume': rng.integers(50, 500, n).astype(np.uint64),
+        'spread': rng.integers(1, 20, n).astype(np.int32),
+        'real_volume': np.zeros(n, dtype=np.uint64),
+    })
+
+def resample_bars(df, timeframe):
+    """
+    Aggregates a frame into `timeframe` bars aligned like MT5 bars.
+    """
+    rule = f"{Config.TIMEFRAME_SECONDS[timeframe]}s"
+    bars = df.set_index('time').resample(rule, origin='epoch', label='left', closed='left').agg({
+        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+        'tick_volume': 'sum', 'spread': 'last', 'real_volume': 'sum'})
+    return bars.dropna(subset=['open']).reset_index()
+
+def to_rates(df):
+    """
+    MT5 rates array (RATES_DTYPE) of a frame.
+    """
+    rates = np.zeros(len(df), dtype=RATES_DTYPE)
+    rates['time'] = df['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    for name in RATES_DTYPE.names[1:]:
+        rates[name] = df[name].to_numpy()
+    return rates
+
+# ---------------------------------------------------------------- suite
+
+def measure(run, make_input, repeat):
+    """
+    (best wall time of run(make_input()) over repeat runs, peak traced allocation in MB).
+    Building the input is not timed; memory is traced on a separate run.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - start)
+    data = make_input()
+    tracemalloc.start()
+    try:
+        run(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2 ** 20
+
+def suite_cases(df):
+    """
+    (name, run, make_input) of every timed function for one frame.
+    """
+    processed = TurtleSoupStrategy(df.copy()).df
+    stream = IncrementalIndicators.from_frame(df)
+    live = stream.frame()
+    return [
+        # Swing and S/R pivot windows of the high series in one call
+        ('rolling_extrema', lambda high: rolling_extrema(high, [2 * Config.SWING_PERIOD + 1, 41], center=True),
+         lambda: df['high'].to_numpy()),
+        # Stateful loops (compiled when numba is installed): sweep search and S/R level carry-forward
+        ('first_breaches', lambda high: first_breaches(high, above=True), lambda: df['high'].to_numpy()),
+        ('carry_forward', lambda low: carry_forward(low, processed['is_pivot_low'].to_numpy()),
+         lambda: df['low'].to_numpy()),
+        ('identify_swings', Indicators.identify_swings, df.copy),
+        ('identify_mss_swings', Indicators.identify_mss_swings, df.copy),
+        ('find_fvg', Indicators.find_fvg, df.copy),
+        ('SRStrategy', SRStrategy, df.copy),
+        ('TurtleSoupStrategy', TurtleSoupStrategy, df.copy),
+        ('analyze_htf', lambda strategy: strategy.analyze_htf(),
+         lambda: TurtleSoupStrategy(processed, processed=True)),
+        # Live path: zones kept by the indicator stream, one check on the forming bar
+        ('check_ltf_entry', lambda strategy: (strategy.check_ltf_entry('BEARISH'), strategy.check_ltf_entry('BULLISH')),
+         lambda: TurtleSoupStrategy(live, processed=True, fvg_zones=stream.fvg_zones)),
+    ]
+
+def run_suite(sizes, kinds, repeat, seed):
+    results = {}
+    for kind in kinds:
+        for n in sizes:
+            df = generate_bars(n, kind, seed=seed)
+            for name, run, make_input in suite_cases(df):
+                seconds, peak_mb = measure(run, make_input, repeat if n <= 100000 else 1)
+                results[f"{name}/{kind}/{n}"] = {'seconds': seconds, 'bars_per_sec': n / seconds, 'peak_mb': peak_mb}
+                report_line(f"{name}/{kind}/{n}", results[f"{name}/{kind}/{n}"])
+    return results
+
+def run_cycle(n_symbols, scans, seed, history=130000):
+    """
+    Scans over n_symbols synthetic symbols on a SimulatedBroker: the first
+    (cold) scan seeds every cache and indicator stream, the warm scans follow
+    one base bar apart like the live bot.
+    """
+    from simulator import SimulatedBroker
+    from market_data import MarketData
+    from scanner import Scanner
+
+    timeframes = Config.HTF_TIMEFRAMES + Config.LTF_TIMEFRAMES
+    bars = {}
+    for k in range(n_symbols):
+        base = generate_bars(history, 'trending', seed=seed + k)
+        bars[f"SYN{k}"] = {tf: to_rates(resample_bars(base, tf)) for tf in timeframes}
+    sim = SimulatedBroker(bars)
+
+    saved = {name: getattr(Config, name) for name in ('SYMBOLS', 'BAR_STORE_ENABLE', 'JOURNAL_ENABLE')}
+    previous = broker.set_backend(sim)
+    Config.SYMBOLS = list(bars)
+    Config.BAR_STORE_ENABLE = False
+    Config.JOURNAL_ENABLE = False
+    try:
+        md = MarketData()
+        scanner = Scanner(md, SimpleNamespace(is_news_impact=lambda symbol: False))
+        bar_seconds = min(Config.TIMEFRAME_SECONDS[tf] for tf in Config.LTF_TIMEFRAMES)
+
+        def scan():
+            start = time.perf_counter()
+            scanner.scan(10000.0)
+            return time.perf_counter() - start
+
+        cold = scan()
+        warm = []
+        for _ in range(scans):
+            sim.sleep(bar_seconds)
+            warm.append(scan())
+        tracemalloc.start()
+        try:
+            for _ in range(min(scans, 5)):
+                sim.sleep(bar_seconds)
+                scan()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Bars and indicator state held between scans
+        state = md.bar_cache.stats()['cached_bytes'] + \
+            sum(stream.nbytes for stream in scanner.analyzer.indicator_streams.values())
+        scanner.shutdown()
+    finally:
+        broker.set_backend(previous)
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+    # Bars covered by one scan: 500 per (symbol, timeframe)
+    bars_per_scan = n_symbols * len(timeframes) * 500
+    warm_seconds = float(np.median(warm)) if warm else cold
+    results = {
+        f"scan_cold/{n_symbols}": {'seconds': cold, 'bars_per_sec': bars_per_scan / cold, 'peak_mb': None},
+        f"scan_warm/{n_symbols}": {'seconds': warm_seconds, 'bars_per_sec': bars_per_scan / warm_seconds,
+                                   'peak_mb': peak / 2 ** 20},
+    }
+    for key, result in results.items():
+        report_line(key, result)
+    print(f"{'state/' + str(n_symbols):<36} | {state / (n_symbols * len(timeframes)) / 1024:>8.1f} KB per (symbol, timeframe)")
+    return results
+
+def run_panel(symbol_counts, repeat, seed, bars=500):
+    """
+    HTF bias and LTF entry of the last bar for many symbols at once: one
+    TurtleSoupStrategy per symbol against one Panel over all of them.
+    """
+    results = {}
+    for n_symbols in symbol_counts:
+        frames = {f"SYN{k}": generate_bars(bars, KINDS[k % len(KINDS)], seed=seed + k) for k in range(n_symbols)}
+
+        def per_symbol(frames):
+            for df in frames.values():
+                strategy = TurtleSoupStrategy(df.copy())
+                strategy.analyze_htf(), strategy.breakout_levels()
+                strategy.check_ltf_entry('BEARISH'), strategy.check_ltf_entry('BULLISH')
+
+        def panel(frames):
+            panel = Panel(frames)
+            panel.htf_biases()
+            for bias in ('BEARISH', 'BULLISH'):
+                panel.ltf_signals(dict.fromkeys(frames, bias))
+
+        for name, run in (('per_symbol', per_symbol), ('panel', panel)):
+            seconds, peak_mb = measure(run, lambda: frames, repeat)
+            key = f"{name}/{n_symbols}"
+            results[key] = {'seconds': seconds, 'bars_per_sec': n_symbols * bars / seconds, 'peak_mb': peak_mb}
+            report_line(key, results[key])
+    return results
+
+# ---------------------------------------------------------------- reporting
+
+def report_line(key, result, baseline=None, tolerance=0.25):
+    peak = f"{result['peak_mb']:>9.1f}" if result['peak_mb'] is not None else f"{'-':>9}"
+    line = f"{key:<36} | {result['seconds']*1000:>11.3f} | {result['bars_per_sec']:>13,.0f} | {peak}"
+    if baseline is not None:
+        line += f" | {result['seconds'] / baseline['seconds']:>6.2f}x"
+        line += "  REGRESSION" if is_regression(result, baseline, tolerance) else ""
+    print(line, flush=True)
+
+def is_regression(result, baseline, tolerance):
+    # Small absolute differences are noise
+    slower = result['seconds'] > baseline['seconds'] * (1 + tolerance) and result['seconds'] - baseline['seconds'] > 0.0005
+    bigger = result['peak_mb'] is not None and baseline.get('peak_mb') is not None \
+        and result['peak_mb'] > baseline['peak_mb'] * (1 + tolerance) and result['peak_mb'] - baseline['peak_mb'] > 1.0
+    return slower or bigger
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+def compare(results, path, tolerance):
+    """
+    Prints every result against the stored baseline. Returns the regressed keys.
+    """
+    with open(path) as f:
+        stored = json.load(f)
+    if stored.get('environment') != environment():
+        print(f"Note: baseline was recorded on {stored.get('environment')}")
+    print(f"\nAgainst {path} (tolerance {tolerance:.0%}):")
+    header()
+    regressions = []
+    for key, result in results.items():
+        baseline = stored['results'].get(key)
+        report_line(key, result, baseline, tolerance)
+        if baseline is not None and is_regression(result, baseline, tolerance):
+            regressions.append(key)
+    return regressions
+
+def header():
+    print(f"{'Case':<36} | {'Best (ms)':>11} | {'Bars/s':>13} | {'Peak (MB)':>9}")
+    print("-" * 80)
+
+# ---------------------------------------------------------------- loop vs vectorized
+
+def bench_indicators():
+    print(f"{'Bars':>8} | {'Function':<20} | {'Loop (ms)':>10} | {'Vectorized (ms)':>15} | {'Speedup':>8}")
+    print("-" * 74)
+    for n in SIZES:
+        df = create_random_data(n)
+        cases = [
+            ('identify_mss_swings', identify_mss_swings_loop, Indicators.identify_mss_swings),
+            ('find_fvg', find_fvg_loop, Indicators.find_fvg),
+        ]
+        for name, loop_func, vec_func in cases:
+            # The loop versions take seconds on large frames, one run is enough
+            loop_time = time_call(loop_func, df, repeat=1 if n > 10000 else 3)
+            vec_time = time_call(vec_func, df)
+            print(f"{n:>8} | {name:<20} | {loop_time*1000:>10.2f} | {vec_time*1000:>15.3f} | {loop_time/vec_time:>7.0f}x")
+
+def bench_sr():
+    print(f"{'Bars':>8} | {'Function':<20} | {'Loop (ms)':>10} | {'Vectorized (ms)':>15} | {'Speedup':>8}")
+    print("-" * 74)
+    for n in SIZES:
+        df = create_random_data(n)
+        # The loop reference runs on top of a processed frame, so subtract the
+        # shared (already vectorized) pivot/volume/ATR work from its timing.
+        vec_time = time_call(SRStrategy, df)
+        loop_time = time_call(lambda frame: sr_levels_loop(SRStrategy(frame)), df,
+                              repeat=1 if n > 10000 else 3) - vec_time
+        print(f"{n:>8} | {'SRStrategy':<20} | {loop_time*1000:>10.2f} | {vec_time*1000:>15.3f} | {loop_time/vec_time:>7.0f}x")
+
+def bench_htf():
+    print(f"{'Bars':>8} | {'Function':<20} | {'Loop (ms)':>10} | {'Indexed (ms)':>15} | {'Speedup':>8}")
+    print("-" * 74)
+    for n in SIZES:
+        strategy = TurtleSoupStrategy(create_random_data(n))
+        # Only the HTF decision on an already processed frame is timed
+        loop_time = time_call(analyze_htf_loop, strategy.df, repeat=1 if n > 10000 else 3)
+        vec_time = time_call(lambda frame: strategy.analyze_htf(), strategy.df)
+        print(f"{n:>8} | {'analyze_htf':<20} | {loop_time*1000:>10.2f} | {vec_time*1000:>15.3f} | {loop_time/vec_time:>7.0f}x")
+
+def bench_ltf():
+    print(f"{'Bars':>8} | {'Function':<20} | {'Loop (ms)':>10} | {'Indexed (ms)':>15} | {'Speedup':>8}")
+    print("-" * 74)
+    for n in SIZES:
+        df = create_random_data(n, decimals=4)
+        # Live path: zones maintained by the indicator stream, one check on the forming bar
+        stream = IncrementalIndicators.from_frame(df)
+        strategy = TurtleSoupStrategy(stream.frame(), processed=True, fvg_zones=stream.fvg_zones)
+        loop_time = min(time_call(lambda frame: ltf_entry_loop(strategy.df, bias, -1), strategy.df)
+                        for bias in ('BEARISH', 'BULLISH'))
+        vec_time = min(time_call(lambda frame: strategy.check_ltf_entry(bias), strategy.df)
+                       for bias in ('BEARISH', 'BULLISH'))
+        print(f"{n:>8} | {'check_ltf_entry':<20} | {loop_time*1000:>10.2f} | {vec_time*1000:>15.3f} | {loop_time/vec_time:>7.0f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Indicator, strategy and scan cycle benchmarks.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SUITE_SIZES, help="Bars per synthetic frame")
+    parser.add_argument('--kinds', nargs='+', default=KINDS, choices=KINDS)
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per case (best is kept; 1 above 100k bars)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--symbols', type=int, default=len(Config.SYMBOLS), help="Symbols in the scan cycle (0 = skip)")
+    parser.add_argument('--scans', type=int, default=20, help="Warm scans in the scan cycle")
+    parser.add_argument('--panel-symbols', type=int, nargs='*', default=[5, 50],
+                        help="Symbol counts of the per-symbol vs panel comparison")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Slowdown (fraction) reported as a regression")
+    parser.add_argument('--compare-loops', action='store_true', help="Also time the loop reference implementations")
+    args = parser.parse_args()
+
+    if args.compare_loops:
+        for bench in (bench_indicators, bench_sr, bench_htf, bench_ltf):
+            bench()
+            print()
+
+    header()
+    results = run_suite(args.sizes, args.kinds, args.repeat, args.seed)
+    results.update(run_panel(args.panel_symbols, args.repeat, args.seed))
+    if args.symbols > 0:
+        results.update(run_cycle(args.symbols, args.scans, args.seed))
+
+    if args.save_baseline:
+        if os.path.dirname(args.baseline):
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': environment(), 'time': time.time(), 'results': results}, f, indent=1)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
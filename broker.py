@@ -0,0 +1,68 @@
+import time
+import importlib
+from datetime import datetime
+
+EPOCH = datetime(1970, 1, 1)
+
+class MT5Backend:
+    """
+    The MetaTrader5 package, imported on first use so the bot's modules can be
+    imported (and run against other backends) where MT5 is not installed.
+    """
+    def __init__(self):
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = importlib.import_module('MetaTrader5')
+        return getattr(self._module, name)
+
+class BrokerProxy:
+    """
+    Stand-in for the MetaTrader5 module: every attribute is looked up on the
+    current backend, so `from broker import mt5` works like `import MetaTrader5 as mt5`.
+
+    A backend provides the MT5 calls the bot uses (initialize, shutdown, last_error,
+    terminal_info, account_info, symbols_get, symbol_select, symbol_info,
+    symbol_info_tick, copy_rates_from_pos, copy_rates_range, positions_get,
+    order_send) and the TIMEFRAME_* / ORDER_* / TRADE_* constants.
+    Backends with their own clock also provide now() and sleep().
+    """
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+mt5 = BrokerProxy(MT5Backend())
+
+def set_backend(backend):
+    """
+    Routes all broker calls to `backend`; returns the previous one.
+    """
+    previous = mt5._backend
+    mt5._backend = backend
+    return previous
+
+def get_backend():
+    return mt5._backend
+
+def now():
+    """
+    Current time of the backend (local wall clock for the live terminal).
+    """
+    backend = mt5._backend
+    return backend.now() if not isinstance(backend, MT5Backend) and hasattr(backend, 'now') else datetime.now()
+
+def timestamp():
+    """
+    now() as epoch seconds.
+    """
+    return (now() - EPOCH).total_seconds()
+
+def sleep(seconds):
+    backend = mt5._backend
+    if not isinstance(backend, MT5Backend) and hasattr(backend, 'sleep'):
+        backend.sleep(seconds)
+    else:
+        time.sleep(seconds)
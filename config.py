@@ -20,6 +20,8 @@ class Config:
     HTF_TIMEFRAMES = ["H4", "H2", "H1"]
     # Execution (Lower Timeframes)
     LTF_TIMEFRAMES = ["M15", "M5", "M1"]
+    # Bar length of each timeframe in seconds
+    TIMEFRAME_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "H1": 3600, "H2": 7200, "H4": 14400, "D1": 86400}
     
     VOLUME = 0.01      # Lot size (deprecated, now calculated dynamically)
     RISK_PERCENT = 3.0 # Maximum risk per trade (% of account balance)
@@ -29,6 +31,8 @@ class Config:
     TRAILING_ENABLE = True
     TRAILING_ACTIVATE_RR = 3.5 # Activate when price reaches 3.5R profit
     TRAILING_DIST_RR = 2.0     # Trail behind price by 2.0R (Looser trail)
+    TRAILING_MIN_STEP_RR = 0.1 # Only move the SL by at least 0.1R
+    TRAILING_MIN_INTERVAL = 5  # Seconds between SL updates of one position
     
     # News Filter Settings
     # Disabled by default as MT5 API lacks native calendar support. 
@@ -37,10 +41,56 @@ class Config:
     NEWS_PAUSE_MINS_BEFORE = 30
     NEWS_PAUSE_MINS_AFTER = 30
     
+    # Market Data Settings
+    BAR_CACHE_ENABLE = True # Keep rates per symbol/timeframe and only fetch new bars
+    BAR_STORE_ENABLE = True # Persist closed bars to disk and load them on start-up
+    BAR_STORE_DIR = "data/bars"
+    RESAMPLE_ENABLE = True  # Keep higher timeframes current from one base (M1) delta fetch per symbol and scan
+    RESAMPLE_BASE = "M1"
+    RESAMPLE_REFRESH = 1.0  # Seconds one base fetch serves every timeframe of the symbol
+    RESAMPLE_OFFSETS = {}   # symbol -> seconds its bar grid is shifted from server midnight (sessions opening off the grid)
+    BAR_PRICE_DTYPE = "float64" # 'float32' halves the memory of prices and indicator levels (~7 significant digits)
+    BAR_VOLUME_DTYPE = "uint32" # Tick/real volumes (saturate instead of wrapping around)
+    
+    # Trade Journal
+    JOURNAL_ENABLE = True # Record orders, fills and SL changes
+    JOURNAL_PATH = "data/journal.sqlite3"
+
+    # Metrics
+    METRICS_ENABLE = False    # Time each stage of the scan cycle (rates, indicators, analysis, sizing, orders)
+    METRICS_INTERVAL = 300    # Seconds between stage timing summaries
+    METRICS_PATH = "data/metrics.json" # Stage timings per symbol/timeframe, rewritten with each summary
+    METRICS_PORT = 0          # Serve the stage timings as JSON on 127.0.0.1:PORT (0 = off)
+    PROFILE_MODE = None       # None, 'cprofile' (deterministic, per task thread) or 'sampling' (stack samples)
+    PROFILE_SAMPLE_INTERVAL = 0.005 # Seconds between stack samples in 'sampling' mode
+    PROFILE_PATH = "data/profile"   # .pstats ('cprofile') or .folded ('sampling') is appended
+
+    # Symbol Registry
+    SYMBOL_SPEC_TTL = 300      # Seconds a contract spec (point, tick value, volume limits) is reused
+    SYMBOL_RETRY_SECONDS = 300 # Seconds before a symbol the broker doesn't have is looked up again
+    TICK_CACHE_TTL = 0.1       # Seconds a quote is reused (below TICK_POLL_INTERVAL)
+
+    # Scan Settings
+    SCAN_WORKERS = 5   # Symbols scanned concurrently (1 = sequential scan)
+    SCAN_PROCESSES = 0 # Worker processes for indicator work (0 = compute in the scan threads)
+    JIT_ENABLE = True  # Compile the stateful indicator loops with numba when it is installed (see kernels.py)
+    SCAN_PANEL = False # Analyse all symbols of a timeframe at once on a symbol x bar matrix (see panel.py)
+    TICK_MODE_ENABLE = False  # Between scans, watch the quotes of symbols with an HTF bias and enter on FVG touch
+    TICK_POLL_INTERVAL = 0.25 # Seconds between quote polls of the armed symbols
+    
+    # Task Cadences (seconds)
+    TRAILING_INTERVAL = 1         # Trailing stop updates
+    ACCOUNT_INTERVAL = 10         # Balance / daily loss limit checks
+    NEWS_REFRESH_INTERVAL = 3600  # News calendar refresh
+    SCAN_DELAY = 2                # Scan this long after each LTF bar close
+    
     DEVIATION = 20     # Slippage in points
     MAGIC_NUMBER = 123456
 
     # Strategy Settings
     SWING_PERIOD = 50
+    SWING_CONFIRMATION = 'forming' # 'forming': a swing may be confirmed by the forming bar, 'close': only once its window closed (Pine timing, like the backtest)
+    PIVOT_HISTORY = 20             # Confirmed swings kept per side
     FVG_LENGTH = 120
+    FVG_MITIGATION_LEVEL = 'Proximal' # FVG edge that mitigates a zone: 'Proximal', '50 % OB' or 'Distal'
     MSS_LENGTH = 80
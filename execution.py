@@ -1,31 +1,33 @@
-import MetaTrader5 as mt5
+import broker
+from broker import mt5
 from config import Config
+from journal import get_journal
+from symbol_registry import get_registry
+from metrics import timer
 
 class Execution:
     @staticmethod
-    def place_order(symbol, order_type, volume, price=None, sl=None, tp=None, comment="Turtle Soup Bot"):
+    def place_order(symbol, order_type, volume, price=None, sl=None, tp=None, comment="Turtle Soup Bot",
+                    signal_time=None, timeframe=None, score=None):
         """
-        Places a trade on MT5.
+        Places a trade on MT5 and journals it (signal_time: broker epoch
+        seconds of the signal, for the signal-to-fill latency).
         order_type: 'BUY' or 'SELL'
         """
         
-        # Check symbol info
-        symbol_info = mt5.symbol_info(symbol)
-        if symbol_info is None:
+        # Check symbol info (the registry selects hidden symbols)
+        registry = get_registry()
+        if registry.spec(symbol) is None:
             print(f"{symbol} not found")
             return None
-            
-        if not symbol_info.visible:
-            if not mt5.symbol_select(symbol, True):
-                print(f"symbol_select({symbol}) failed")
-                return None
                 
         action = mt5.TRADE_ACTION_DEAL
         type_op = mt5.ORDER_TYPE_BUY if order_type == 'BUY' else mt5.ORDER_TYPE_SELL
         
         # Calculate price if not provided (Market Order)
         if price is None:
-            price = mt5.symbol_info_tick(symbol).ask if order_type == 'BUY' else mt5.symbol_info_tick(symbol).bid
+            tick = registry.tick(symbol)
+            price = tick.ask if order_type == 'BUY' else tick.bid
             
         request = {
             "action": action,
@@ -33,8 +35,9 @@ class Execution:
             "volume": volume,
             "type": type_op,
             "price": price,
-            "sl": sl if sl else 0.0,
-            "tp": tp if tp else 0.0,
+            # Levels from float32 frames are NumPy scalars, the terminal wants Python floats
+            "sl": float(sl) if sl else 0.0,
+            "tp": float(tp) if tp else 0.0,
             "deviation": Config.DEVIATION,
             "magic": Config.MAGIC_NUMBER,
             "comment": comment,
@@ -42,7 +45,21 @@ class Execution:
             "type_filling": mt5.ORDER_FILLING_IOC,
         }
         
-        result = mt5.order_send(request)
+        request_time = broker.timestamp()
+        with timer('order_send', symbol, timeframe):
+            result = mt5.order_send(request)
+        fill_time = broker.timestamp()
+
+        journal = get_journal()
+        if journal is not None:
+            filled = result is not None and result.retcode == mt5.TRADE_RETCODE_DONE
+            journal.record_order(
+                ticket=result.order if filled else None, symbol=symbol, timeframe=timeframe, side=order_type,
+                score=score, volume=volume, signal_time=signal_time, request_time=request_time,
+                fill_time=fill_time if filled else None, requested_price=price,
+                filled_price=result.price if filled else None, sl=request['sl'], tp=request['tp'],
+                initial_risk=abs(result.price - sl) if filled and sl else None,
+                retcode=result.retcode if result is not None else None, comment=comment)
         
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             print(f"Order failed: {result.retcode} - {result.comment}")
@@ -57,7 +74,8 @@ class Execution:
         if positions:
             for pos in positions:
                 type_op = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-                price = mt5.symbol_info_tick(symbol).bid if type_op == mt5.ORDER_TYPE_SELL else mt5.symbol_info_tick(symbol).ask
+                tick = get_registry().tick(symbol)
+                price = tick.bid if type_op == mt5.ORDER_TYPE_SELL else tick.ask
                 
                 request = {
                     "action": mt5.TRADE_ACTION_DEAL,
@@ -0,0 +1,176 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from config import Config
+
+MITIGATION_LEVELS = ('Proximal', '50 % OB', 'Distal')
+
+class FVGZone:
+    __slots__ = ('created', 'top', 'bottom', 'level')
+
+    def __init__(self, created, top, bottom, level):
+        self.created = created # Bar index of the candle that completed the gap
+        self.top = top
+        self.bottom = bottom
+        self.level = level     # Price that mitigates the zone
+
+    def __repr__(self):
+        return f"FVGZone(created={self.created}, top={self.top}, bottom={self.bottom}, level={self.level})"
+
+class FVGZoneIndex:
+    """
+    Live Fair Value Gaps of one direction, kept sorted by bottom so
+    "which zones contain this price" is a bisect plus the few zones
+    whose bottom lies within one zone width below the price.
+
+    A bearish (supply) zone is mitigated once a high trades above its level,
+    a bullish (demand) zone once a low trades below it. The level is the
+    proximal edge, the middle or the distal edge of the gap, like the
+    MLFVG setting of strategy_reference.pine.
+    """
+    def __init__(self, bearish, mitigation=Config.FVG_MITIGATION_LEVEL):
+        if mitigation not in MITIGATION_LEVELS:
+            raise ValueError(f"Unknown FVG mitigation level: {mitigation}")
+        self.bearish = bearish
+        self.mitigation = mitigation
+        self.sorted = []        # (bottom, created, zone)
+        self.live = {}          # created -> zone
+        self.by_level = []      # heap of (signed level, created): next zone to mitigate first
+        self.by_width = []      # heap of (-width, created): widest live zone first
+        self.by_age = deque()   # zones in creation order, for expiry
+
+    def __len__(self):
+        return len(self.live)
+
+    def level_of(self, top, bottom):
+        if self.mitigation == '50 % OB':
+            return (top + bottom) / 2
+        proximal = self.mitigation == 'Proximal'
+        # Supply zones sit above price (proximal = bottom), demand zones below it (proximal = top)
+        if self.bearish:
+            return bottom if proximal else top
+        return top if proximal else bottom
+
+    def add(self, created, top, bottom):
+        zone = FVGZone(created, top, bottom, self.level_of(top, bottom))
+        self.live[created] = zone
+        insort(self.sorted, (bottom, created, zone))
+        heapq.heappush(self.by_level, (zone.level if self.bearish else -zone.level, created))
+        heapq.heappush(self.by_width, (bottom - top, created))
+        self.by_age.append(zone)
+        return zone
+
+    def remove(self, zone):
+        if self.live.pop(zone.created, None) is None:
+            return
+        pos = bisect_left(self.sorted, (zone.bottom, zone.created))
+        del self.sorted[pos]
+
+    def mitigate(self, price):
+        """
+        Removes the zones mitigated by a bar reaching price (its high for
+        bearish zones, its low for bullish ones). Returns them.
+        """
+        key = price if self.bearish else -price
+        mitigated = []
+        while self.by_level and self.by_level[0][0] < key:
+            _, created = heapq.heappop(self.by_level)
+            zone = self.live.get(created)
+            if zone is not None:
+                self.remove(zone)
+                mitigated.append(zone)
+        return mitigated
+
+    def expire(self, oldest):
+        """
+        Removes the zones created before bar `oldest`.
+        """
+        while self.by_age and self.by_age[0].created < oldest:
+            self.remove(self.by_age.popleft())
+        # Zones that expire unmitigated leave stale heap entries behind
+        if len(self.by_level) > 2 * len(self.live) + 64:
+            self.by_level = [(zone.level if self.bearish else -zone.level, created)
+                             for created, zone in self.live.items()]
+            self.by_width = [(zone.bottom - zone.top, created) for created, zone in self.live.items()]
+            heapq.heapify(self.by_level)
+            heapq.heapify(self.by_width)
+
+    def max_width(self):
+        # Drop the widths of zones that are no longer live
+        while self.by_width and self.by_width[0][1] not in self.live:
+            heapq.heappop(self.by_width)
+        return -self.by_width[0][0] if self.by_width else 0.0
+
+    def containing(self, price):
+        """
+        Live zones with bottom <= price <= top, oldest first.
+        """
+        if not self.live:
+            return []
+        lo = bisect_left(self.sorted, (price - self.max_width(),))
+        hi = bisect_right(self.sorted, (price, float('inf')))
+        zones = [zone for _, _, zone in self.sorted[lo:hi] if price <= zone.top]
+        zones.sort(key=lambda zone: zone.created)
+        return zones
+
+    def first_containing(self, price):
+        zones = self.containing(price)
+        return zones[0] if zones else None
+
+class FVGZones:
+    """
+    Bearish and bullish FVG indexes of one (symbol, timeframe), advanced one
+    closed bar at a time. After close_bar(i, ...) the indexes hold the zones an
+    entry on bar i + 1 may trade: created at or before bar i, at most `length`
+    bars old and not mitigated by any bar up to i.
+    """
+    def __init__(self, length=Config.FVG_LENGTH, mitigation=Config.FVG_MITIGATION_LEVEL):
+        self.length = length
+        self.bearish = FVGZoneIndex(True, mitigation)
+        self.bullish = FVGZoneIndex(False, mitigation)
+        self.next_bar = 0 # Index of the first bar not closed yet
+
+    @classmethod
+    def from_frame(cls, df, end=None, **params):
+        """
+        Zones after the bars df[:end] closed (df needs the find_fvg columns).
+        """
+        zones = cls(**params)
+        zones.replay(df, end)
+        return zones
+
+    def replay(self, df, end=None):
+        """
+        Closes the bars of df from next_bar up to (excluding) end.
+        """
+        end = len(df) if end is None else end
+        if end <= self.next_bar:
+            return
+        columns = [df[name].to_numpy()[self.next_bar:end]
+                   for name in ('high', 'low', 'bearish_fvg', 'bullish_fvg', 'fvg_top', 'fvg_bottom')]
+        for i, row in enumerate(zip(*columns), start=self.next_bar):
+            self.close_bar(i, *row)
+
+    def close_bar(self, index, high, low, bearish, bullish, top, bottom):
+        self.bearish.mitigate(high)
+        self.bullish.mitigate(low)
+        self.next_bar = index + 1
+        oldest = self.next_bar - self.length
+        self.bearish.expire(oldest)
+        self.bullish.expire(oldest)
+        # A zone completed by this bar is live from the next bar on
+        if bearish:
+            self.bearish.add(index, top, bottom)
+        elif bullish:
+            self.bullish.add(index, top, bottom)
+
+    def entry_zone(self, bias, high, low):
+        """
+        Oldest live zone the bar reaches for a bias: a bearish FVG containing
+        its high for BEARISH, a bullish FVG containing its low for BULLISH.
+        """
+        if bias == 'BEARISH':
+            return self.bearish.first_containing(high)
+        if bias == 'BULLISH':
+            return self.bullish.first_containing(low)
+        return None
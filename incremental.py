@@ -0,0 +1,407 @@
+import numpy as np
+import pandas as pd
+from config import Config
+from strategy import TurtleSoupStrategy
+from fvg_zones import FVGZones
+from strategy_sr import SRStrategy
+from metrics import timed
+from bar_columns import PackedFlags, price_dtype
+from kernels import RollingExtreme, rolling_extrema
+from pivots import PivotTracker
+
+class IncrementalIndicators:
+    """
+    Streaming version of the TurtleSoupStrategy indicator pipeline
+    (Indicators.identify_swings / identify_mss_swings / find_fvg + SRStrategy)
+    for one (symbol, timeframe).
+
+    Seed it once from history, then feed bars with update(bar):
+    - a bar with the same time as the last one replaces the forming bar,
+    - a newer bar closes the previous one and is appended.
+    Each update only touches the rows whose windows contain the last bar,
+    so its cost does not depend on the history length.
+
+    frame() returns the same columns, with the same values, as running the
+    batch path over the same bar history. fvg_zones holds the live FVG zones
+    for an entry on the forming bar (see TurtleSoupStrategy.check_ltf_entry),
+    pivots the swings confirmed by closed bars (see TurtleSoupStrategy.last_swing).
+
+    Only the base columns, the levels (in the precision of the price columns)
+    and one word of packed flags are stored per row; delta volume, its
+    thresholds and the FVG edges are rebuilt from the base columns by frame().
+    """
+    BASE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume']
+    # Columns of frame() after the base columns, in the order of the batch path
+    DERIVED_COLUMNS = [
+        'swing_high', 'swing_low', 'is_swing_high', 'is_swing_low', 'is_minor_high', 'is_minor_low',
+        'bullish_fvg', 'bearish_fvg', 'fvg_top', 'fvg_bottom', 'delta_vol', 'vol_hi', 'vol_lo', 'atr',
+        'pivot_high', 'pivot_low', 'is_pivot_high', 'is_pivot_low',
+        'sr_support', 'sr_resistance', 'broken_support', 'broken_resistance',
+    ]
+    LEVEL_COLUMNS = ['swing_high', 'swing_low', 'atr', 'pivot_high', 'pivot_low', 'sr_support', 'sr_resistance']
+    FLAG_COLUMNS = [
+        'is_swing_high', 'is_swing_low', 'is_minor_high', 'is_minor_low', 'bullish_fvg', 'bearish_fvg',
+        'is_pivot_high', 'is_pivot_low', 'broken_support', 'broken_resistance',
+    ]
+
+    def __init__(self, swing_period=Config.SWING_PERIOD, mss_left=2, mss_right=1,
+                 sr_lookback=20, vol_len=2, box_width_atr=1.0, atr_period=14, max_bars=None,
+                 fvg_length=Config.FVG_LENGTH, fvg_mitigation=Config.FVG_MITIGATION_LEVEL):
+        self.swing_period = swing_period
+        self.mss_left = mss_left
+        self.mss_right = mss_right
+        self.sr_lookback = sr_lookback
+        self.vol_len = vol_len
+        self.box_width_atr = box_width_atr
+        self.atr_period = atr_period
+        self.fvg_length = fvg_length
+        self.fvg_mitigation = fvg_mitigation
+        # Rows kept in memory; older rows are dropped once twice this many accumulate
+        self.max_bars = max_bars
+        if max_bars is not None:
+            self.max_bars = max(max_bars, 2 * max(swing_period, sr_lookback) + 1, atr_period, vol_len)
+
+        self.columns = {}
+        self.n = 0      # rows currently stored
+        self.base = 0   # absolute index of stored row 0
+        self.lead = 0   # stored rows before the first row of frame(), context for its rebuilt columns
+
+        # With equal windows the S/R pivots are the major swings, stored once
+        self.shared = {'pivot_high': 'swing_high', 'pivot_low': 'swing_low'} if sr_lookback == swing_period else {}
+        self.flags = PackedFlags(self.FLAG_COLUMNS, {'is_pivot_high': 'is_swing_high', 'is_pivot_low': 'is_swing_low'}
+                                 if self.shared else None)
+
+        # Sliding windows over closed bars: one deque each serves the swing and the S/R pivot windows
+        self.window = 2 * max(swing_period, sr_lookback)
+        self.maxima = RollingExtreme('max')
+        self.minima = RollingExtreme('min')
+
+        # Active S/R levels as of the last finalized row (last - sr_lookback - 1)
+        self.committed_support = np.nan
+        self.committed_resistance = np.nan
+
+        # Live FVG zones and confirmed swings as of the last closed bar (absolute bar indices)
+        self.fvg_zones = FVGZones(fvg_length, fvg_mitigation)
+        self.pivots = PivotTracker(swing_period, swing_period)
+
+    # ------------------------------------------------------------------ seeding
+
+    @classmethod
+    def from_frame(cls, df, **params):
+        stream = cls(**params)
+        stream.seed(df)
+        return stream
+
+    @timed()
+    def seed(self, df):
+        """
+        Initializes the state from a history frame using the batch path.
+        The last row of df is treated as the forming bar.
+        """
+        history = df.reset_index(drop=True)
+        if self.max_bars is not None and len(history) > self.max_bars:
+            # Keep enough context so the retained rows get full windows
+            history = history.iloc[-self.max_bars:].reset_index(drop=True)
+        processed = TurtleSoupStrategy(history.copy(), swing_period=self.swing_period,
+                                       sr_lookback=self.sr_lookback, vol_len=self.vol_len,
+                                       box_width_atr=self.box_width_atr).df
+
+        self.columns = {}
+        self.base_columns = [c for c in history.columns]
+        n = len(processed)
+        capacity = max(16, 2 * n)
+        levels = price_dtype(processed['high'])
+        for name in self.base_columns + self.LEVEL_COLUMNS:
+            if name in self.shared:
+                continue
+            values = processed[name].to_numpy()
+            array = np.empty(capacity, dtype=values.dtype if name in self.base_columns else levels)
+            array[:n] = values
+            self.columns[name] = array
+        self.columns['flags'] = self.flags.pack({name: processed[name].to_numpy() for name in self.FLAG_COLUMNS},
+                                                capacity)
+        self._link_shared()
+        self.n = n
+        self.base = 0
+        self.lead = 0
+        self.fvg_zones = FVGZones.from_frame(processed, max(n - 1, 0), length=self.fvg_length,
+                                             mitigation=self.fvg_mitigation)
+        self.pivots.seed(self.columns['high'][:max(n - 1, 0)], self.columns['low'][:max(n - 1, 0)])
+
+        self.maxima.clear()
+        self.minima.clear()
+        if n == 0:
+            self.committed_support = np.nan
+            self.committed_resistance = np.nan
+            return
+
+        # Rebuild the windows from the closed rows they currently cover
+        last = n - 1
+        for i in range(max(0, last - self.window), last):
+            self.maxima.push(i, self.columns['high'][i])
+            self.minima.push(i, self.columns['low'][i])
+
+        committed = last - self.sr_lookback - 1
+        if committed >= 0:
+            self.committed_support = self.columns['sr_support'][committed]
+            self.committed_resistance = self.columns['sr_resistance'][committed]
+        else:
+            self.committed_support = np.nan
+            self.committed_resistance = np.nan
+
+    @timed()
+    def sync(self, df):
+        """
+        Feeds the rows of a rates frame that are not yet known (the forming bar
+        and anything newer). Reseeds if the frame does not overlap the stream.
+        """
+        if self.n == 0 or df.empty:
+            self.seed(df)
+            return
+        last_time = self.columns['time'][self.n - 1]
+        times = df['time'].to_numpy()
+        if times[0] > last_time or times[-1] < last_time:
+            self.seed(df)
+            return
+        start = int(np.searchsorted(times, last_time, side='left'))
+        for row in df.iloc[start:].to_dict('records'):
+            self.update(row)
+
+    # ------------------------------------------------------------------ updates
+
+    def update(self, bar):
+        """
+        Feeds one bar (dict-like with the base columns). Returns the absolute
+        index of the row it was stored at.
+        """
+        time = self._to_time(bar['time'])
+        if self.n == 0:
+            self.seed(pd.DataFrame([{**{c: bar[c] for c in self.BASE_COLUMNS if c in bar}, 'time': time}]))
+            return self.base
+
+        last_time = self.columns['time'][self.n - 1]
+        if time < last_time:
+            raise ValueError(f"Bar at {time} is older than the last bar ({last_time})")
+        if time > last_time:
+            self._close_last()
+            self._append_row()
+
+        pos = self.n - 1
+        for name in self.base_columns:
+            self.columns[name][pos] = time if name == 'time' else bar[name]
+        self._compute_last()
+        return self.base + pos
+
+    def _to_time(self, value):
+        # MT5 rate records carry epoch seconds, frames carry datetimes
+        if isinstance(value, (int, np.integer)):
+            return pd.Timestamp(int(value), unit='s').to_datetime64()
+        return pd.Timestamp(value).to_datetime64()
+
+    def _close_last(self):
+        """
+        The forming bar becomes a closed bar: push it into the windows and
+        commit the S/R row that just got its full pivot window.
+        """
+        pos = self.n - 1
+        idx = self.base + pos
+        high = self.columns['high'][pos]
+        low = self.columns['low'][pos]
+        self.maxima.push(idx, high)
+        self.minima.push(idx, low)
+        self.maxima.evict_before(idx + 1 - self.window)
+        self.minima.evict_before(idx + 1 - self.window)
+        word = self.columns['flags'][pos]
+        bearish = self.flags.get(word, 'bearish_fvg')
+        bullish = self.flags.get(word, 'bullish_fvg')
+        # Bearish gap wins if both conditions hold, like Indicators.find_fvg
+        if bearish:
+            top, bottom = self.columns['low'][pos - 2], high
+        elif bullish:
+            top, bottom = low, self.columns['high'][pos - 2]
+        else:
+            top, bottom = np.nan, np.nan
+        self.fvg_zones.close_bar(idx, high, low, bearish, bullish, top, bottom)
+        self.pivots.close_bar(idx, high, low)
+
+        committed = pos - self.sr_lookback
+        if committed >= 0:
+            self.committed_support = self.columns['sr_support'][committed]
+            self.committed_resistance = self.columns['sr_resistance'][committed]
+
+    def _append_row(self):
+        capacity = len(self.columns['time'])
+        if self.n == capacity:
+            if self.max_bars is not None and self.n >= 2 * self.max_bars:
+                self._compact()
+            else:
+                for name in self._stored():
+                    array = self.columns[name]
+                    grown = np.empty(2 * capacity, dtype=array.dtype)
+                    grown[:self.n] = array[:self.n]
+                    self.columns[name] = grown
+                self._link_shared()
+        self.n += 1
+        pos = self.n - 1
+        for name in self.LEVEL_COLUMNS:
+            self.columns[name][pos] = np.nan
+        self.columns['flags'][pos] = 0
+
+    def _compact(self):
+        # A few rows before the retained ones stay as context for the columns frame() rebuilds
+        self.lead = max(2, self.vol_len - 1)
+        drop = self.n - self.max_bars - self.lead
+        for name in self._stored():
+            array = self.columns[name]
+            array[:self.n - drop] = array[drop:self.n]
+        self.n -= drop
+        self.base += drop
+
+    def _stored(self):
+        # Names of the columns that own an array (shared ones are aliases)
+        return [name for name in self.columns if name not in self.shared]
+
+    def _link_shared(self):
+        for name, target in self.shared.items():
+            self.columns[name] = self.columns[target]
+
+    def _delta_vol(self, start, end):
+        # MT5 delivers tick_volume unsigned, which would wrap around when negated
+        volume = self.columns['tick_volume'][start:end].astype(np.int64)
+        return np.where(self.columns['close'][start:end] > self.columns['open'][start:end], volume, -volume)
+
+    def _compute_last(self):
+        """
+        Recomputes every row whose value depends on the forming bar.
+        """
+        cols = self.columns
+        flags = self.flags
+        words = cols['flags']
+        j = self.n - 1
+        idx = self.base + j
+        high = cols['high']
+        low = cols['low']
+        close = cols['close']
+
+        # ATR over the last atr_period true ranges (one extra bar for the previous close)
+        if idx >= self.atr_period - 1:
+            first = max(j - self.atr_period, 0)
+            true_range = SRStrategy.true_range(high[first:j + 1], low[first:j + 1], close[first:j + 1])
+            cols['atr'][j] = SRStrategy.window_mean(true_range[-self.atr_period:], self.atr_period)[-1]
+
+        # Fair Value Gap formed by the last bar (its edges are rebuilt from high/low when needed)
+        if idx >= 2:
+            flags.put(words, j, 'bullish_fvg', low[j] > high[j - 2])
+            flags.put(words, j, 'bearish_fvg', high[j] < low[j - 2])
+
+        # Minor pivot confirmed by the last bar
+        c = j - self.mss_right
+        if idx - self.mss_right >= self.mss_left:
+            neighbours = [k for k in range(c - self.mss_left, c + self.mss_right + 1) if k != c]
+            flags.put(words, c, 'is_minor_high', all(high[c] > high[k] for k in neighbours))
+            flags.put(words, c, 'is_minor_low', all(low[c] < low[k] for k in neighbours))
+
+        # Major swing whose centered window ends at the last bar
+        p = self.swing_period
+        if idx - p >= p:
+            c = j - p
+            cols['swing_high'][c] = self.maxima.best(high[j], since=idx - 2 * p)
+            cols['swing_low'][c] = self.minima.best(low[j], since=idx - 2 * p)
+            flags.put(words, c, 'is_swing_high', high[c] == cols['swing_high'][c])
+            flags.put(words, c, 'is_swing_low', low[c] == cols['swing_low'][c])
+
+        # S/R pivot whose centered window ends at the last bar, then the
+        # provisional levels/breakouts of the rows after it
+        lb = self.sr_lookback
+        c = j - lb
+        support = self.committed_support
+        resistance = self.committed_resistance
+        if idx - lb >= lb:
+            cols['pivot_high'][c] = self.maxima.best(high[j], since=idx - 2 * lb)
+            cols['pivot_low'][c] = self.minima.best(low[j], since=idx - 2 * lb)
+            is_pivot_high = high[c] == cols['pivot_high'][c]
+            is_pivot_low = low[c] == cols['pivot_low'][c]
+            flags.put(words, c, 'is_pivot_high', is_pivot_high)
+            flags.put(words, c, 'is_pivot_low', is_pivot_low)
+            # Volume thresholds need a full window of closed bars (NaN, i.e. no event, before)
+            if (is_pivot_high or is_pivot_low) and c >= self.vol_len - 1:
+                delta_vol = self._delta_vol(c - self.vol_len + 1, c + 1)
+                if is_pivot_low and delta_vol[-1] > (delta_vol / 2.5).max():
+                    support = low[c]
+                if is_pivot_high and delta_vol[-1] < (delta_vol / 2.5).min():
+                    resistance = high[c]
+
+        rows = slice(max(c, 0, lb - self.base), j + 1)
+        cols['sr_support'][rows] = support
+        cols['sr_resistance'][rows] = resistance
+        width = cols['atr'][rows] * self.box_width_atr
+        flags.put(words, rows, 'broken_support', close[rows] < support - width)
+        flags.put(words, rows, 'broken_resistance', close[rows] > resistance + width)
+
+    # ------------------------------------------------------------------ output
+
+    def __len__(self):
+        return self.n - self.lead
+
+    def bar_time(self, index):
+        """
+        Open time of the bar at an absolute index (None once compacted away).
+        """
+        pos = index - self.base
+        return self.columns['time'][pos] if 0 <= pos < self.n else None
+
+    def first_bar(self, tail=None):
+        """
+        Absolute index of the first row of frame(tail).
+        """
+        return self.base + (self.lead if tail is None else max(self.lead, self.n - tail))
+
+    def frame(self, tail=None):
+        """
+        DataFrame with the same columns as TurtleSoupStrategy(df).df.
+        """
+        start = self.first_bar(tail) - self.base
+        data = {}
+        rebuilt = self._rebuild(start)
+        flags = self.flags.unpack(self.columns['flags'][start:self.n])
+        for name in self.base_columns + self.DERIVED_COLUMNS:
+            if name in flags:
+                data[name] = flags[name]
+            elif name in rebuilt:
+                data[name] = rebuilt[name]
+            else:
+                data[name] = self.columns[name][start:self.n].copy()
+        return pd.DataFrame(data)
+
+    def _rebuild(self, start):
+        """
+        Delta volume, volume thresholds and FVG edges of the rows from start,
+        computed like the batch path from the rows before start.
+        """
+        first = max(start - max(2, self.vol_len - 1), 0)
+        end = self.n
+        high = self.columns['high'][first:end]
+        low = self.columns['low'][first:end]
+        n = end - first
+
+        delta_vol = self._delta_vol(first, end)
+        vol_hi, vol_lo = rolling_extrema(delta_vol / 2.5, self.vol_len)
+
+        prev_high = np.full(n, np.nan)
+        prev_low = np.full(n, np.nan)
+        if n > 2:
+            prev_high[2:] = high[:-2]
+            prev_low[2:] = low[:-2]
+        words = self.columns['flags'][first:end]
+        bearish = self.flags.get(words, 'bearish_fvg')
+        bullish = self.flags.get(words, 'bullish_fvg')
+        rebuilt = {
+            'fvg_top': np.where(bearish, prev_low, np.where(bullish, low, np.nan)),
+            'fvg_bottom': np.where(bearish, high, np.where(bullish, prev_high, np.nan)),
+            'delta_vol': delta_vol, 'vol_hi': vol_hi, 'vol_lo': vol_lo,
+        }
+        return {name: values[start - first:] for name, values in rebuilt.items()}
+
+    @property
+    def nbytes(self):
+        return sum(self.columns[name].nbytes for name in self._stored())
@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
+from metrics import timed
+from kernels import rolling_max, rolling_min, first_breach, first_breaches
 
 class Indicators:
     @staticmethod
+    @timed()
     def identify_swings(df, period=50):
         """
         Identifies Major Swing Highs and Lows similar to ta.pivothigh/low(period, period).
@@ -10,8 +13,8 @@ class Indicators:
         Note: This is a lagging indicator for historical analysis. 
         For real-time, we look at past confirmed swings.
         """
-        df['swing_high'] = df['high'].rolling(window=period*2+1, center=True).max()
-        df['swing_low'] = df['low'].rolling(window=period*2+1, center=True).min()
+        df['swing_high'] = rolling_max(df['high'].to_numpy(), period*2+1, center=True)
+        df['swing_low'] = rolling_min(df['low'].to_numpy(), period*2+1, center=True)
         
         df['is_swing_high'] = (df['high'] == df['swing_high'])
         df['is_swing_low'] = (df['low'] == df['swing_low'])
@@ -19,62 +22,87 @@ class Indicators:
         return df
 
     @staticmethod
+    def first_breach(values, swing, end, above=True):
+        """
+        Position of the first bar in (swing, end] whose value trades strictly
+        above (above=True) or below values[swing], or None (see kernels.first_breach).
+        """
+        return first_breach(values, swing, end, above)
+
+    @staticmethod
+    @timed()
+    def first_breaches(values, above=True):
+        """
+        first_breach for every bar at once: entry k is the first later bar
+        strictly above (below) values[k], or len(values) if there is none.
+        """
+        return first_breaches(values, above)
+
+    @staticmethod
+    @timed()
     def identify_mss_swings(df, left=2, right=1):
         """
         Identifies minor swings for Market Structure Shift (MSS).
         Pine: ta.pivothigh(2, 1)
         """
-        # We can't easily use centered rolling for asymmetric windows efficiently in one go without custom logic
-        # But for 2,1 it's simple: High[i] > High[i-1], High[i] > High[i-2], High[i] > High[i+1]
-        
-        # Shifted comparison
-        # i is the potential pivot
-        # i-1, i-2 are left neighbors
-        # i+1 is right neighbor (future)
+        # Bar i is a pivot high when High[i] is strictly above the `left` bars before it
+        # and the `right` bars after it (i+1 is the future bar that confirms it).
+        # The comparisons are done on whole shifted slices of the arrays instead of bar by bar.
+        high = df['high'].to_numpy()
+        low = df['low'].to_numpy()
+        n = len(df)
         
-        # In a real-time loop, we check if index-1 was a pivot once index closes.
+        is_minor_high = np.zeros(n, dtype=bool)
+        is_minor_low = np.zeros(n, dtype=bool)
         
-        df['is_minor_high'] = False
-        df['is_minor_low'] = False
-        
-        for i in range(2, len(df)-1):
-            # Pivot High
-            if (df['high'].iloc[i] > df['high'].iloc[i-1] and 
-                df['high'].iloc[i] > df['high'].iloc[i-2] and 
-                df['high'].iloc[i] > df['high'].iloc[i+1]):
-                df.at[df.index[i], 'is_minor_high'] = True
+        if n > left + right:
+            # Candidate pivots are bars left .. n-right-1
+            h = high[left:n-right]
+            l = low[left:n-right]
+            pivot_high = np.ones(len(h), dtype=bool)
+            pivot_low = np.ones(len(l), dtype=bool)
+            
+            for k in range(1, left + 1):
+                pivot_high &= h > high[left-k:n-right-k]
+                pivot_low &= l < low[left-k:n-right-k]
+            for k in range(1, right + 1):
+                pivot_high &= h > high[left+k:n-right+k]
+                pivot_low &= l < low[left+k:n-right+k]
                 
-            # Pivot Low
-            if (df['low'].iloc[i] < df['low'].iloc[i-1] and 
-                df['low'].iloc[i] < df['low'].iloc[i-2] and 
-                df['low'].iloc[i] < df['low'].iloc[i+1]):
-                df.at[df.index[i], 'is_minor_low'] = True
+            is_minor_high[left:n-right] = pivot_high
+            is_minor_low[left:n-right] = pivot_low
+        
+        df['is_minor_high'] = is_minor_high
+        df['is_minor_low'] = is_minor_low
                 
         return df
 
     @staticmethod
+    @timed()
     def find_fvg(df):
         """
         Identifies Fair Value Gaps.
         Bullish FVG: Low[i] > High[i-2]
         Bearish FVG: High[i] < Low[i-2]
         """
-        df['bullish_fvg'] = False
-        df['bearish_fvg'] = False
-        df['fvg_top'] = np.nan
-        df['fvg_bottom'] = np.nan
+        high = df['high'].to_numpy()
+        low = df['low'].to_numpy()
+        n = len(df)
         
-        for i in range(2, len(df)):
-            # Bullish FVG
-            if df['low'].iloc[i] > df['high'].iloc[i-2]:
-                df.at[df.index[i], 'bullish_fvg'] = True
-                df.at[df.index[i], 'fvg_top'] = df['low'].iloc[i]
-                df.at[df.index[i], 'fvg_bottom'] = df['high'].iloc[i-2]
-                
-            # Bearish FVG
-            if df['high'].iloc[i] < df['low'].iloc[i-2]:
-                df.at[df.index[i], 'bearish_fvg'] = True
-                df.at[df.index[i], 'fvg_top'] = df['low'].iloc[i-2]
-                df.at[df.index[i], 'fvg_bottom'] = df['high'].iloc[i]
+        # High/Low of the bar two candles back (NaN for the first two bars)
+        prev_high = np.full(n, np.nan)
+        prev_low = np.full(n, np.nan)
+        if n > 2:
+            prev_high[2:] = high[:-2]
+            prev_low[2:] = low[:-2]
+        
+        bullish = low > prev_high
+        bearish = high < prev_low
+        
+        df['bullish_fvg'] = bullish
+        df['bearish_fvg'] = bearish
+        # Bearish gap wins if both conditions hold (same precedence as the old bar loop)
+        df['fvg_top'] = np.where(bearish, prev_low, np.where(bullish, low, np.nan))
+        df['fvg_bottom'] = np.where(bearish, high, np.where(bullish, prev_high, np.nan))
                 
         return df
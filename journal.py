@@ -0,0 +1,227 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import numpy as np
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    ticket INTEGER,
+    symbol TEXT,
+    timeframe TEXT,
+    side TEXT,
+    score INTEGER,
+    volume REAL,
+    signal_time REAL,
+    request_time REAL,
+    fill_time REAL,
+    requested_price REAL,
+    filled_price REAL,
+    sl REAL,
+    tp REAL,
+    initial_risk REAL,
+    retcode INTEGER,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_ticket ON orders (ticket);
+CREATE TABLE IF NOT EXISTS sl_changes (
+    id INTEGER PRIMARY KEY,
+    ticket INTEGER,
+    time REAL,
+    old_sl REAL,
+    new_sl REAL,
+    price REAL,
+    r_multiple REAL,
+    retcode INTEGER
+);
+CREATE INDEX IF NOT EXISTS sl_changes_ticket ON sl_changes (ticket);
+"""
+
+ORDER_COLUMNS = ('ticket', 'symbol', 'timeframe', 'side', 'score', 'volume', 'signal_time', 'request_time',
+                 'fill_time', 'requested_price', 'filled_price', 'sl', 'tp', 'initial_risk', 'retcode', 'comment')
+SL_CHANGE_COLUMNS = ('ticket', 'time', 'old_sl', 'new_sl', 'price', 'r_multiple', 'retcode')
+
+class TradeJournal:
+    """
+    Append-only SQLite journal of the bot's orders and SL modifications.
+
+    record_order / record_sl_change only queue the row; a writer thread
+    inserts whatever has queued up in one transaction, so journaling adds no
+    latency to order placement. Times are broker clock epoch seconds.
+    """
+    def __init__(self, path=None, batch_size=500):
+        self.path = Config.JOURNAL_PATH if path is None else path
+        self.batch_size = batch_size
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        # WAL lets the query helpers read while the writer appends
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record_order(self, **fields):
+        self.pending.put(('orders', ORDER_COLUMNS, tuple(fields.get(c) for c in ORDER_COLUMNS)))
+
+    def record_sl_change(self, **fields):
+        self.pending.put(('sl_changes', SL_CHANGE_COLUMNS, tuple(fields.get(c) for c in SL_CHANGE_COLUMNS)))
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            item = self.pending.get()
+            batch = [item]
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            rows = {}
+            for entry in batch:
+                if entry is not None:
+                    table, columns, values = entry
+                    rows.setdefault((table, columns), []).append(values)
+            try:
+                with conn:
+                    for (table, columns), values in rows.items():
+                        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                         f"VALUES ({', '.join('?' * len(columns))})", values)
+            except sqlite3.Error as e:
+                print(f"[JOURNAL] Write failed: {e}")
+            for _ in batch:
+                self.pending.task_done()
+            if batch[-1] is None:
+                conn.close()
+                return
+
+    def flush(self):
+        """
+        Waits until every queued row is written.
+        """
+        self.pending.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+
+    def query(self, sql, params=()):
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def initial_risk(self, ticket):
+        """
+        SL distance recorded when the position was opened, or None.
+        """
+        rows = self.query("SELECT initial_risk FROM orders WHERE ticket = ? AND initial_risk IS NOT NULL "
+                          "ORDER BY id DESC LIMIT 1", (ticket,))
+        return rows[0][0] if rows else None
+
+    def fills(self, symbol=None):
+        """
+        (side, signal_time, request_time, fill_time, requested_price, filled_price) of filled orders.
+        """
+        sql = ("SELECT side, signal_time, request_time, fill_time, requested_price, filled_price "
+               "FROM orders WHERE fill_time IS NOT NULL AND filled_price > 0")
+        return self.query(sql + " AND symbol = ?", (symbol,)) if symbol else self.query(sql)
+
+    def latency_percentiles(self, percentiles=(50, 90, 99), symbol=None):
+        """
+        Seconds from signal to fill and from order request to fill.
+        """
+        rows = self.fills(symbol)
+        if not rows:
+            return {}
+        times = np.array([row[1:4] for row in rows], dtype=float)
+        result = {'orders': len(rows)}
+        for name, start in [('signal_to_fill', times[:, 0]), ('request_to_fill', times[:, 1])]:
+            delay = times[:, 2] - start
+            delay = delay[~np.isnan(delay)]
+            if len(delay):
+                result[name] = dict(zip(percentiles, np.percentile(delay, percentiles)))
+        return result
+
+    def slippage_percentiles(self, percentiles=(50, 90, 99), symbol=None):
+        """
+        Adverse fill slippage in price units (positive = filled worse than requested).
+        """
+        rows = [row for row in self.fills(symbol) if row[4] is not None]
+        if not rows:
+            return {}
+        sign = np.array([1.0 if row[0] == 'BUY' else -1.0 for row in rows])
+        slippage = sign * (np.array([row[5] for row in rows]) - np.array([row[4] for row in rows]))
+        return {'orders': len(rows), 'slippage': dict(zip(percentiles, np.percentile(slippage, percentiles)))}
+
+# Journal shared by Execution and TradeManager (created on first use)
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal():
+    """
+    The shared journal, or None when Config.JOURNAL_ENABLE is off.
+    """
+    global _journal
+    if _journal is None and Config.JOURNAL_ENABLE:
+        with _journal_lock:
+            if _journal is None:
+                _journal = TradeJournal()
+    return _journal
+
+def set_journal(journal):
+    """
+    Replaces the shared journal; returns the previous one.
+    """
+    global _journal
+    previous = _journal
+    _journal = journal
+    return previous
+
+def close_journal():
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
+
+def print_report(journal, symbol=None):
+    for name, report in [('Latency (s)', journal.latency_percentiles(symbol=symbol)),
+                         ('Slippage (price)', journal.slippage_percentiles(symbol=symbol))]:
+        print(f"{name}:")
+        if not report:
+            print("  no filled orders")
+        for key, value in report.items():
+            if isinstance(value, dict):
+                print(f"  {key:>16}: " + "  ".join(f"p{p}={v:.6g}" for p, v in value.items()))
+            else:
+                print(f"  {key:>16}: {value}")
+    sl_changes = journal.query("SELECT COUNT(*), COUNT(DISTINCT ticket) FROM sl_changes")[0]
+    print(f"SL modifications: {sl_changes[0]} on {sl_changes[1]} positions")
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and slippage report of the trade journal.")
+    parser.add_argument('--path', default=Config.JOURNAL_PATH)
+    parser.add_argument('--symbol', default=None)
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        print(f"No journal at {args.path}")
+        return
+    journal = TradeJournal(args.path)
+    print_report(journal, args.symbol)
+    journal.close()
+
+if __name__ == "__main__":
+    main()
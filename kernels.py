@@ -0,0 +1,228 @@
+from bisect import bisect_left
+import numpy as np
+from config import Config
+
+try:
+    import numba
+except ImportError: # Optional: without it the NumPy / pure-Python versions below are used
+    numba = None
+
+def compiled(func):
+    """
+    func compiled by numba in nopython mode, or None if numba is not installed
+    or Config.JIT_ENABLE is off. Compilation happens on the first call and is
+    cached on disk (__pycache__), so later runs start without recompiling.
+    """
+    if numba is None or not Config.JIT_ENABLE:
+        return None
+    return numba.njit(cache=True, nogil=True)(func)
+
+def rolling_max(values, windows, center=False):
+    """
+    Rolling maximum like pandas' rolling(window, center=center).max(): NaN
+    where the window is incomplete or holds a NaN. windows is one size
+    (returns an array) or a list of sizes (returns a list of arrays).
+    2-D values (e.g. symbol x bar) roll along the last axis.
+    """
+    return _rolling(values, windows, center, np.maximum)
+
+def rolling_min(values, windows, center=False):
+    """
+    Rolling minimum, see rolling_max.
+    """
+    return _rolling(values, windows, center, np.minimum)
+
+def rolling_extrema(values, windows, center=False):
+    """
+    (rolling_max, rolling_min) of values over the same windows.
+    """
+    return rolling_max(values, windows, center), rolling_min(values, windows, center)
+
+def _rolling(values, windows, center, op):
+    """
+    Extremes over power-of-two spans are built by combining two halves
+    (one vectorized pass per doubling); a window of size w is then the
+    combination of the two largest spans fitting in it, one at each end.
+    The spans are shared by every window, which are handled smallest first.
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[-1]
+    single = np.ndim(windows) == 0
+    sizes = [int(windows)] if single else [int(w) for w in windows]
+    results = {}
+    level, span = values, 1 # level[i] = extreme of values[i:i + span]
+    for w in sorted(set(sizes)):
+        if w < 1:
+            raise ValueError(f"Window must be at least 1, got {w}")
+        result = np.full(values.shape, np.nan)
+        if w <= n:
+            while span * 2 <= w:
+                level = op(level[..., :-span], level[..., span:])
+                span *= 2
+            trailing = op(level[..., :n - w + 1], level[..., w - span:n - span + 1])
+            # trailing[k] covers values[k:k + w]; pandas labels it with its last (or centre) bar
+            offset = w // 2 if center else w - 1
+            result[..., offset:offset + n - w + 1] = trailing
+        results[w] = result
+    return results[sizes[0]] if single else [results[w] for w in sizes]
+
+# Stateful loops: a plain loop (compiled when numba is available) and the
+# NumPy / Python version used otherwise, with bit-identical results.
+
+def carry_forward_loop(values, events, out):
+    """
+    Row by row: out[r, i] = values[r, j] of the last j <= i with events[r, j] (NaN before the first).
+    """
+    rows, n = values.shape
+    for r in range(rows):
+        level = np.nan
+        for i in range(n):
+            if events[r, i]:
+                level = values[r, i]
+            out[r, i] = level
+
+def first_breach_loop(values, swing, end, above):
+    """
+    First i in (swing, end] with values[i] strictly above (below) values[swing], or -1.
+    """
+    level = values[swing]
+    for i in range(swing + 1, min(end, len(values) - 1) + 1):
+        if (values[i] > level) if above else (values[i] < level):
+            return i
+    return -1
+
+def first_breaches_loop(values, above, result):
+    """
+    first_breach_loop for every bar at once (monotonic stack), written into
+    result, which starts out filled with len(values).
+    """
+    stack = np.empty(len(values), dtype=np.int64)
+    top = 0
+    for i in range(len(values)):
+        value = values[i]
+        if above:
+            while top > 0 and value > values[stack[top - 1]]:
+                top -= 1
+                result[stack[top]] = i
+        else:
+            while top > 0 and value < values[stack[top - 1]]:
+                top -= 1
+                result[stack[top]] = i
+        stack[top] = i
+        top += 1
+
+_carry_forward_jit = compiled(carry_forward_loop)
+_first_breach_jit = compiled(first_breach_loop)
+_first_breaches_jit = compiled(first_breaches_loop)
+
+def carry_forward(values, events, jit=True):
+    """
+    Returns an array holding, at each bar, values[j] of the most recent bar j <= i
+    where events[j] is True (NaN before the first event). 2-D inputs carry along the last axis.
+    jit=False forces the NumPy version.
+    """
+    values = np.asarray(values)
+    events = np.asarray(events, dtype=bool)
+    n = values.shape[-1]
+    if jit and _carry_forward_jit is not None and values.size:
+        carried = np.empty(values.shape)
+        _carry_forward_jit(values.reshape(-1, n), events.reshape(-1, n), carried.reshape(-1, n))
+        return carried
+    last_event = np.where(events, np.arange(n), -1)
+    np.maximum.accumulate(last_event, axis=-1, out=last_event)
+    carried = np.take_along_axis(values, np.maximum(last_event, 0), axis=-1).astype(float)
+    carried[last_event < 0] = np.nan
+    return carried
+
+def first_breach(values, swing, end, above=True, jit=True):
+    """
+    Position of the first bar in (swing, end] whose value trades strictly
+    above (above=True) or below values[swing], or None.
+    The compiled loop stops at the breach instead of comparing the whole window.
+    """
+    if jit and _first_breach_jit is not None:
+        hit = _first_breach_jit(values, swing, end, above)
+        return None if hit < 0 else hit
+    window = values[swing+1:end+1]
+    hits = window > values[swing] if above else window < values[swing]
+    if not hits.any():
+        return None
+    return swing + 1 + int(np.argmax(hits))
+
+def first_breaches(values, above=True, jit=True):
+    """
+    first_breach for every bar at once: entry k is the first later bar
+    strictly above (below) values[k], or len(values) if there is none.
+    Monotonic stack, O(n) over the whole history.
+    """
+    n = len(values)
+    result = np.full(n, n, dtype=np.int64)
+    if jit and _first_breaches_jit is not None:
+        _first_breaches_jit(np.asarray(values), above, result)
+        return result
+    # Python lists are much faster than NumPy scalars in an interpreted loop
+    values = np.asarray(values).tolist()
+    # Bars still waiting for a breach; their values never increase (decrease) towards the top
+    stack = []
+    for i, value in enumerate(values):
+        if above:
+            while stack and value > values[stack[-1]]:
+                result[stack.pop()] = i
+        else:
+            while stack and value < values[stack[-1]]:
+                result[stack.pop()] = i
+        stack.append(i)
+    return result
+
+class RollingExtreme:
+    """
+    Monotonic deque over a sliding window of *closed* bars, the streaming
+    counterpart of rolling_max/rolling_min.
+    The still-forming bar is never pushed; callers combine its value with
+    best() instead, so replacing the forming bar never has to undo a pop.
+    One deque serves every window ending at the last pushed bar: the extreme
+    of a shorter window is its first item with an index inside that window.
+    """
+    def __init__(self, mode='max'):
+        self.mode = mode
+        # Items (absolute bar index, value) from head on; popped ones are trimmed now and then
+        self.indices = []
+        self.values = []
+        self.head = 0
+
+    def push(self, index, value):
+        if self.mode == 'max':
+            while len(self.values) > self.head and self.values[-1] <= value:
+                self.indices.pop()
+                self.values.pop()
+        else:
+            while len(self.values) > self.head and self.values[-1] >= value:
+                self.indices.pop()
+                self.values.pop()
+        self.indices.append(index)
+        self.values.append(value)
+
+    def evict_before(self, index):
+        while self.head < len(self.indices) and self.indices[self.head] < index:
+            self.head += 1
+        if self.head > 64 and self.head * 2 > len(self.indices):
+            del self.indices[:self.head]
+            del self.values[:self.head]
+            self.head = 0
+
+    def best(self, live_value, since=None):
+        """
+        Extreme of the closed window (only bars from index `since` on, if
+        given) combined with the forming bar's value.
+        """
+        pos = self.head if since is None else bisect_left(self.indices, since, self.head)
+        if pos == len(self.values):
+            return live_value
+        if self.mode == 'max':
+            return max(self.values[pos], live_value)
+        return min(self.values[pos], live_value)
+
+    def clear(self):
+        self.indices.clear()
+        self.values.clear()
+        self.head = 0
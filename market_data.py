@@ -1,11 +1,24 @@
-import MetaTrader5 as mt5
+import broker
+from broker import mt5
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from config import Config
+from bar_cache import BarCache
+from bar_store import BarStore
+from bar_columns import rate_columns
+from resample import BarAggregator
+from symbol_registry import get_registry
+from metrics import timer
 
 class MarketData:
     def __init__(self):
         self.connected = False
+        self.bar_cache = BarCache()
+        self.bar_store = BarStore() if Config.BAR_STORE_ENABLE else None
+        self.aggregator = BarAggregator() if Config.RESAMPLE_ENABLE and Config.BAR_CACHE_ENABLE else None
+        self.symbols = get_registry()
+        # The MT5 API is not thread-safe: every terminal call from scan threads goes through this lock
+        self.lock = self.symbols.lock
 
     def connect(self):
         initialized = False
@@ -78,28 +91,9 @@ class MarketData:
 
     def resolve_symbol(self, base_symbol):
         """
-        Attempts to find the correct symbol name for the broker (handling suffixes like .m, _i, etc.)
+        Broker name of a base symbol (handling suffixes like .m, _i, etc.), looked up once.
         """
-        # 1. Try exact match first
-        if mt5.symbol_select(base_symbol, True):
-            return base_symbol
-            
-        # 2. Search for matches
-        # print(f"Searching for partial match for {base_symbol}...")
-        all_symbols = mt5.symbols_get()
-        if all_symbols is None:
-            return None
-            
-        for s in all_symbols:
-            # Check if symbol starts with base AND is visible or can be selected
-            # limiting length diff to 3 to avoid matching EURUSD -> EURUSDJPY? No, that's different.
-            if s.name.startswith(base_symbol) and (len(s.name) - len(base_symbol) <= 3):
-                if mt5.symbol_select(s.name, True):
-                    # print(f"✓ Found broker symbol: {s.name}")
-                    return s.name
-                    
-        print(f"❌ Could not find valid symbol for {base_symbol}")
-        return None
+        return self.symbols.resolve(base_symbol)
 
     def get_rates(self, symbol, timeframe, num_bars=1000):
         # Map string timeframe to MT5 constant
@@ -114,11 +108,148 @@ class MarketData:
         }
         mt5_tf = tf_map.get(timeframe, mt5.TIMEFRAME_H1)
 
-        rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, num_bars)
-        if rates is None:
-            print(f"Failed to get rates for {symbol} (Error: {mt5.last_error()})")
+        # Timed including the wait for the MT5 lock
+        with timer('get_rates', symbol, timeframe), self.lock:
+            if Config.BAR_CACHE_ENABLE:
+                buffer = self.bar_cache.get(symbol, timeframe, num_bars)
+                aggregator = self.aggregator
+                if buffer is not None and aggregator is not None and \
+                        (timeframe == aggregator.base or aggregator.covers(timeframe)):
+                    # Kept current from the base bars: one base delta fetch per symbol and scan
+                    if not aggregator.due(symbol, broker.timestamp()) or self._refresh_base(symbol):
+                        buffer = self.bar_cache.get(symbol, timeframe, num_bars)
+                        if buffer is not None:
+                            return buffer.frame(num_bars)
+
+                # Steady state: only download bars from the forming bar onwards
+                buffer = self.bar_cache.get(symbol, timeframe, num_bars)
+                if buffer is not None:
+                    last_time = buffer.last_time()
+                    rates = self._fetch_since(symbol, mt5_tf, last_time)
+                    if rates is not None and len(rates) > 0 and rates['time'][0] <= last_time:
+                        self.bar_cache.store_delta(buffer, rates)
+                        self._write_through(symbol, timeframe, rates)
+                        return buffer.frame(num_bars)
+
+                # Cold start: load stored bars and only download what came after them
+                buffer = self._load_stored(symbol, timeframe, mt5_tf, num_bars)
+                if buffer is not None:
+                    return buffer.frame(num_bars)
+
+            rates = mt5.copy_rates_from_pos(symbol, mt5_tf, 0, num_bars)
+            if rates is None:
+                print(f"Failed to get rates for {symbol} (Error: {mt5.last_error()})")
+                return None
+            self._write_through(symbol, timeframe, rates)
+
+            if Config.BAR_CACHE_ENABLE:
+                buffer = self.bar_cache.store_full(symbol, timeframe, rates, num_bars)
+                return buffer.frame(num_bars)
+
+            return pd.DataFrame(rate_columns(rates))
+
+    def get_tick(self, symbol):
+        """
+        Latest quote of a symbol (mt5.symbol_info_tick, at most Config.TICK_CACHE_TTL seconds old), or None.
+        """
+        return self.symbols.tick(symbol)
+
+    def _load_stored(self, symbol, timeframe, mt5_tf, num_bars):
+        """
+        Seeds the bar cache from the bar store plus a delta fetch. Returns the
+        buffer, or None if the store can't cover num_bars.
+        """
+        if self.bar_store is None:
+            return None
+        stored = self.bar_store.tail(symbol, timeframe, num_bars)
+        if len(stored) < num_bars:
             return None
+        last_time = int(stored['time'][-1])
+        rates = self._fetch_since(symbol, mt5_tf, last_time)
+        # The delta must start at the last stored bar, otherwise bars in between are unknown
+        if rates is None or len(rates) == 0 or rates['time'][0] != last_time:
+            return None
+        buffer = self.bar_cache.store_full(symbol, timeframe, stored, num_bars, fetched=False)
+        self.bar_cache.store_delta(buffer, rates)
+        self._write_through(symbol, timeframe, rates)
+        return buffer
+
+    def _refresh_base(self, symbol):
+        """
+        Delta fetch of the base timeframe (a full download the first time),
+        folded into every cached timeframe of the symbol built from it.
+        Returns False if the base bars could not be fetched or the delta does
+        not connect to the cached ones.
+        """
+        aggregator = self.aggregator
+        base = self.bar_cache.get(symbol, aggregator.base, 1)
+        if base is None:
+            if self.get_rates(symbol, aggregator.base, num_bars=aggregator.base_bars) is None:
+                return False
+            base = self.bar_cache.get(symbol, aggregator.base, 1)
+            # The forming bar of every timeframe is rebuilt
+            since = base.last_time()
+        else:
+            last_time = base.last_time()
+            rates = self._fetch_since(symbol, getattr(mt5, f"TIMEFRAME_{aggregator.base}"), last_time)
+            if rates is None or len(rates) == 0 or rates['time'][0] > last_time:
+                return False
+            self.bar_cache.store_delta(base, rates)
+            self._write_through(symbol, aggregator.base, rates)
+            since = int(rates['time'][0])
+        aggregator.refreshed[symbol] = broker.timestamp()
+
+        for (cached_symbol, timeframe), buffer in list(self.bar_cache.buffers.items()):
+            if cached_symbol != symbol or not aggregator.covers(timeframe) or len(buffer) == 0:
+                continue
+            bars = aggregator.fold(symbol, timeframe, base, buffer, since)
+            if bars is None:
+                # Downloaded again on its next request
+                self.bar_cache.invalidate(symbol, timeframe)
+                continue
+            buffer.merge(bars)
+            self._write_through(symbol, timeframe, bars)
+        return True
+
+    def _write_through(self, symbol, timeframe, rates):
+        """
+        Persists the closed bars of a fetch (all but the last, forming bar).
+        """
+        if self.bar_store is None or len(rates) < 2:
+            return
+        try:
+            self.bar_store.append(symbol, timeframe, rates[:-1])
+        except OSError as e:
+            print(f"[STORE] Failed to write bars for {symbol} {timeframe}: {e}")
+
+    def backfill_gaps(self, symbol, timeframe, min_missing=1):
+        """
+        Downloads the bars missing between stored bars and merges them into the store.
+        Returns the number of bars added (market closures simply return nothing).
+        """
+        if self.bar_store is None:
+            return 0
+        mt5_tf = getattr(mt5, f"TIMEFRAME_{timeframe}")
+        added = 0
+        with self.lock:
+            for before, after in self.bar_store.gaps(symbol, timeframe, min_missing):
+                rates = mt5.copy_rates_range(symbol, mt5_tf, datetime.fromtimestamp(before + 1, tz=timezone.utc),
+                                             datetime.fromtimestamp(after - 1, tz=timezone.utc))
+                if rates is not None and len(rates) > 0:
+                    added += self.bar_store.merge(symbol, timeframe, rates)
+        return added
+
+    def _fetch_since(self, symbol, mt5_tf, last_time):
+        """
+        Bars with open time >= last_time (epoch seconds, broker server time).
+        The upper bound is pushed a day ahead so any server UTC offset is covered.
+        """
+        date_from = datetime.fromtimestamp(last_time, tz=timezone.utc)
+        date_to = datetime.now(timezone.utc) + timedelta(days=1)
+        return mt5.copy_rates_range(symbol, mt5_tf, date_from, date_to)
 
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        return df
+    def cache_stats(self):
+        stats = self.bar_cache.stats()
+        if self.aggregator is not None:
+            stats.update(self.aggregator.stats())
+        return stats
@@ -0,0 +1,409 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+
+# Upper bounds (ms) of the histogram buckets: 10 us doubling up to ~84 s, plus an overflow bucket
+BUCKETS_MS = [0.01 * 2 ** k for k in range(24)]
+
+class Histogram:
+    """
+    Wall time distribution of one stage, in log-spaced buckets.
+    """
+    __slots__ = ('count', 'total', 'max', 'counts')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile (capped at the max).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for k, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BUCKETS_MS[k], self.max) if k < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max,
+        }
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'symbol', 'timeframe', 'start')
+
+    def __init__(self, metrics, stage, symbol, timeframe):
+        self.metrics = metrics
+        self.stage = stage
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.start, self.symbol, self.timeframe)
+        return False
+
+class _Context:
+    __slots__ = ('local', 'symbol', 'timeframe', 'previous')
+
+    def __init__(self, local, symbol, timeframe):
+        self.local = local
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    def __enter__(self):
+        self.previous = (getattr(self.local, 'symbol', None), getattr(self.local, 'timeframe', None))
+        self.local.symbol, self.local.timeframe = self.symbol, self.timeframe
+        return self
+
+    def __exit__(self, *exc):
+        self.local.symbol, self.local.timeframe = self.previous
+        return False
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullContext()
+
+class Metrics:
+    """
+    Wall time histograms of the stages of a scan cycle, per (stage, symbol, timeframe).
+
+    Stages are timed with timer() blocks or the timed() decorator. Code that
+    does not know its symbol (the indicator functions) is attributed to the
+    symbol/timeframe of the enclosing context() block of its thread. With
+    Config.SCAN_PROCESSES > 0 the analysis runs in worker processes, whose
+    stages are not collected; the scanner's 'analyze.*' stages still cover them.
+    """
+    def __init__(self, enabled=None, profile_mode=None):
+        self.enabled = Config.METRICS_ENABLE if enabled is None else enabled
+        self.histograms = {} # (stage, symbol, timeframe) -> Histogram
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+        profile_mode = Config.PROFILE_MODE if profile_mode is None else profile_mode
+        self.profiler = Profiler(profile_mode) if profile_mode else None
+        self.server = None
+
+    def timer(self, stage, symbol=None, timeframe=None):
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, stage, symbol, timeframe)
+
+    def context(self, symbol, timeframe=None):
+        if not self.enabled:
+            return _NULL
+        return _Context(self.local, symbol, timeframe)
+
+    def record(self, stage, seconds, symbol=None, timeframe=None):
+        if symbol is None:
+            symbol = getattr(self.local, 'symbol', None)
+            timeframe = getattr(self.local, 'timeframe', None) if timeframe is None else timeframe
+        key = (stage, symbol, timeframe)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(seconds * 1000.0)
+
+    def run(self, func, *args):
+        """
+        func(*args), under the profiler in 'cprofile' mode.
+        """
+        if self.profiler is not None:
+            return self.profiler.run(func, *args)
+        return func(*args)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+        self.started = time.time()
+
+    def by_stage(self):
+        """
+        Histograms merged over symbols and timeframes, per stage.
+        """
+        with self.lock:
+            items = list(self.histograms.items())
+        stages = {}
+        for (stage, _, _), histogram in items:
+            stages.setdefault(stage, Histogram()).merge(histogram)
+        return stages
+
+    def snapshot(self):
+        with self.lock:
+            items = sorted(self.histograms.items(), key=lambda item: tuple(str(k) for k in item[0]))
+            rows = [{'stage': stage, 'symbol': symbol, 'timeframe': timeframe, **histogram.to_dict()}
+                    for (stage, symbol, timeframe), histogram in items]
+        return {
+            'since': self.started,
+            'time': time.time(),
+            'stages': {stage: histogram.to_dict() for stage, histogram in sorted(self.by_stage().items())},
+            'series': rows,
+        }
+
+    def summary(self):
+        stages = self.by_stage()
+        lines = [f"{'Stage':<36} | {'Count':>7} | {'Mean (ms)':>9} | {'p50':>8} | {'p90':>8} | {'p99':>8} | {'Max':>8} | {'Total (s)':>9}",
+                 "-" * 112]
+        for stage, h in sorted(stages.items(), key=lambda item: -item[1].total):
+            lines.append(f"{stage:<36} | {h.count:>7} | {h.total / h.count:>9.3f} | {h.percentile(50):>8.3f} | "
+                         f"{h.percentile(90):>8.3f} | {h.percentile(99):>8.3f} | {h.max:>8.3f} | {h.total / 1000.0:>9.3f}")
+        return "\n".join(lines)
+
+    def report(self, path=None):
+        """
+        Prints the summary and writes the snapshot (and profile) to disk.
+        """
+        if not self.enabled:
+            return
+        path = Config.METRICS_PATH if path is None else path
+        print(f"[METRICS] Stage timings since {time.strftime('%H:%M:%S', time.localtime(self.started))}:")
+        print(self.summary())
+        if path:
+            self.write(path)
+        if self.profiler is not None:
+            profile = self.profiler.dump(Config.PROFILE_PATH)
+            if profile:
+                print(profile)
+
+    def write(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Replace atomically, readers never see half a file
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves the snapshot as JSON on http://host:port/ from a background thread.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        print(f"[METRICS] Serving stage timings on http://{host}:{self.server.server_address[1]}/")
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.profiler is not None:
+            self.profiler.stop()
+
+class Profiler:
+    """
+    Optional profiling of the bot's threads:
+    - 'cprofile': every Metrics.run() call runs under a per-thread cProfile.Profile,
+      dumped as merged pstats,
+    - 'sampling': a background thread records the stacks of all threads every
+      Config.PROFILE_SAMPLE_INTERVAL seconds, dumped as folded stacks (flame graph input).
+    """
+    def __init__(self, mode):
+        if mode not in ('cprofile', 'sampling'):
+            raise ValueError(f"Unknown profile mode {mode!r} (use 'cprofile' or 'sampling')")
+        self.mode = mode
+        self.local = threading.local()
+        self.profiles = []
+        self.samples = Counter()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.sampler = None
+        if mode == 'sampling':
+            self.sampler = threading.Thread(target=self._sample, name="sampler", daemon=True)
+            self.sampler.start()
+
+    def run(self, func, *args):
+        if self.mode != 'cprofile' or getattr(self.local, 'active', False):
+            return func(*args) # Sampling mode, or already profiled further up this thread
+        profile = getattr(self.local, 'profile', None)
+        if profile is None:
+            profile = self.local.profile = cProfile.Profile()
+            with self.lock:
+                self.profiles.append(profile)
+        self.local.active = True
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            self.local.active = False
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(Config.PROFILE_SAMPLE_INTERVAL):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                with self.lock:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopping.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def dump(self, path, top=20):
+        """
+        Writes the profile next to path and returns its `top` functions as text
+        (None before anything was profiled); printing is left to the caller.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.mode == 'cprofile':
+            with self.lock:
+                profiles = list(self.profiles)
+            if not profiles:
+                return None
+            # A thread's profile may be running: merge what each has collected so far
+            # without create_stats(), which would disable it
+            stats = None
+            for profile in profiles:
+                snapshot = _ProfileSnapshot(profile)
+                stats = pstats.Stats(snapshot) if stats is None else stats.add(snapshot)
+            stats.dump_stats(path + ".pstats")
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats('cumulative').print_stats(top)
+            return out.getvalue()
+        with self.lock:
+            samples = Counter(self.samples)
+        with open(path + ".folded", 'w') as f:
+            for stack, n in samples.most_common():
+                f.write(f"{stack} {n}\n")
+        leaves = Counter()
+        for stack, n in samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        total = sum(samples.values())
+        lines = [f"[PROFILE] {total} samples, busiest functions:"]
+        for name, n in leaves.most_common(top):
+            lines.append(f"  {100.0 * n / total:5.1f}%  {name}")
+        return "\n".join(lines)
+
+class _ProfileSnapshot:
+    # What pstats.Stats needs of a profile, read without stopping it
+    def __init__(self, profile):
+        self.profile = profile
+
+    def create_stats(self):
+        self.profile.snapshot_stats()
+        self.stats = self.profile.stats
+
+# Metrics shared by every module (created on first use)
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
+
+def set_metrics(metrics):
+    """
+    Replaces the shared metrics; returns the previous one.
+    """
+    global _metrics
+    previous = _metrics
+    _metrics = metrics
+    return previous
+
+def timer(stage, symbol=None, timeframe=None):
+    """
+    Times a block: `with timer('get_rates', symbol, tf): ...`
+    """
+    return get_metrics().timer(stage, symbol, timeframe)
+
+def context(symbol, timeframe=None):
+    """
+    Attributes the stages timed in a block to symbol/timeframe.
+    """
+    return get_metrics().context(symbol, timeframe)
+
+def timed(stage=None):
+    """
+    Decorator timing every call of a function (stage defaults to its qualified name).
+    """
+    def decorate(func):
+        name = func.__qualname__ if stage is None else stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
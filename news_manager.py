@@ -1,4 +1,4 @@
-import MetaTrader5 as mt5
+from broker import mt5
 from datetime import datetime, timedelta
 from config import Config
 
@@ -0,0 +1,184 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from config import Config
+from backtest import Backtest, BacktestParams, load_data
+
+# Default search space. fvg_length / fvg_mitigation are accepted too; mss_length
+# is accepted but no indicator reads it yet, so sweeping it only repeats identical runs.
+DEFAULT_SPACE = {
+    'swing_period': [30, 50, 70],
+    'sr_lookback': [10, 20, 30],
+    'vol_len': [2, 4],
+    'box_width_atr': [0.5, 1.0],
+    'trailing_activate_rr': [2.5, 3.5],
+    'trailing_dist_rr': [1.5, 2.0],
+}
+
+def grid(space):
+    """
+    Every combination of the values in space.
+    """
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+def random_search(space, samples, seed=0):
+    """
+    `samples` distinct random combinations (at most the grid size).
+    """
+    rng = random.Random(seed)
+    names = list(space)
+    total = int(np.prod([len(space[name]) for name in names]))
+    seen = set()
+    while len(seen) < min(samples, total):
+        values = tuple(rng.choice(space[name]) for name in names)
+        if values not in seen:
+            seen.add(values)
+            yield dict(zip(names, values))
+
+class SharedBars:
+    """
+    Bar arrays of {symbol: {timeframe: DataFrame}} copied once into one shared
+    memory block per frame. Workers attach by name and get DataFrames whose
+    columns are views of the block, so nothing is pickled per task.
+    """
+    def __init__(self, data):
+        self.blocks = []
+        self.layout = {}
+        for symbol, frames in data.items():
+            for tf, df in frames.items():
+                columns = []
+                offset = 0
+                for name in df.columns:
+                    array = np.ascontiguousarray(df[name].to_numpy())
+                    columns.append((name, array.dtype.str, offset))
+                    offset += -(-array.nbytes // 8) * 8 # keep every column 8-byte aligned
+                block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+                for (name, dtype, start) in columns:
+                    array = np.ascontiguousarray(df[name].to_numpy())
+                    np.ndarray(len(df), dtype=dtype, buffer=block.buf, offset=start)[:] = array
+                self.blocks.append(block)
+                self.layout[(symbol, tf)] = (block.name, len(df), columns)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    @staticmethod
+    def attach(layout):
+        """
+        Returns (data, blocks); keep `blocks` referenced while the frames are in use.
+        """
+        data = {}
+        blocks = []
+        for (symbol, tf), (name, length, columns) in layout.items():
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays = {}
+            for column, dtype, start in columns:
+                view = np.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)
+                view.flags.writeable = False
+                arrays[column] = view
+            data.setdefault(symbol, {})[tf] = pd.DataFrame(arrays, copy=False)
+        return data, blocks
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+def _init_worker(layout, backtest_kwargs):
+    data, blocks = SharedBars.attach(layout)
+    _worker['data'] = data
+    _worker['blocks'] = blocks
+    _worker['kwargs'] = backtest_kwargs
+    _worker['cache'] = {} # signal series reused across this worker's runs
+
+def _run_one(task):
+    run_id, overrides = task
+    started = time.perf_counter()
+    params = BacktestParams(**overrides)
+    result = Backtest(_worker['data'], params, cache=_worker['cache'], **_worker['kwargs']).run()
+    row = {'run': run_id}
+    row.update(overrides)
+    row.update(result.summary())
+    row['seconds'] = time.perf_counter() - started
+    row['pid'] = os.getpid()
+    return row
+
+def optimize(data, combinations, processes=None, rank_by='net_profit', **backtest_kwargs):
+    """
+    Runs one backtest per parameter combination on a process pool and returns
+    the results ranked by `rank_by` (best first).
+    """
+    tasks = list(enumerate(combinations))
+    if not tasks:
+        return pd.DataFrame()
+    processes = processes or os.cpu_count() or 1
+    shared = SharedBars(data)
+    rows = []
+    started = time.perf_counter()
+    try:
+        with multiprocessing.Pool(min(processes, len(tasks)), initializer=_init_worker,
+                                  initargs=(shared.layout, backtest_kwargs)) as pool:
+            for row in pool.imap_unordered(_run_one, tasks):
+                rows.append(row)
+                print(f"[{len(rows)}/{len(tasks)}] run {row['run']}: {rank_by}={row[rank_by]:.2f} "
+                      f"({row['seconds']:.1f}s)")
+    finally:
+        shared.close()
+    print(f"{len(tasks)} runs in {time.perf_counter() - started:.1f}s on {processes} processes")
+    results = pd.DataFrame(rows).sort_values(rank_by, ascending=False, kind='stable')
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results.reset_index(drop=True)
+
+def parse_space(overrides):
+    """
+    ['swing_period=30,50', ...] -> DEFAULT_SPACE with those entries replaced.
+    """
+    space = dict(DEFAULT_SPACE)
+    defaults = BacktestParams()
+    for item in overrides:
+        name, _, values = item.partition('=')
+        if not hasattr(defaults, name):
+            raise ValueError(f"Unknown backtest parameter: {name}")
+        kind = type(getattr(defaults, name))
+        space[name] = [kind(v) if kind is not bool else v.lower() in ('1', 'true', 'yes') for v in values.split(',')]
+    return space
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep over the backtest engine.")
+    parser.add_argument('--data-dir', default='data', help="Directory with {SYMBOL}_{TF}.csv files")
+    parser.add_argument('--store', default=None, help="Read bars from this bar store directory instead")
+    parser.add_argument('--symbols', nargs='+', default=Config.SYMBOLS)
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help="Override the values searched for one parameter")
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--samples', type=int, default=50, help="Combinations for --search random")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--rank-by', default='net_profit')
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--out', default='optimizer_results.csv')
+    args = parser.parse_args()
+
+    data = load_data(args.data_dir, args.symbols, args.store)
+    space = parse_space(args.param)
+    combinations = grid(space) if args.search == 'grid' else random_search(space, args.samples, args.seed)
+    results = optimize(data, combinations, args.processes, args.rank_by, initial_balance=args.balance)
+    if results.empty:
+        print("Nothing to run.")
+        return
+    results.to_csv(args.out, index=False)
+    print(results.head(10).to_string(index=False))
+    print(f"Ranked results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
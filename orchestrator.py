@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import broker
+from broker import mt5
+from config import Config
+from trade_manager import TradeManager
+from metrics import get_metrics, timer
+
+class WallClock:
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    async def drive(self, orchestrator):
+        pass
+
+class BrokerClock:
+    """
+    Clock of a backend with its own time (the simulator): once every task is
+    asleep, the backend clock jumps to the earliest wake-up time.
+    """
+    def __init__(self):
+        self.sleepers = [] # heap of (wake time, seq, future)
+        self.seq = itertools.count()
+
+    async def sleep(self, seconds):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.sleepers, (broker.timestamp() + seconds, next(self.seq), future))
+        await future
+
+    async def drive(self, orchestrator):
+        while True:
+            # Tasks still working (e.g. on the executor) see a frozen clock
+            waiting = sum(not future.done() for _, _, future in self.sleepers)
+            if waiting < len(orchestrator.tasks):
+                await asyncio.sleep(0.0005)
+                continue
+            wake = self.sleepers[0][0]
+            delay = wake - broker.timestamp()
+            if delay > 0:
+                try:
+                    broker.sleep(delay)
+                except KeyboardInterrupt: # End of the simulation
+                    orchestrator.stop()
+                    return
+            while self.sleepers and self.sleepers[0][0] <= broker.timestamp():
+                _, _, future = heapq.heappop(self.sleepers)
+                if not future.done():
+                    future.set_result(None)
+            await asyncio.sleep(0)
+
+class Orchestrator:
+    """
+    Runs each concern of the bot as its own asyncio task with its own cadence:
+    - trailing: TradeManager.manage_positions every Config.TRAILING_INTERVAL seconds,
+    - account: balance and daily loss limit every Config.ACCOUNT_INTERVAL seconds,
+    - news: calendar refresh every Config.NEWS_REFRESH_INTERVAL seconds,
+    - scan: HTF confluence / LTF arming after each close of the smallest LTF bar,
+    - ticks: TickWatcher quote polling (tick mode only),
+    - metrics: stage timing summary every Config.METRICS_INTERVAL seconds (if enabled).
+    Blocking MT5 and indicator work runs on an executor with one thread per
+    task, so a slow scan never delays a trailing stop update.
+    """
+    def __init__(self, md, scanner, news_manager, clock=None):
+        self.md = md
+        self.scanner = scanner
+        self.news_manager = news_manager
+        if clock is None:
+            # Backends with their own clock are driven in simulated time
+            backend = broker.get_backend()
+            clock = BrokerClock() if not isinstance(backend, broker.MT5Backend) and hasattr(backend, 'sleep') else WallClock()
+        self.clock = clock
+        self.bar_seconds = min(Config.TIMEFRAME_SECONDS[tf] for tf in Config.LTF_TIMEFRAMES)
+        self.trade_manager = TradeManager()
+        self.metrics = get_metrics()
+        self.reported = False
+
+        self.account_balance = None
+        self.daily_start_balance = 0.0
+        self.current_day = None
+        self.paused = False
+
+        self.tasks = []
+        self.executor = None
+        self.stopping = None
+
+    def schedule(self):
+        """
+        (name, blocking step, seconds until its next run) of every task.
+        """
+        tasks = [
+            ('trailing', self.manage_positions, lambda: Config.TRAILING_INTERVAL),
+            ('account', self.check_account, lambda: Config.ACCOUNT_INTERVAL),
+            ('news', self.news_manager.refresh_calendar, lambda: Config.NEWS_REFRESH_INTERVAL),
+            ('scan', self.scan, self.until_bar_close),
+        ]
+        if self.scanner.watcher is not None:
+            tasks.append(('ticks', self.poll_ticks, lambda: self.scanner.watcher.interval))
+        if self.metrics.enabled:
+            tasks.append(('metrics', self.report_metrics, lambda: Config.METRICS_INTERVAL))
+        return tasks
+
+    async def run(self):
+        schedule = self.schedule()
+        self.executor = ThreadPoolExecutor(max_workers=len(schedule), thread_name_prefix="task")
+        self.stopping = asyncio.Event()
+        # Account state first, the scan needs the balance
+        await self.call(self.check_account)
+        self.tasks = [asyncio.create_task(self.every(name, step, delay), name=name) for name, step, delay in schedule]
+        driver = asyncio.create_task(self.clock.drive(self))
+        try:
+            await self.stopping.wait()
+        finally:
+            for task in self.tasks + [driver]:
+                task.cancel()
+            await asyncio.gather(*self.tasks, driver, return_exceptions=True)
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stopping.set()
+
+    async def call(self, step):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.metrics.run, step)
+
+    async def every(self, name, step, delay):
+        while True:
+            try:
+                # Includes the wait for an executor thread
+                with timer(f'task.{name}'):
+                    await self.call(step)
+            except Exception as e:
+                print(f"[{name}] Task step failed: {e}")
+            await self.clock.sleep(delay())
+
+    def until_bar_close(self):
+        # Wake up just after the next close of the smallest LTF bar
+        now = broker.timestamp()
+        return (now // self.bar_seconds + 1) * self.bar_seconds + Config.SCAN_DELAY - now
+
+    def manage_positions(self):
+        with self.md.lock:
+            self.trade_manager.manage_positions()
+
+    def check_account(self):
+        with self.md.lock:
+            account_info = mt5.account_info()
+        if account_info is None:
+            print("Failed to get account info. Skipping this cycle.")
+            return
+
+        # Daily Loss Limit Check
+        # Reset daily balance if new day
+        now = broker.now()
+        if now.day != self.current_day:
+            if self.current_day is not None:
+                print(f"[DAILY] New Day! Resetting Daily Start Balance to ${account_info.balance:.2f}")
+            self.current_day = now.day
+            self.daily_start_balance = account_info.balance
+
+        daily_loss_percent = ((self.daily_start_balance - account_info.equity) / self.daily_start_balance) * 100 \
+            if self.daily_start_balance else 0.0
+        paused = daily_loss_percent >= Config.DAILY_LOSS_LIMIT
+        if paused and not self.paused:
+            print(f"🛑 DAILY LOSS LIMIT HIT! Loss: {daily_loss_percent:.2f}% (Limit: {Config.DAILY_LOSS_LIMIT}%). Pausing trading for today.")
+        self.paused = paused
+        self.account_balance = account_info.balance
+
+    def trading_allowed(self):
+        return self.account_balance is not None and not self.paused
+
+    def scan(self):
+        if not self.trading_allowed():
+            return
+        # News filter, HTF confluence and LTF entries (or tick arming) for every symbol
+        self.scanner.scan(self.account_balance)
+        cache = self.md.cache_stats()
+        analysis = self.scanner.stats()
+        watching = f", watching ticks of {analysis['armed']} symbols" if 'armed' in analysis else ""
+        print(f"[{broker.now().strftime('%H:%M:%S')}] Scan complete (bar cache: {cache['hits']} hits / {cache['misses']} misses, {cache['bytes_fetched'] / 1024:.0f} KB fetched; analyses: {analysis['reused']} reused / {analysis['computed']} computed){watching}.")
+
+    def poll_ticks(self):
+        if self.trading_allowed() and self.scanner.watcher.armed:
+            self.scanner.execution.account_balance = self.account_balance
+            self.scanner.watcher.poll()
+
+    def report_metrics(self):
+        # Nothing to report when the tasks just started
+        if self.reported:
+            self.metrics.report()
+        self.reported = True
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from config import Config
+from kernels import rolling_max, rolling_min, rolling_extrema
+from strategy_sr import SRStrategy
+from fvg_zones import FVGZoneIndex
+from metrics import timed
+
+class Panel:
+    """
+    Rates of many symbols on one timeframe stacked into (symbol x bar)
+    matrices, with the TurtleSoupStrategy indicators of every symbol computed
+    in one vectorized pass per indicator instead of one strategy per symbol.
+
+    Shorter histories are padded with NaN bars in front, which no indicator
+    treats as data: htf_biases() and ltf_signals() give the same answers as
+    analyze_htf() and check_ltf_entry() on each symbol's own frame.
+    """
+    def __init__(self, frames, swing_period=Config.SWING_PERIOD, sr_lookback=20, vol_len=2, box_width_atr=1.0,
+                 atr_period=14, fvg_length=Config.FVG_LENGTH, fvg_mitigation=Config.FVG_MITIGATION_LEVEL,
+                 swing_confirmation=Config.SWING_CONFIRMATION):
+        """
+        frames: symbol -> rates frame (MarketData.get_rates), the last row being the forming bar.
+        """
+        self.symbols = list(frames)
+        self.swing_period = swing_period
+        self.sr_lookback = sr_lookback
+        self.vol_len = vol_len
+        self.box_width_atr = box_width_atr
+        self.atr_period = atr_period
+        self.fvg_length = fvg_length
+        self.fvg_mitigation = fvg_mitigation
+        self.swing_confirmation = swing_confirmation
+
+        self.n = max((len(df) for df in frames.values()), default=0)
+        self.pad = np.array([self.n - len(df) for df in frames.values()], dtype=np.int64)
+        # Prices are compared in float64 (exact for float32 frames too)
+        columns = {}
+        for name in ('open', 'high', 'low', 'close', 'tick_volume'):
+            matrix = np.full((len(self.symbols), self.n), np.nan)
+            for row, df in enumerate(frames.values()):
+                matrix[row, self.pad[row]:] = df[name].to_numpy()
+            columns[name] = matrix
+        self.open = columns['open']
+        self.high = columns['high']
+        self.low = columns['low']
+        self.close = columns['close']
+        self.volume = columns['tick_volume']
+        if self.symbols and self.n:
+            self.process_data()
+
+    @timed()
+    def process_data(self):
+        """
+        Swings, FVGs and S/R breakouts of every symbol, like TurtleSoupStrategy.process_data.
+        """
+        high, low, close = self.high, self.low, self.close
+        with np.errstate(invalid='ignore'):
+            # Major swings (Indicators.identify_swings)
+            p = self.swing_period
+            self.is_swing_high = high == rolling_max(high, 2 * p + 1, center=True)
+            self.is_swing_low = low == rolling_min(low, 2 * p + 1, center=True)
+
+            # Fair Value Gaps (Indicators.find_fvg)
+            prev_high = np.full(high.shape, np.nan)
+            prev_low = np.full(low.shape, np.nan)
+            prev_high[:, 2:] = high[:, :-2]
+            prev_low[:, 2:] = low[:, :-2]
+            self.bullish_fvg = low > prev_high
+            self.bearish_fvg = high < prev_low
+            self.fvg_top = np.where(self.bearish_fvg, prev_low, np.where(self.bullish_fvg, low, np.nan))
+            self.fvg_bottom = np.where(self.bearish_fvg, high, np.where(self.bullish_fvg, prev_high, np.nan))
+
+            # S/R levels and breakouts (SRStrategy); padding bars have NaN volume, so no thresholds
+            delta_vol = np.where(close > self.open, self.volume, -self.volume)
+            vol_hi, vol_lo = rolling_extrema(delta_vol / 2.5, self.vol_len)
+            self.atr = SRStrategy.window_mean(SRStrategy.true_range(high, low, close), self.atr_period)
+            lb = self.sr_lookback
+            is_pivot_high = high == rolling_max(high, 2 * lb + 1, center=True)
+            is_pivot_low = low == rolling_min(low, 2 * lb + 1, center=True)
+            in_range = np.arange(self.n) - self.pad[:, None] >= lb
+            self.sr_support = SRStrategy.carry_forward(low, in_range & is_pivot_low & (delta_vol > vol_hi))
+            self.sr_resistance = SRStrategy.carry_forward(high, in_range & is_pivot_high & (delta_vol < vol_lo))
+            width = self.atr * self.box_width_atr
+            self.broken_support = close < self.sr_support - width
+            self.broken_resistance = close > self.sr_resistance + width
+
+    @timed()
+    def htf_biases(self):
+        """
+        One row per symbol: 'bias' of the last bar (TurtleSoupStrategy.analyze_htf)
+        and its 'support_break' / 'resistance_break' levels (breakout_levels).
+        """
+        bias = np.full(len(self.symbols), None, dtype=object)
+        support_break = np.full(len(self.symbols), np.nan)
+        resistance_break = np.full(len(self.symbols), np.nan)
+        if self.symbols and self.n:
+            curr = self.n - 1
+            end = curr + 1 if self.swing_confirmation == 'forming' else curr - self.swing_period
+            bearish = self._setup(self.is_swing_high, self.high, True, self.broken_support, end)
+            bullish = self._setup(self.is_swing_low, self.low, False, self.broken_resistance, end)
+            bias[bullish] = 'BULLISH'
+            bias[bearish] = 'BEARISH' # checked first by analyze_htf
+            width = self.atr[:, curr] * self.box_width_atr
+            support_break = self.sr_support[:, curr] - width
+            resistance_break = self.sr_resistance[:, curr] + width
+        return self._table(bias=bias, support_break=support_break, resistance_break=resistance_break)
+
+    def _setup(self, is_swing, prices, above, broken, end):
+        """
+        Per symbol: the last swing before end was swept by a later bar, and a
+        breakout flag is set on a bar from the sweep to the last bar.
+        """
+        rows = np.arange(len(self.symbols))
+        columns = np.arange(self.n)
+        swings = is_swing[:, :max(end, 0)]
+        has_swing = swings.any(axis=1)
+        swing = swings.shape[1] - 1 - np.argmax(swings[:, ::-1], axis=1)
+        level = prices[rows, np.where(has_swing, swing, 0)]
+        with np.errstate(invalid='ignore'):
+            beyond = prices > level[:, None] if above else prices < level[:, None]
+        hits = beyond & (columns > swing[:, None])
+        swept = has_swing & hits.any(axis=1)
+        sweep = np.argmax(hits, axis=1)
+        # Breakout flags counted from the sweep bar to the last bar
+        counts = np.concatenate([np.zeros((len(rows), 1), dtype=np.int64), np.cumsum(broken, axis=1)], axis=1)
+        return swept & (counts[:, -1] - counts[rows, sweep] > 0)
+
+    @timed()
+    def ltf_signals(self, biases):
+        """
+        One row per symbol of biases (symbol -> 'BULLISH' / 'BEARISH'): the
+        'signal' of an FVG entry on the last bar ('SELL', 'BUY' or None), the
+        'zone_edge' the SL goes beyond and the 'entry' price, as
+        TurtleSoupStrategy.check_ltf_entry (see TurtleSoupStrategy.build_signal).
+        """
+        signal = np.full(len(self.symbols), None, dtype=object)
+        zone_edge = np.full(len(self.symbols), np.nan)
+        entry = np.full(len(self.symbols), np.nan)
+        if not self.symbols or self.n < 2:
+            return self._table(signal=signal, zone_edge=zone_edge, entry=entry)
+        pos = self.n - 1
+        first = max(pos - self.fvg_length, 0)
+        rows = np.arange(len(self.symbols))
+        bias = np.array([biases.get(symbol) for symbol in self.symbols], dtype=object)
+
+        # Zones created from `first` to the last closed bar, minus those a later closed bar mitigated
+        top = self.fvg_top[:, first:pos]
+        bottom = self.fvg_bottom[:, first:pos]
+        tail = np.empty((len(rows), 1))
+        for side, flags, prices, extreme, beyond, touch in (
+                ('SELL', self.bearish_fvg, self.high, np.maximum, np.greater, self.high[:, pos]),
+                ('BUY', self.bullish_fvg, self.low, np.minimum, np.less, self.low[:, pos])):
+            level = FVGZoneIndex(side == 'SELL', self.fvg_mitigation).level_of(top, bottom)
+            # Extreme of the closed bars after each zone (none after the last closed bar)
+            tail.fill(-np.inf if side == 'SELL' else np.inf)
+            later = np.concatenate([extreme.accumulate(prices[:, first + 1:pos][:, ::-1], axis=1)[:, ::-1], tail], axis=1)
+            with np.errstate(invalid='ignore'):
+                live = flags[:, first:pos] & ~beyond(later, level)
+                inside = live & (bottom <= touch[:, None]) & (touch[:, None] <= top)
+            # The oldest zone the bar trades into
+            zone = np.argmax(inside, axis=1)
+            wanted = bias == ('BEARISH' if side == 'SELL' else 'BULLISH')
+            if side == 'SELL':
+                # No entry on the bar that creates a bearish FVG
+                wanted &= ~self.bearish_fvg[:, pos]
+            hit = wanted & inside.any(axis=1)
+            signal[hit] = side
+            zone_edge[hit] = (top if side == 'SELL' else bottom)[rows, zone][hit]
+            entry[hit] = self.close[hit, pos]
+        return self._table(signal=signal, zone_edge=zone_edge, entry=entry)
+
+    def _table(self, **columns):
+        # Object columns keep None for "no signal" (pandas would infer a string column with NaN)
+        index = pd.Index(self.symbols, name='symbol')
+        return pd.DataFrame({name: pd.Series(values, index=index, dtype=values.dtype) for name, values in columns.items()})
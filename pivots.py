@@ -0,0 +1,92 @@
+from collections import deque
+import numpy as np
+from config import Config
+from kernels import RollingExtreme, rolling_max, rolling_min
+
+class PivotTracker:
+    """
+    Swing highs/lows confirmed when their right-hand window closes, with the
+    timing of Pine's ta.pivothigh(left, right) / ta.pivotlow: bar c is a
+    pivot high once bar c + right has closed and no bar in
+    [c - left, c + right] is higher (ties count, like Indicators.identify_swings).
+
+    Feed closed bars in order with close_bar(). The last `keep` pivots of
+    each side are kept as (absolute bar index, price), the latest is read in O(1).
+    """
+    def __init__(self, left=Config.SWING_PERIOD, right=None, keep=Config.PIVOT_HISTORY):
+        self.left = left
+        self.right = left if right is None else right
+        self.keep = keep
+        self.highs = deque(maxlen=keep)
+        self.lows = deque(maxlen=keep)
+        self.maxima = RollingExtreme('max')
+        self.minima = RollingExtreme('min')
+        # (high, low) of the bars from the next pivot candidate on
+        self.pending = deque(maxlen=self.right + 1)
+        self.start = None # index of the first bar fed
+
+    def close_bar(self, index, high, low):
+        """
+        Feeds the closed bar at `index`. Returns the pivots it confirms as (side, index, price).
+        """
+        if self.start is None:
+            self.start = index
+        first = index - self.left - self.right
+        self.maxima.push(index, high)
+        self.minima.push(index, low)
+        self.maxima.evict_before(first)
+        self.minima.evict_before(first)
+        self.pending.append((high, low))
+        if first < self.start:
+            return []
+        events = []
+        c = index - self.right
+        center_high, center_low = self.pending[0]
+        if center_high == self.maxima.best(high):
+            self.highs.append((c, center_high))
+            events.append(('high', c, center_high))
+        if center_low == self.minima.best(low):
+            self.lows.append((c, center_low))
+            events.append(('low', c, center_low))
+        return events
+
+    def seed(self, high, low, offset=0):
+        """
+        Resets the state to the closed bars high/low (arrays, bar indices from
+        offset on), finding their pivots in one vectorized pass.
+        """
+        high = np.asarray(high)
+        low = np.asarray(low)
+        n = len(high)
+        for window in (self.maxima, self.minima):
+            window.clear()
+        self.highs.clear()
+        self.lows.clear()
+        self.pending.clear()
+        self.start = offset if n else None
+        if n == 0:
+            return
+
+        # Trailing extremes at c + right are the centered ones at c (NaN, i.e. no pivot, until the window is full)
+        size = self.left + self.right + 1
+        candidates = slice(0, max(n - self.right, 0))
+        with np.errstate(invalid='ignore'):
+            is_high = high[candidates] == rolling_max(high, size)[self.right:]
+            is_low = low[candidates] == rolling_min(low, size)[self.right:]
+        for c in np.flatnonzero(is_high)[-self.keep:]:
+            self.highs.append((offset + int(c), high[c]))
+        for c in np.flatnonzero(is_low)[-self.keep:]:
+            self.lows.append((offset + int(c), low[c]))
+
+        for i in range(max(0, n - size + 1), n):
+            self.maxima.push(offset + i, high[i])
+            self.minima.push(offset + i, low[i])
+        for i in range(max(0, n - self.right - 1), n):
+            self.pending.append((high[i], low[i]))
+
+    def last(self, side):
+        """
+        (index, price) of the latest confirmed pivot 'high' or 'low', or None.
+        """
+        pivots = self.highs if side == 'high' else self.lows
+        return pivots[-1] if pivots else None
@@ -0,0 +1,86 @@
+import numpy as np
+from bar_store import RATES_DTYPE
+from config import Config
+
+def bucket_times(times, seconds, offset=0):
+    """
+    Open time of the `seconds`-long bar each epoch time falls in. Bars are
+    aligned to server midnight like MT5 bars, shifted by `offset` seconds for
+    sessions that open off the grid.
+    """
+    return (times - offset) // seconds * seconds + offset
+
+def aggregate(rates, seconds, offset=0):
+    """
+    Rates (RATES_DTYPE, ascending, epoch seconds) folded into `seconds`-long bars:
+    first open, highest high, lowest low, last close, summed volumes and the
+    spread of the last bar (like the simulator's forming bars).
+    """
+    if len(rates) == 0:
+        return np.zeros(0, dtype=RATES_DTYPE)
+    buckets = bucket_times(rates['time'], seconds, offset)
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    ends = np.append(starts[1:], len(rates)) - 1
+    bars = np.zeros(len(starts), dtype=RATES_DTYPE)
+    bars['time'] = buckets[starts]
+    bars['open'] = rates['open'][starts]
+    bars['high'] = np.maximum.reduceat(rates['high'], starts)
+    bars['low'] = np.minimum.reduceat(rates['low'], starts)
+    bars['close'] = rates['close'][ends]
+    bars['tick_volume'] = np.add.reduceat(rates['tick_volume'], starts)
+    bars['real_volume'] = np.add.reduceat(rates['real_volume'], starts)
+    bars['spread'] = rates['spread'][ends]
+    return bars
+
+class BarAggregator:
+    """
+    Keeps the higher timeframes of a symbol current from its base (M1) bars.
+
+    Each timeframe is seeded once with its own history (download or bar
+    store); after that one delta fetch of the base timeframe per scan is
+    folded into every cached timeframe, rebuilding their forming bars from
+    the base bars they contain. Bars from base bars are identical to the
+    broker's, which builds both from the same ticks.
+    """
+    def __init__(self, base=None, offsets=None, refresh=None, base_bars=500):
+        self.base = Config.RESAMPLE_BASE if base is None else base
+        self.base_seconds = Config.TIMEFRAME_SECONDS[self.base]
+        # Base bars kept: at least two bars of the largest timeframe, and what the scan requests
+        largest = max(Config.TIMEFRAME_SECONDS[tf] for tf in Config.HTF_TIMEFRAMES + Config.LTF_TIMEFRAMES)
+        self.base_bars = max(base_bars, 2 * largest // self.base_seconds)
+        self.offsets = Config.RESAMPLE_OFFSETS if offsets is None else offsets
+        self.refresh = Config.RESAMPLE_REFRESH if refresh is None else refresh
+        self.refreshed = {} # symbol -> broker time of the last base fetch
+        self.folds = 0      # higher timeframe updates served without a fetch
+        self.reseeds = 0    # timeframes the base bars could not cover
+
+    def covers(self, timeframe):
+        """
+        True if timeframe can be built from base bars.
+        """
+        seconds = Config.TIMEFRAME_SECONDS.get(timeframe)
+        return timeframe != self.base and seconds is not None and seconds % self.base_seconds == 0
+
+    def due(self, symbol, now):
+        """
+        True if the base bars of symbol were not fetched within the last `refresh` seconds.
+        """
+        return now - self.refreshed.get(symbol, float('-inf')) >= self.refresh
+
+    def fold(self, symbol, timeframe, base_buffer, buffer, since):
+        """
+        Rates of `timeframe` from its forming bar (or the bar holding `since`,
+        if older) to the newest base bar, or None if the base bars don't reach
+        back far enough and the timeframe has to be downloaded again.
+        """
+        seconds = Config.TIMEFRAME_SECONDS[timeframe]
+        offset = self.offsets.get(symbol, 0)
+        start = min(int(bucket_times(since, seconds, offset)), buffer.last_time())
+        if len(base_buffer) == 0 or base_buffer.first_time() > start:
+            self.reseeds += 1
+            return None
+        self.folds += 1
+        return aggregate(base_buffer.records(start), seconds, offset)
+
+    def stats(self):
+        return {'folds': self.folds, 'reseeds': self.reseeds}
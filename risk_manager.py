@@ -1,4 +1,4 @@
-import MetaTrader5 as mt5
+from symbol_registry import get_registry
 
 class RiskManager:
     @staticmethod
@@ -16,18 +16,31 @@ class RiskManager:
         Returns:
             Calculated lot size, capped at max allowed
         """
-        # Get symbol info
-        symbol_info = mt5.symbol_info(symbol)
+        # Get symbol info (cached contract spec)
+        symbol_info = get_registry().spec(symbol)
         if symbol_info is None:
             print(f"Failed to get symbol info for {symbol}")
             return 0.01  # Default fallback
         
+        lot_size = RiskManager.size_from_spec(symbol_info, sl_distance_price, risk_percent, account_balance, max_lots)
+        if lot_size is None:
+            print(f"Invalid risk calculation for {symbol}")
+            return 0.01
+            
+        print(f"[RISK] {symbol}: Balance=${account_balance:.2f}, Risk={risk_percent}%, SL Dist={sl_distance_price:.5f}, Max Cap={max_lots}, Final Lot={lot_size:.2f}")
+        
+        return lot_size
+
+    @staticmethod
+    def size_from_spec(symbol_info, sl_distance_price, risk_percent, account_balance, max_lots=None):
+        """
+        Lot size for a contract spec (anything with the mt5.symbol_info fields
+        point, trade_tick_value, volume_min, volume_max, volume_step).
+        Returns None if the risk per lot cannot be computed.
+        """
         # Calculate risk amount in account currency
         risk_amount = account_balance * (risk_percent / 100.0)
         
-        # Get contract size (e.g., 100,000 for standard lot)
-        contract_size = symbol_info.trade_contract_size
-        
         # Calculate pip value for 1 lot
         # For forex pairs like EURUSD, 1 pip = 0.0001
         # Pip value = (0.0001 / current_price) * contract_size for XXX/USD
@@ -43,8 +56,7 @@ class RiskManager:
         risk_per_lot = sl_distance_ticks * tick_value
         
         if risk_per_lot <= 0:
-            print(f"Invalid risk calculation for {symbol}")
-            return 0.01
+            return None
         
         # Calculate lot size
         lot_size = risk_amount / risk_per_lot
@@ -63,7 +75,23 @@ class RiskManager:
         # Apply custom max cap if provided
         if max_lots is not None:
             lot_size = min(lot_size, max_lots)
-            
-        print(f"[RISK] {symbol}: Balance=${account_balance:.2f}, Risk={risk_percent}%, SL Dist={sl_distance_price:.5f}, Max Cap={max_lots}, Final Lot={lot_size:.2f}")
         
         return lot_size
+
+    @staticmethod
+    def confluence_tier(confluence_score):
+        """
+        Risk:Reward ratio and max lot cap for a HTF confluence score
+        (number of higher timeframes agreeing on the bias).
+        """
+        rr_ratio = 3.0
+        max_lot_cap = 0.03  # Low confidence cap
+        
+        if confluence_score == 2:
+            rr_ratio = 5.0
+            max_lot_cap = 0.06 # Medium confidence cap
+        elif confluence_score >= 3:
+            rr_ratio = 7.0
+            max_lot_cap = 0.10 # High confidence cap
+        
+        return rr_ratio, max_lot_cap
@@ -0,0 +1,379 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import broker
+from config import Config
+from strategy import TurtleSoupStrategy
+from incremental import IncrementalIndicators
+from panel import Panel
+from scheduler import BarScheduler
+from execution import Execution
+from risk_manager import RiskManager
+from tick_watcher import TickWatcher
+from metrics import timer, context, get_metrics
+
+class Analyzer:
+    """
+    Strategy analysis on top of the incremental indicator state of each
+    (symbol, timeframe), so only bars that changed since the last scan are processed.
+    """
+    def __init__(self):
+        self.indicator_streams = {}
+
+    def get_stream(self, symbol, timeframe, df):
+        key = (symbol, timeframe)
+        stream = self.indicator_streams.get(key)
+        if stream is None:
+            stream = IncrementalIndicators(max_bars=len(df))
+            self.indicator_streams[key] = stream
+        stream.sync(df)
+        return stream
+
+    def get_strategy(self, symbol, timeframe, df):
+        stream = self.get_stream(symbol, timeframe, df)
+        return TurtleSoupStrategy(stream.frame(tail=len(df)), processed=True, fvg_zones=stream.fvg_zones,
+                                  pivots=stream.pivots, bar_offset=stream.first_bar(tail=len(df)))
+
+    def htf(self, symbol, timeframe, df):
+        """
+        Returns (bias, breakout_levels) for an HTF frame.
+        """
+        with context(symbol, timeframe):
+            strategy = self.get_strategy(symbol, timeframe, df)
+            return strategy.analyze_htf(), strategy.breakout_levels()
+
+    def ltf(self, symbol, timeframe, df, bias, rr_ratio):
+        with context(symbol, timeframe):
+            return self.get_strategy(symbol, timeframe, df).check_ltf_entry(bias, rr_ratio=rr_ratio)
+
+    def zones(self, symbol, timeframe, df, bias):
+        """
+        Live FVG zones an entry in the direction of bias may trade on the
+        forming bar, as (top, bottom, mitigation level, creation bar time).
+        """
+        with context(symbol, timeframe):
+            stream = self.get_stream(symbol, timeframe, df)
+        index = stream.fvg_zones.bearish if bias == 'BEARISH' else stream.fvg_zones.bullish
+        return [(zone.top, zone.bottom, zone.level, stream.bar_time(zone.created)) for zone in index.live.values()]
+
+# Analyzer of a scan worker process (one per process, created on first use)
+_process_analyzer = None
+
+def _analyze_in_process(method, *args):
+    global _process_analyzer
+    if _process_analyzer is None:
+        _process_analyzer = Analyzer()
+    return getattr(_process_analyzer, method)(*args)
+
+class ExecutionQueue:
+    """
+    Sizes and places orders one at a time, in the order the scan produced them.
+    With threaded=True a single background thread drains the queue, so orders
+    go out as soon as a symbol is analysed while the other symbols keep scanning.
+    """
+    def __init__(self, mt5_lock, threaded=True):
+        self.mt5_lock = mt5_lock
+        self.account_balance = 0.0
+        self.orders = queue.Queue()
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self._run, name="execution", daemon=True)
+            self.thread.start()
+
+    def submit(self, order):
+        if self.thread is None:
+            self._execute(order)
+        else:
+            self.orders.put(order)
+
+    def join(self):
+        """
+        Waits until every submitted order has been handled.
+        """
+        self.orders.join()
+
+    def _run(self):
+        while True:
+            order = self.orders.get()
+            try:
+                self._execute(order)
+            except Exception as e:
+                print(f"[{order['symbol']}] Order execution failed: {e}")
+            finally:
+                self.orders.task_done()
+
+    def _execute(self, order):
+        signal = order['signal']
+        with self.mt5_lock:
+            # Calculate position size based on risk
+            sl_distance = abs(signal['sl'] - signal['entry'])
+            with timer('risk_sizing', order['symbol'], order['timeframe']):
+                volume = RiskManager.calculate_lot_size(
+                    symbol=order['symbol'],
+                    sl_distance_price=sl_distance,
+                    risk_percent=Config.RISK_PERCENT,
+                    account_balance=self.account_balance,
+                    max_lots=order['max_lot_cap']
+                )
+
+            if volume > 0:
+                Execution.place_order(
+                    symbol=order['symbol'],
+                    order_type=signal['signal'],
+                    volume=volume,
+                    sl=signal['sl'],
+                    tp=signal['tp'],
+                    comment=f"Turtle Soup {order['timeframe']} Score:{order['score']}",
+                    signal_time=order.get('signal_time'),
+                    timeframe=order['timeframe'],
+                    score=order['score']
+                )
+
+class Scanner:
+    """
+    One scan over Config.SYMBOLS: HTF confluence, then LTF entries, with orders
+    handed to the ExecutionQueue.
+
+    workers > 1 scans that many symbols at once on threads (MT5 calls are
+    serialized by MarketData.lock, the indicator work overlaps).
+    processes > 0 additionally runs the indicator work in that many worker
+    processes; each symbol always goes to the same process, which keeps its
+    incremental indicator state.
+    tick_mode=True leaves LTF entries to a TickWatcher: the scan only arms the
+    symbols with an HTF bias with their live FVG zones.
+    panel=True analyses every symbol of a timeframe in one Panel instead of
+    one strategy per symbol (workers and processes then only serve the zones
+    of tick mode).
+    """
+    def __init__(self, md, news_manager, workers=Config.SCAN_WORKERS, processes=Config.SCAN_PROCESSES,
+                 tick_mode=Config.TICK_MODE_ENABLE, panel=Config.SCAN_PANEL):
+        self.md = md
+        self.panel = panel
+        self.news_manager = news_manager
+        # Analysis results reused until a new bar closes on their timeframe
+        self.scheduler = BarScheduler()
+        self.analyzer = Analyzer()
+        self.threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") if workers > 1 else None
+        self.processes = [ProcessPoolExecutor(max_workers=1) for _ in range(processes)]
+        self.slots = {symbol: i % processes for i, symbol in enumerate(Config.SYMBOLS)} if processes > 0 else {}
+        self.execution = ExecutionQueue(md.lock, threaded=self.threads is not None)
+        self.watcher = TickWatcher(md, self.execution) if tick_mode else None
+
+    def scan(self, account_balance):
+        self.execution.account_balance = account_balance
+        if self.panel:
+            self.scan_panel()
+        elif self.threads is None:
+            for base_symbol in Config.SYMBOLS:
+                self.scan_symbol(base_symbol)
+        else:
+            metrics = get_metrics()
+            futures = [self.threads.submit(metrics.run, self.scan_symbol, base_symbol) for base_symbol in Config.SYMBOLS]
+            for future in futures:
+                future.result()
+        self.execution.join()
+
+    def scan_symbol(self, base_symbol):
+        with timer('scan_symbol', base_symbol):
+            self._scan_symbol(base_symbol)
+
+    def _scan_symbol(self, base_symbol):
+        # 2. News Filter Check
+        if self.news_manager.is_news_impact(base_symbol):
+            self._disarm(base_symbol)
+            return
+
+        # Resolve Broker Specific Symbol (handles suffixes like EURUSD.m)
+        symbol = self.md.resolve_symbol(base_symbol)
+        if not symbol:
+            return
+
+        # 3. Analyze Higher Timeframes (HTF)
+        biases = []
+
+        for tf in Config.HTF_TIMEFRAMES:
+            df_htf = self.md.get_rates(symbol, tf, num_bars=500)
+            if df_htf is not None and not df_htf.empty:
+                key = (symbol, tf, 'HTF')
+                cached = self.scheduler.lookup(key, df_htf)
+                if cached is not None:
+                    bias = cached.result
+                else:
+                    bias, levels = self._analyze(base_symbol, 'htf', symbol, tf, df_htf)
+                    self.scheduler.store(key, df_htf, bias, close_levels=levels)
+
+                if bias:
+                    print(f"[{symbol}] HTF SETUP DETECTED on {tf}: {bias}")
+                    biases.append(bias)
+
+        # Check Confluence
+        htf_bias, confluence_score = TurtleSoupStrategy.combine_biases(biases)
+        if biases and htf_bias is None:
+            print(f"[{symbol}] Conflicting HTF signals. Skipping.")
+        if not htf_bias:
+            self._disarm(base_symbol)
+            return
+
+        # 4. Execute on Lower Timeframes (LTF)
+        # Determine Risk:Reward Ratio and Max Lot Cap based on Confluence
+        rr_ratio, max_lot_cap = RiskManager.confluence_tier(confluence_score)
+
+        print(f"[{symbol}] Switching to LTF Execution for {htf_bias} bias (Score: {confluence_score}, RR: 1:{rr_ratio}, MaxLot: {max_lot_cap})...")
+
+        if self.watcher is not None:
+            # Entries come from the tick watcher, hand it the zones to watch
+            zones, bars = {}, {}
+            for tf in Config.LTF_TIMEFRAMES:
+                df_ltf = self.md.get_rates(symbol, tf, num_bars=500)
+                if df_ltf is not None and not df_ltf.empty:
+                    zones[tf] = self._analyze(base_symbol, 'zones', symbol, tf, df_ltf, htf_bias)
+                    bars[tf] = TickWatcher.forming_bar(df_ltf, tf)
+            self.watcher.arm(base_symbol, symbol, htf_bias, confluence_score, rr_ratio, max_lot_cap, zones, bars)
+            return
+
+        for tf in Config.LTF_TIMEFRAMES:
+            df_ltf = self.md.get_rates(symbol, tf, num_bars=500)
+            if df_ltf is not None and not df_ltf.empty:
+                key = (symbol, tf, 'LTF', htf_bias, rr_ratio)
+                cached = self.scheduler.lookup(key, df_ltf)
+                if cached is not None:
+                    signal = cached.result
+                else:
+                    signal = self._analyze(base_symbol, 'ltf', symbol, tf, df_ltf, htf_bias, rr_ratio)
+                    # Entry/TP are priced off the close, so a signal is only reused for an unchanged close
+                    self.scheduler.store(key, df_ltf, signal, close_sensitive=signal is not None)
+
+                if signal:
+                    print(f"[{symbol}] LTF ENTRY SIGNAL on {tf}: {signal}")
+                    self.execution.submit({
+                        'symbol': symbol,
+                        'timeframe': tf,
+                        'signal': signal,
+                        'score': confluence_score,
+                        'max_lot_cap': max_lot_cap,
+                        'signal_time': broker.timestamp(),
+                    })
+                    # For safety, break and wait for next loop
+                    break
+
+    def scan_panel(self):
+        """
+        The scan of _scan_symbol with each timeframe analysed for all symbols at
+        once: the symbols whose cached result is stale go into one Panel.
+        """
+        symbols = {} # base symbol -> broker symbol
+        for base_symbol in Config.SYMBOLS:
+            if self.news_manager.is_news_impact(base_symbol):
+                self._disarm(base_symbol)
+                continue
+            symbol = self.md.resolve_symbol(base_symbol)
+            if symbol:
+                symbols[base_symbol] = symbol
+
+        # HTF biases of every symbol, one panel per timeframe
+        biases = {base_symbol: [] for base_symbol in symbols}
+        for tf in Config.HTF_TIMEFRAMES:
+            results, frames = {}, {}
+            for base_symbol, symbol in symbols.items():
+                df_htf = self.md.get_rates(symbol, tf, num_bars=500)
+                if df_htf is None or df_htf.empty:
+                    continue
+                cached = self.scheduler.lookup((symbol, tf, 'HTF'), df_htf)
+                if cached is not None:
+                    results[base_symbol] = cached.result
+                else:
+                    frames[base_symbol] = df_htf
+            if frames:
+                with timer('analyze.panel_htf', None, tf):
+                    table = Panel(frames).htf_biases()
+                for base_symbol, df_htf in frames.items():
+                    row = table.loc[base_symbol]
+                    results[base_symbol] = self.scheduler.store((symbols[base_symbol], tf, 'HTF'), df_htf, row['bias'],
+                                                                close_levels=[row['support_break'], row['resistance_break']])
+            for base_symbol, bias in results.items():
+                if bias:
+                    print(f"[{symbols[base_symbol]}] HTF SETUP DETECTED on {tf}: {bias}")
+                    biases[base_symbol].append(bias)
+
+        # Check Confluence
+        pending = {} # base symbol -> (bias, confluence score, RR, max lot cap)
+        for base_symbol, symbol in symbols.items():
+            htf_bias, confluence_score = TurtleSoupStrategy.combine_biases(biases[base_symbol])
+            if biases[base_symbol] and htf_bias is None:
+                print(f"[{symbol}] Conflicting HTF signals. Skipping.")
+            if not htf_bias:
+                self._disarm(base_symbol)
+                continue
+            rr_ratio, max_lot_cap = RiskManager.confluence_tier(confluence_score)
+            print(f"[{symbol}] Switching to LTF Execution for {htf_bias} bias (Score: {confluence_score}, RR: 1:{rr_ratio}, MaxLot: {max_lot_cap})...")
+            if self.watcher is not None:
+                zones, bars = {}, {}
+                for tf in Config.LTF_TIMEFRAMES:
+                    df_ltf = self.md.get_rates(symbol, tf, num_bars=500)
+                    if df_ltf is not None and not df_ltf.empty:
+                        zones[tf] = self._analyze(base_symbol, 'zones', symbol, tf, df_ltf, htf_bias)
+                        bars[tf] = TickWatcher.forming_bar(df_ltf, tf)
+                self.watcher.arm(base_symbol, symbol, htf_bias, confluence_score, rr_ratio, max_lot_cap, zones, bars)
+                continue
+            pending[base_symbol] = (htf_bias, confluence_score, rr_ratio, max_lot_cap)
+
+        # LTF entries, one panel per timeframe over the symbols without an entry yet
+        for tf in Config.LTF_TIMEFRAMES:
+            results, frames = {}, {}
+            for base_symbol, (htf_bias, _, rr_ratio, _) in pending.items():
+                df_ltf = self.md.get_rates(symbols[base_symbol], tf, num_bars=500)
+                if df_ltf is None or df_ltf.empty:
+                    continue
+                cached = self.scheduler.lookup((symbols[base_symbol], tf, 'LTF', htf_bias, rr_ratio), df_ltf)
+                if cached is not None:
+                    results[base_symbol] = cached.result
+                else:
+                    frames[base_symbol] = df_ltf
+            if frames:
+                with timer('analyze.panel_ltf', None, tf):
+                    table = Panel(frames).ltf_signals({base_symbol: pending[base_symbol][0] for base_symbol in frames})
+                for base_symbol, df_ltf in frames.items():
+                    htf_bias, _, rr_ratio, _ = pending[base_symbol]
+                    row = table.loc[base_symbol]
+                    signal = None
+                    if row['signal'] is not None:
+                        signal = TurtleSoupStrategy.build_signal(row['signal'], row['zone_edge'], row['entry'], rr_ratio)
+                    # Entry/TP are priced off the close, so a signal is only reused for an unchanged close
+                    results[base_symbol] = self.scheduler.store((symbols[base_symbol], tf, 'LTF', htf_bias, rr_ratio), df_ltf,
+                                                                signal, close_sensitive=signal is not None)
+            for base_symbol, signal in results.items():
+                if signal:
+                    symbol = symbols[base_symbol]
+                    print(f"[{symbol}] LTF ENTRY SIGNAL on {tf}: {signal}")
+                    _, confluence_score, _, max_lot_cap = pending.pop(base_symbol)
+                    self.execution.submit({
+                        'symbol': symbol,
+                        'timeframe': tf,
+                        'signal': signal,
+                        'score': confluence_score,
+                        'max_lot_cap': max_lot_cap,
+                        'signal_time': broker.timestamp(),
+                    })
+
+    def _disarm(self, base_symbol):
+        if self.watcher is not None:
+            self.watcher.disarm(base_symbol)
+
+    def _analyze(self, base_symbol, method, *args):
+        # args start with (symbol, timeframe); covers the time spent in a worker process too
+        with timer(f'analyze.{method}', args[0], args[1]):
+            if not self.processes:
+                return getattr(self.analyzer, method)(*args)
+            return self.processes[self.slots[base_symbol]].submit(_analyze_in_process, method, *args).result()
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        if self.watcher is not None:
+            stats.update(self.watcher.stats())
+        return stats
+
+    def shutdown(self):
+        if self.threads is not None:
+            self.threads.shutdown(wait=True)
+        for pool in self.processes:
+            pool.shutdown(wait=True)
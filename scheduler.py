@@ -0,0 +1,72 @@
+import threading
+import numpy as np
+
+class ScheduledResult:
+    def __init__(self, result, bar_time, high, low, close, close_levels, close_sensitive):
+        self.result = result
+        self.bar_time = bar_time
+        self.high = high
+        self.low = low
+        self.close = close
+        self.close_levels = close_levels
+        self.close_sensitive = close_sensitive
+
+class BarScheduler:
+    """
+    Memoizes analysis results per key (symbol, timeframe, ...) until they can change.
+
+    A result computed on a frame stays valid while:
+    - the forming bar is the same (no new bar has closed),
+    - its high/low have not extended (swings, sweeps, pivots, FVGs and ATR
+      only see the forming bar through its high/low),
+    - its close has not crossed any of `close_levels` (e.g. S/R box edges),
+      or, for close_sensitive results, has not moved at all.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock() # counters are shared by the scan threads
+
+    def lookup(self, key, df):
+        """
+        Returns the stored ScheduledResult if it is still valid for df, else None.
+        """
+        entry = self.entries.get(key)
+        valid = entry is not None and self._is_valid(entry, df.iloc[-1])
+        with self.lock:
+            if valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry if valid else None
+
+    def store(self, key, df, result, close_levels=(), close_sensitive=False):
+        bar = df.iloc[-1]
+        self.entries[key] = ScheduledResult(result, bar['time'], bar['high'], bar['low'], bar['close'],
+                                            [level for level in close_levels if not np.isnan(level)],
+                                            close_sensitive)
+        return result
+
+    def _is_valid(self, entry, bar):
+        if bar['time'] != entry.bar_time:
+            return False
+        if bar['high'] != entry.high or bar['low'] != entry.low:
+            return False
+        close = bar['close']
+        if close == entry.close:
+            return True
+        if entry.close_sensitive:
+            return False
+        for level in entry.close_levels:
+            if (entry.close < level) != (close < level) or (entry.close > level) != (close > level):
+                return False
+        return True
+
+    def forget(self, symbol):
+        for key in list(self.entries):
+            if key[0] == symbol:
+                del self.entries[key]
+
+    def stats(self):
+        return {'reused': self.hits, 'computed': self.misses}
@@ -0,0 +1,442 @@
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import broker
+from config import Config
+from bar_store import BarStore, RATES_DTYPE
+from backtest import DEFAULT_SPECS, FX_SPEC
+from journal import TradeJournal, print_report
+from metrics import Metrics, set_metrics
+
+class SimulationFinished(KeyboardInterrupt):
+    """
+    Raised by sleep() once the clock runs past the stored bars, so main()
+    shuts down as it does on Ctrl+C.
+    """
+
+class SimulatedBroker:
+    """
+    Offline MT5 backend replaying stored bars on a simulated clock.
+
+    - Bars are visible once they open. A forming bar is built from the closed
+      bars of the symbol's smallest timeframe plus the open of its current bar,
+      so nothing after the clock leaks into rates.
+    - Prices (ticks) are the open of the current smallest-timeframe bar;
+      the ask adds the bar's spread.
+    - Orders fill after `latency` seconds of simulated time, `slippage_points`
+      (random, adverse) away from the quote, and are rejected when that is
+      more than the request's deviation.
+    - SL/TP of open positions are checked against every bar that closes (SL first).
+    - sleep() advances the clock instantly.
+    """
+    TIMEFRAME_M1 = 1
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_M15 = 15
+    TIMEFRAME_H1 = 16385
+    TIMEFRAME_H2 = 16386
+    TIMEFRAME_H4 = 16388
+    TIMEFRAME_D1 = 16408
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_SLTP = 6
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_IOC = 1
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_INVALID = 10013
+
+    TIMEFRAMES = {1: "M1", 5: "M5", 15: "M15", 16385: "H1", 16386: "H2", 16388: "H4", 16408: "D1"}
+
+    def __init__(self, bars, specs=None, balance=10000.0, latency=0.0, slippage_points=0, start=None, seed=0):
+        """
+        bars: {symbol: {timeframe: MT5 rates array}}.
+        start: epoch seconds or datetime; defaults to the first time every
+        timeframe has 500 closed bars (what the bot requests).
+        """
+        self.specs = specs or {}
+        self.latency = latency
+        self.slippage_points = slippage_points
+        self.rng = random.Random(seed)
+        self.feeds = {}
+        self.base = {}
+        for symbol, frames in bars.items():
+            self.feeds[symbol] = {}
+            for tf, rates in frames.items():
+                rates = BarStore._as_records(rates)
+                self.feeds[symbol][tf] = (rates['time'].copy(), rates)
+            self.base[symbol] = min(frames, key=lambda tf: Config.TIMEFRAME_SECONDS[tf])
+        self.symbols = list(self.feeds)
+
+        if start is None:
+            warm_up = []
+            for frames in self.feeds.values():
+                for tf, (times, _) in frames.items():
+                    warm_up.append(times[min(499, len(times) - 1)] + Config.TIMEFRAME_SECONDS[tf])
+            start = max(warm_up)
+        self.clock = float(start if isinstance(start, (int, float, np.integer)) else BarStore._epoch(start))
+        # Close time of the last base bar of any symbol
+        self.end = max(self.feeds[symbol][self.base[symbol]][0][-1] + Config.TIMEFRAME_SECONDS[self.base[symbol]]
+                       for symbol in self.symbols)
+
+        self.balance = balance
+        self.positions = {}
+        self.deals = []
+        self.next_ticket = 1
+        # Closed bars of each base feed already checked for SL/TP
+        self.checked = {symbol: self._closed(symbol, self.base[symbol]) for symbol in self.symbols}
+        self.calls = 0
+
+    def now(self):
+        return datetime.fromtimestamp(self.clock, tz=timezone.utc).replace(tzinfo=None)
+
+    def sleep(self, seconds):
+        self.clock += seconds
+        self._advance()
+        if self.clock >= self.end:
+            raise SimulationFinished()
+
+    def initialize(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        pass
+
+    def last_error(self):
+        return (1, 'Success')
+
+    def terminal_info(self):
+        return SimpleNamespace(connected=True, name='Simulator')
+
+    def account_info(self):
+        self._advance()
+        floating = sum(self._profit(p, self._exit_price(p)) for p in self.positions.values())
+        equity = self.balance + floating
+        return SimpleNamespace(login=0, balance=self.balance, equity=equity, profit=floating,
+                               margin_free=equity, currency='USD', leverage=100)
+
+    def symbols_get(self):
+        return tuple(SimpleNamespace(name=symbol) for symbol in self.symbols)
+
+    def symbol_select(self, symbol, enable=True):
+        return symbol in self.feeds
+
+    def symbol_info(self, symbol):
+        if symbol not in self.feeds:
+            return None
+        spec = self._spec(symbol)
+        return SimpleNamespace(name=symbol, visible=True, point=spec.point, trade_tick_size=spec.point,
+                               digits=max(0, int(round(-np.log10(spec.point)))),
+                               trade_tick_value=spec.trade_tick_value, trade_contract_size=spec.trade_contract_size,
+                               volume_min=spec.volume_min, volume_max=spec.volume_max, volume_step=spec.volume_step)
+
+    def symbol_info_tick(self, symbol):
+        if symbol not in self.feeds:
+            return None
+        self._advance()
+        bid, ask = self._quote(symbol)
+        return SimpleNamespace(time=int(self.clock), time_msc=int(self.clock * 1000), bid=bid, ask=ask, last=bid)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        series = self._series(symbol, timeframe)
+        if series is None:
+            return None
+        rates, closed, forming = series
+        visible = closed + (1 if forming is not None else 0)
+        end = max(visible - start_pos, 0)
+        return self._assemble(rates, closed, forming, max(end - count, 0), end)
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        series = self._series(symbol, timeframe)
+        if series is None:
+            return None
+        rates, closed, forming = series
+        times = rates['time']
+        first = int(np.searchsorted(times[:closed], self._epoch(date_from), side='left'))
+        last = int(np.searchsorted(times[:closed], self._epoch(date_to), side='right'))
+        end = last
+        if forming is not None and self._epoch(date_from) <= forming['time'] <= self._epoch(date_to):
+            end = closed + 1
+        return self._assemble(rates, closed, forming, first, end)
+
+    def positions_get(self, symbol=None, ticket=None):
+        self._advance()
+        positions = []
+        for p in self.positions.values():
+            if (symbol is None or p['symbol'] == symbol) and (ticket is None or p['ticket'] == ticket):
+                price = self._exit_price(p)
+                positions.append(SimpleNamespace(price_current=price, profit=self._profit(p, price), **p))
+        return tuple(positions)
+
+    def order_send(self, request):
+        self.calls += 1
+        self._advance()
+        if self.latency:
+            # The order reaches the server `latency` seconds later, at that moment's price
+            self.clock += self.latency
+            self._advance()
+
+        if request['action'] == self.TRADE_ACTION_SLTP:
+            p = self.positions.get(request.get('position'))
+            if p is None:
+                return self._result(request, self.TRADE_RETCODE_INVALID, "Position not found")
+            if not self._stops_valid(p['type'] == self.ORDER_TYPE_BUY, p['symbol'], request.get('sl', 0.0), request.get('tp', 0.0)):
+                return self._result(request, self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+            p['sl'] = request.get('sl', 0.0)
+            p['tp'] = request.get('tp', 0.0)
+            return self._result(request, self.TRADE_RETCODE_DONE, "Done", order=p['ticket'])
+
+        if request['action'] != self.TRADE_ACTION_DEAL:
+            return self._result(request, self.TRADE_RETCODE_INVALID, "Unsupported action")
+        symbol = request.get('symbol')
+        if symbol not in self.feeds:
+            return self._result(request, self.TRADE_RETCODE_INVALID, "Unknown symbol")
+        spec = self._spec(symbol)
+
+        is_buy = request['type'] == self.ORDER_TYPE_BUY
+        bid, ask = self._quote(symbol)
+        slippage = self.rng.uniform(0, self.slippage_points) * spec.point
+        price = ask + slippage if is_buy else bid - slippage
+        requested = request.get('price')
+        if requested and abs(price - requested) > request.get('deviation', 0) * spec.point:
+            return self._result(request, self.TRADE_RETCODE_REQUOTE, "Requote", price=price)
+
+        if 'position' in request:
+            p = self.positions.get(request['position'])
+            if p is None:
+                return self._result(request, self.TRADE_RETCODE_INVALID, "Position not found")
+            self._close(p, price, 'CLOSE')
+            return self._result(request, self.TRADE_RETCODE_DONE, "Done", order=p['ticket'], price=price)
+
+        volume = request['volume']
+        steps = round(volume / spec.volume_step)
+        if volume < spec.volume_min or volume > spec.volume_max or abs(steps * spec.volume_step - volume) > 1e-9:
+            return self._result(request, self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+        sl = request.get('sl', 0.0)
+        tp = request.get('tp', 0.0)
+        if not self._stops_valid(is_buy, symbol, sl, tp):
+            return self._result(request, self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.positions[ticket] = {
+            'ticket': ticket, 'symbol': symbol, 'type': request['type'], 'volume': volume,
+            'price_open': price, 'sl': sl, 'tp': tp, 'magic': request.get('magic', 0),
+            'comment': request.get('comment', ''), 'time': int(self.clock),
+        }
+        return self._result(request, self.TRADE_RETCODE_DONE, "Done", order=ticket, price=price)
+
+    def summary(self):
+        deals = pd.DataFrame(self.deals)
+        account = self.account_info()
+        return {
+            'simulated_until': self.now(),
+            'orders_sent': self.calls,
+            'closed_trades': len(deals),
+            'open_positions': len(self.positions),
+            'net_profit': deals['profit'].sum() if len(deals) else 0.0,
+            'balance': account.balance,
+            'equity': account.equity,
+        }
+
+    def _spec(self, symbol):
+        return self.specs.get(symbol) or DEFAULT_SPECS.get(symbol) or FX_SPEC
+
+    def _closed(self, symbol, tf):
+        """
+        Number of bars of (symbol, tf) that have closed by the clock.
+        """
+        times = self.feeds[symbol][tf][0]
+        # Integer keys: a float key would make numpy convert the whole time array on every search
+        return int(np.searchsorted(times, int(self.clock) - Config.TIMEFRAME_SECONDS[tf], side='right'))
+
+    def _series(self, symbol, timeframe):
+        """
+        (rates, closed count, forming bar record or None) as seen at the clock.
+        """
+        tf = self.TIMEFRAMES.get(timeframe, timeframe)
+        if symbol not in self.feeds or tf not in self.feeds[symbol]:
+            return None
+        self._advance()
+        times, rates = self.feeds[symbol][tf]
+        closed = self._closed(symbol, tf)
+        if closed >= len(times) or times[closed] > self.clock:
+            return rates, closed, None
+
+        base_times, base = self.feeds[symbol][self.base[symbol]]
+        base_closed = self._closed(symbol, self.base[symbol])
+        first = int(np.searchsorted(base_times, times[closed], side='left'))
+        parts = base[first:base_closed]
+        forming = np.zeros(1, dtype=RATES_DTYPE)[0]
+        forming['time'] = times[closed]
+        # The current base bar has only opened: it contributes its open price
+        live = base[base_closed] if base_closed < len(base) and base_times[base_closed] <= self.clock else None
+        opens = ([parts['open'][0]] if len(parts) else []) + ([live['open']] if live is not None else [])
+        if not opens:
+            return rates, closed, None
+        highs = list(parts['high']) + ([live['open']] if live is not None else [])
+        lows = list(parts['low']) + ([live['open']] if live is not None else [])
+        forming['open'] = opens[0]
+        forming['high'] = max(highs)
+        forming['low'] = min(lows)
+        forming['close'] = live['open'] if live is not None else parts['close'][-1]
+        forming['tick_volume'] = parts['tick_volume'].sum()
+        forming['real_volume'] = parts['real_volume'].sum()
+        forming['spread'] = live['spread'] if live is not None else parts['spread'][-1]
+        return rates, closed, forming
+
+    @staticmethod
+    def _assemble(rates, closed, forming, first, end):
+        result = np.array(rates[first:min(end, closed)])
+        if forming is not None and end > closed:
+            result = np.concatenate([result, np.array([forming], dtype=RATES_DTYPE)])
+        return result
+
+    def _quote(self, symbol):
+        base_times, base = self.feeds[symbol][self.base[symbol]]
+        i = max(int(np.searchsorted(base_times, int(self.clock), side='right')) - 1, 0)
+        bar = base[i]
+        if base_times[i] + Config.TIMEFRAME_SECONDS[self.base[symbol]] <= self.clock:
+            bid = float(bar['close']) # no bar open right now (gap / market closed)
+        else:
+            bid = float(bar['open'])
+        return bid, bid + float(bar['spread']) * self._spec(symbol).point
+
+    def _exit_price(self, p):
+        bid, ask = self._quote(p['symbol'])
+        return bid if p['type'] == self.ORDER_TYPE_BUY else ask
+
+    def _profit(self, p, exit_price):
+        spec = self._spec(p['symbol'])
+        move = exit_price - p['price_open'] if p['type'] == self.ORDER_TYPE_BUY else p['price_open'] - exit_price
+        return move / spec.point * spec.trade_tick_value * p['volume']
+
+    def _stops_valid(self, is_buy, symbol, sl, tp):
+        bid, ask = self._quote(symbol)
+        price = bid if is_buy else ask
+        if is_buy:
+            return (not sl or sl < price) and (not tp or tp > price)
+        return (not sl or sl > price) and (not tp or tp < price)
+
+    def _close(self, p, price, reason):
+        del self.positions[p['ticket']]
+        profit = self._profit(p, price)
+        self.balance += profit
+        self.deals.append({
+            'ticket': p['ticket'], 'symbol': p['symbol'],
+            'type': 'BUY' if p['type'] == self.ORDER_TYPE_BUY else 'SELL', 'volume': p['volume'],
+            'open_time': p['time'], 'close_time': int(self.clock), 'price_open': p['price_open'],
+            'price_close': price, 'profit': profit, 'reason': reason, 'comment': p['comment'],
+        })
+
+    def _advance(self):
+        """
+        Fills SL/TP of open positions on the base bars closed since the last check.
+        """
+        for symbol in self.symbols:
+            closed = self._closed(symbol, self.base[symbol])
+            start = self.checked[symbol]
+            self.checked[symbol] = closed
+            if closed <= start or not any(p['symbol'] == symbol for p in self.positions.values()):
+                continue
+            _, base = self.feeds[symbol][self.base[symbol]]
+            point = self._spec(symbol).point
+            for bar in base[start:closed]:
+                spread = bar['spread'] * point
+                for p in [p for p in self.positions.values() if p['symbol'] == symbol]:
+                    if p['type'] == self.ORDER_TYPE_BUY:
+                        if p['sl'] and bar['low'] <= p['sl']:
+                            self._close(p, min(bar['open'], p['sl']), 'SL')
+                        elif p['tp'] and bar['high'] >= p['tp']:
+                            self._close(p, max(bar['open'], p['tp']), 'TP')
+                    else:
+                        if p['sl'] and bar['high'] + spread >= p['sl']:
+                            self._close(p, max(bar['open'] + spread, p['sl']), 'SL')
+                        elif p['tp'] and bar['low'] + spread <= p['tp']:
+                            self._close(p, min(bar['open'] + spread, p['tp']), 'TP')
+
+    def _result(self, request, retcode, comment, order=0, price=0.0):
+        return SimpleNamespace(retcode=retcode, order=order, deal=order, volume=request.get('volume', 0.0),
+                               price=price, comment=comment, request=request)
+
+    @staticmethod
+    def _epoch(value):
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return int(value.timestamp())
+        return BarStore._epoch(value)
+
+    @classmethod
+    def from_store(cls, store_dir, symbols, timeframes, **kwargs):
+        store = BarStore(store_dir)
+        bars = {}
+        for symbol in symbols:
+            frames = {tf: store.records(symbol, tf) for tf in timeframes}
+            frames = {tf: records for tf, records in frames.items() if records is not None}
+            if frames:
+                bars[symbol] = frames
+        return cls(bars, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the trading bot against stored bars on a simulated clock.")
+    parser.add_argument('--store', default=Config.BAR_STORE_DIR, help="Bar store directory")
+    parser.add_argument('--symbols', nargs='+', default=Config.SYMBOLS)
+    parser.add_argument('--start', default=None, help="Start time (default: once 500 bars of history exist)")
+    parser.add_argument('--days', type=float, default=None, help="Stop after this many simulated days")
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--latency', type=float, default=0.0, help="Order latency in seconds")
+    parser.add_argument('--slippage', type=float, default=0.0, help="Max adverse slippage in points")
+    parser.add_argument('--tick-interval', type=float, default=60.0,
+                        help="Quote poll interval of the tick watcher (quotes only change once per base bar)")
+    parser.add_argument('--trailing-interval', type=float, default=60.0, help="Trailing stop update interval")
+    parser.add_argument('--journal', default=None, help="Journal the simulated orders to this SQLite file")
+    parser.add_argument('--metrics', default=None, help="Time the scan stages and write them to this JSON file")
+    parser.add_argument('--metrics-interval', type=float, default=86400.0,
+                        help="Simulated seconds between stage timing summaries")
+    args = parser.parse_args()
+
+    sim = SimulatedBroker.from_store(args.store, args.symbols, Config.HTF_TIMEFRAMES + Config.LTF_TIMEFRAMES,
+                                     balance=args.balance, latency=args.latency,
+                                     slippage_points=args.slippage, start=args.start)
+    if not sim.symbols:
+        print(f"No stored bars for {args.symbols} in {args.store}")
+        return
+    if args.days is not None:
+        sim.end = min(sim.end, sim.clock + args.days * 86400)
+    broker.set_backend(sim)
+    # Replay only what is stored, and don't write the replay back into the store
+    Config.SYMBOLS = [s for s in Config.SYMBOLS if s in sim.symbols] or sim.symbols
+    Config.BAR_STORE_ENABLE = False
+    Config.TICK_POLL_INTERVAL = args.tick_interval
+    Config.TRAILING_INTERVAL = args.trailing_interval
+    # Keep simulated orders out of the live journal
+    Config.JOURNAL_ENABLE = args.journal is not None
+    if args.journal is not None:
+        Config.JOURNAL_PATH = args.journal
+    Config.METRICS_ENABLE = args.metrics is not None
+    Config.METRICS_PATH = args.metrics or ""
+    Config.METRICS_INTERVAL = args.metrics_interval
+    set_metrics(Metrics())
+
+    import main as bot
+    started = time.perf_counter()
+    simulated_from = sim.now()
+    bot.main()
+    elapsed = time.perf_counter() - started
+    summary = sim.summary()
+    speedup = (summary['simulated_until'] - simulated_from).total_seconds() / elapsed if elapsed > 0 else 0.0
+    print(f"Simulated {simulated_from} -> {summary['simulated_until']} in {elapsed:.1f}s ({speedup:,.0f}x real time)")
+    for key, value in summary.items():
+        print(f"{key:>16}: {value}")
+    if args.journal is not None:
+        journal = TradeJournal(args.journal)
+        print_report(journal)
+        journal.close()
+
+if __name__ == "__main__":
+    main()
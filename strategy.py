@@ -1,132 +1,193 @@
 from indicators import Indicators
 from strategy_sr import SRStrategy
+from fvg_zones import FVGZones
+from config import Config
+from metrics import timed
+import numpy as np
 import pandas as pd
 
 class TurtleSoupStrategy:
-    def __init__(self, df):
+    SL_BUFFER = 0.0005 # Distance of the SL beyond the FVG edge
+    
+    def __init__(self, df, swing_period=Config.SWING_PERIOD, sr_lookback=20, vol_len=2, box_width_atr=1.0, processed=False,
+                 fvg_length=Config.FVG_LENGTH, fvg_mitigation=Config.FVG_MITIGATION_LEVEL, fvg_zones=None,
+                 pivots=None, bar_offset=0, swing_confirmation=Config.SWING_CONFIRMATION):
+        """
+        processed=True means df already carries the indicator columns
+        (e.g. IncrementalIndicators.frame()) and is used as-is.
+        fvg_zones: FVGZones already advanced over every bar of df but the last
+        (e.g. IncrementalIndicators.fvg_zones), used for entries on the last bar.
+        pivots: PivotTracker fed with every bar of df but the last (e.g.
+        IncrementalIndicators.pivots), used for the swings of the last bar;
+        bar_offset is the absolute bar index of df's first row.
+        swing_confirmation: 'forming' or 'close', see Config.SWING_CONFIRMATION.
+        """
         self.df = df
-        self.process_data()
+        self.swing_period = swing_period
+        self.sr_lookback = sr_lookback
+        self.vol_len = vol_len
+        self.box_width_atr = box_width_atr
+        self.fvg_length = fvg_length
+        self.fvg_mitigation = fvg_mitigation
+        self.fvg_zones = fvg_zones
+        self.pivots = pivots
+        self.bar_offset = bar_offset
+        self.swing_confirmation = swing_confirmation
+        self.replayed_zones = None
+        self.sr_strategy = None
+        if not processed:
+            self.process_data()
         
     def process_data(self):
         # Calculate indicators
-        self.df = Indicators.identify_swings(self.df)
+        self.df = Indicators.identify_swings(self.df, period=self.swing_period)
         self.df = Indicators.identify_mss_swings(self.df)
         self.df = Indicators.find_fvg(self.df)
         
         # Calculate S/R Strategy
-        self.sr_strategy = SRStrategy(self.df)
+        self.sr_strategy = SRStrategy(self.df, lookback=self.sr_lookback, vol_len=self.vol_len,
+                                      box_width_atr=self.box_width_atr)
         # Merge S/R columns into main df for easier access if needed
         self.df['broken_support'] = self.sr_strategy.df['broken_support']
         self.df['broken_resistance'] = self.sr_strategy.df['broken_resistance']
         
+    @timed()
     def analyze_htf(self, current_index=-1):
         """
         Analyzes Higher Timeframe for Setup (Sweep + S/R Break).
         Returns: 'BULLISH', 'BEARISH', or None
         """
         df = self.df
-        curr_idx = df.index[current_index]
+        curr_pos = range(len(df))[current_index]
         
         # 1. Check for Bearish Setup (Sweep High + Break Support)
-        last_major_highs = df[df['is_swing_high']].loc[:curr_idx].tail(5)
-        if not last_major_highs.empty:
-            major_high = last_major_highs.iloc[-1]
-            if self._check_sweep(df, major_high['high'], major_high.name, curr_idx, 'HIGH'):
-                # Check for S/R Confirmation (Break of Support)
-                # We look for ANY recent break of support since the sweep
-                sweep_bar = self._get_sweep_bar(df, major_high['high'], major_high.name, curr_idx, 'HIGH')
-                if sweep_bar and df['broken_support'].loc[sweep_bar:curr_idx].any():
-                    return 'BEARISH'
+        major_high = self.last_swing('high', curr_pos)
+        if major_high is not None:
+            # First bar after the swing that trades above it
+            sweep_bar = Indicators.first_breach(df['high'].to_numpy(), major_high, curr_pos, above=True)
+            # Check for S/R Confirmation (Break of Support)
+            # We look for ANY recent break of support since the sweep
+            if sweep_bar is not None and df['broken_support'].to_numpy()[sweep_bar:curr_pos+1].any():
+                return 'BEARISH'
 
         # 2. Check for Bullish Setup (Sweep Low + Break Resistance)
-        last_major_lows = df[df['is_swing_low']].loc[:curr_idx].tail(5)
-        if not last_major_lows.empty:
-            major_low = last_major_lows.iloc[-1]
-            if self._check_sweep(df, major_low['low'], major_low.name, curr_idx, 'LOW'):
-                # Check for S/R Confirmation (Break of Resistance)
-                sweep_bar = self._get_sweep_bar(df, major_low['low'], major_low.name, curr_idx, 'LOW')
-                if sweep_bar and df['broken_resistance'].loc[sweep_bar:curr_idx].any():
-                    return 'BULLISH'
+        major_low = self.last_swing('low', curr_pos)
+        if major_low is not None:
+            sweep_bar = Indicators.first_breach(df['low'].to_numpy(), major_low, curr_pos, above=False)
+            # Check for S/R Confirmation (Break of Resistance)
+            if sweep_bar is not None and df['broken_resistance'].to_numpy()[sweep_bar:curr_pos+1].any():
+                return 'BULLISH'
                     
         return None
 
+    def last_swing(self, side, curr_pos):
+        """
+        Position of the latest swing 'high' or 'low' known on bar curr_pos, or
+        None. With 'close' confirmation curr_pos is taken as the forming bar
+        and only swings whose window ends at a closed bar count.
+        """
+        forming = self.swing_confirmation == 'forming'
+        flags = self.df[f'is_swing_{side}'].to_numpy()
+        if self.pivots is not None and curr_pos == len(self.df) - 1:
+            # The tracker holds the swings confirmed by closed bars; in 'forming'
+            # mode a swing whose window ends at the forming bar comes first
+            candidate = curr_pos - self.swing_period
+            if forming and candidate >= 0 and flags[candidate]:
+                return candidate
+            pivot = self.pivots.last(side)
+            if pivot is None or pivot[0] < self.bar_offset:
+                return None
+            return pivot[0] - self.bar_offset
+        end = curr_pos + 1 if forming else curr_pos - self.swing_period
+        swings = np.flatnonzero(flags[:max(end, 0)])
+        return swings[-1] if len(swings) else None
+
+    @staticmethod
+    def combine_biases(biases):
+        """
+        HTF confluence: all detected biases must agree.
+        Returns (bias, confluence_score), or (None, 0) if there is no bias or they conflict.
+        """
+        if biases:
+            # Check if all detected biases are in the same direction
+            if all(b == 'BULLISH' for b in biases):
+                return 'BULLISH', len(biases)
+            if all(b == 'BEARISH' for b in biases):
+                return 'BEARISH', len(biases)
+        return None, 0
+
+    def breakout_levels(self, current_index=-1):
+        """
+        Close prices at which the S/R breakout flags of the current bar flip
+        (support box bottom, resistance box top). Used to tell whether a memoized
+        analysis of a still-forming bar is still valid.
+        """
+        row = self.df.iloc[current_index]
+        width = row['atr'] * self.box_width_atr
+        return [row['sr_support'] - width, row['sr_resistance'] + width]
+
+    def zones_before(self, pos):
+        """
+        FVGZones holding the live zones for an entry on bar pos.
+        """
+        if self.fvg_zones is not None and pos == len(self.df) - 1:
+            return self.fvg_zones
+        zones = self.replayed_zones
+        if zones is None or zones.next_bar > pos:
+            zones = FVGZones(self.fvg_length, self.fvg_mitigation)
+        zones.replay(self.df, pos)
+        self.replayed_zones = zones
+        return zones
+
+    @timed()
     def check_ltf_entry(self, bias, rr_ratio=3.0, current_index=-1):
         """
-        Checks Lower Timeframe for Entry (MSS + FVG) in direction of bias.
+        Checks Lower Timeframe for Entry (FVG retrace) in direction of bias.
+        The oldest live FVG (not older than fvg_length bars, not mitigated
+        by an earlier bar) that the current bar trades into is the entry zone.
         Returns: dict with trade details or None
         """
         df = self.df
-        curr_row = df.iloc[current_index]
-        
-        # We assume the bias is active, so we look for immediate entry signals
-        # For simplicity, we check if we are currently in an FVG that formed after a recent MSS
+        pos = range(len(df))[current_index]
+        # Scalar reads straight from the columns, this runs on every LTF scan
+        high = df['high'].to_numpy()[pos]
+        low = df['low'].to_numpy()[pos]
+        close = df['close'].to_numpy()[pos]
         
         if bias == 'BEARISH':
-            # Look for recent MSS Low
-            # And current price inside Bearish FVG
-            if curr_row['bearish_fvg']:
-                 pass # FVG Creation
-            
-            # Check if we are in a valid FVG
-            # In a real LTF loop, we'd track the MSS and FVG more precisely
-            # Here we check if we are in *any* recent unmitigated FVG
-            
-            # Simple check: Are we in a bearish FVG?
-            # And did we have a recent MSS?
-            
-            # Let's just check for FVG presence for now as the trigger
-            if curr_row['bearish_fvg']:
-                 return None # Wait for retrace? Or enter on close?
-                 
-            # Find recent FVGs
-            recent_fvgs = df[df['bearish_fvg']].tail(10)
-            for idx, fvg in recent_fvgs.iterrows():
-                if fvg['fvg_bottom'] <= curr_row['high'] <= fvg['fvg_top']:
-                     sl_dist = fvg['fvg_top'] + 0.0005 - curr_row['close']
-                     tp_dist = sl_dist * rr_ratio
-                     
-                     return {
-                        'signal': 'SELL',
-                        'sl': fvg['fvg_top'] + 0.0005,
-                        'tp': curr_row['close'] - tp_dist,
-                        'entry': curr_row['close'],
-                        'comment': f'LTF Entry RR 1:{rr_ratio}'
-                    }
+            # No entry on the bar that creates a bearish FVG, wait for the retrace
+            if df['bearish_fvg'].to_numpy()[pos]:
+                 return None
+            zone = self.zones_before(pos).entry_zone(bias, high, low)
+            if zone is not None:
+                return self.build_signal('SELL', zone.top, close, rr_ratio)
 
         elif bias == 'BULLISH':
-            recent_fvgs = df[df['bullish_fvg']].tail(10)
-            for idx, fvg in recent_fvgs.iterrows():
-                if fvg['fvg_bottom'] <= curr_row['low'] <= fvg['fvg_top']:
-                     sl_dist = curr_row['close'] - (fvg['fvg_bottom'] - 0.0005)
-                     tp_dist = sl_dist * rr_ratio
-                     
-                     return {
-                        'signal': 'BUY',
-                        'sl': fvg['fvg_bottom'] - 0.0005,
-                        'tp': curr_row['close'] + tp_dist,
-                        'entry': curr_row['close'],
-                        'comment': f'LTF Entry RR 1:{rr_ratio}'
-                    }
+            zone = self.zones_before(pos).entry_zone(bias, high, low)
+            if zone is not None:
+                return self.build_signal('BUY', zone.bottom, close, rr_ratio)
         
         return None
 
-    def _check_sweep(self, df, level, start_time, end_time, type):
-        subset = df.loc[start_time:end_time].iloc[1:]
-        for idx, row in subset.iterrows():
-            if type == 'HIGH' and row['high'] > level:
-                return True
-            if type == 'LOW' and row['low'] < level:
-                return True
-        return False
-
-    def _get_sweep_bar(self, df, level, start_time, end_time, type):
-        subset = df.loc[start_time:end_time].iloc[1:]
-        for idx, row in subset.iterrows():
-            if type == 'HIGH' and row['high'] > level:
-                return idx
-            if type == 'LOW' and row['low'] < level:
-                return idx
-        return None
+    @staticmethod
+    def build_signal(signal, zone_edge, close, rr_ratio):
+        """
+        Trade details for an entry at `close` with the SL just beyond the FVG
+        (top for SELL, bottom for BUY) and the TP at rr_ratio times the risk.
+        """
+        if signal == 'SELL':
+            sl = zone_edge + TurtleSoupStrategy.SL_BUFFER
+            tp = close - (sl - close) * rr_ratio
+        else:
+            sl = zone_edge - TurtleSoupStrategy.SL_BUFFER
+            tp = close + (close - sl) * rr_ratio
+        return {
+            'signal': signal,
+            'sl': sl,
+            'tp': tp,
+            'entry': close,
+            'comment': f'LTF Entry RR 1:{rr_ratio}'
+        }
 
     def get_latest_bar(self):
         return self.df.iloc[-1]
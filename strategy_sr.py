@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from metrics import timed
+from kernels import rolling_max, rolling_min, rolling_extrema, carry_forward
 
 class SRStrategy:
     def __init__(self, df, lookback=20, vol_len=2, box_width_atr=1.0):
@@ -9,12 +11,15 @@ class SRStrategy:
         self.box_width_atr = box_width_atr
         self.process_data()
 
+    @timed()
     def process_data(self):
         # 1. Calculate Delta Volume (Approximate)
         # Pine: if close > open posVol else negVol
+        # MT5 delivers tick_volume as uint64, which would wrap around when negated
+        volume = self.df['tick_volume'].to_numpy().astype(np.int64)
         self.df['delta_vol'] = np.where(self.df['close'] > self.df['open'], 
-                                        self.df['tick_volume'], 
-                                        -self.df['tick_volume'])
+                                        volume, 
+                                        -volume)
         
         # 2. Calculate Vol Thresholds
         # Pine: ta.highest(Vol/2.5, vol_len)
@@ -31,71 +36,92 @@ class SRStrategy:
         # "Vol > vol_hi" (Support) -> Positive Volume > Recent Highs (Strong Buying)
         # "Vol < vol_lo" (Resistance) -> Negative Volume < Recent Lows (Strong Selling)
         
-        self.df['vol_hi'] = (self.df['delta_vol'] / 2.5).rolling(window=self.vol_len).max()
-        self.df['vol_lo'] = (self.df['delta_vol'] / 2.5).rolling(window=self.vol_len).min()
+        vol_hi, vol_lo = rolling_extrema(self.df['delta_vol'].to_numpy() / 2.5, self.vol_len)
+        self.df['vol_hi'] = vol_hi
+        self.df['vol_lo'] = vol_lo
         
         # 3. ATR for Box Width
         self.df['atr'] = self.calculate_atr(self.df)
         
         # 4. Identify Pivots
-        self.df['pivot_high'] = self.df['high'].rolling(window=self.lookback*2+1, center=True).max()
-        self.df['pivot_low'] = self.df['low'].rolling(window=self.lookback*2+1, center=True).min()
+        self.df['pivot_high'] = rolling_max(self.df['high'].to_numpy(), self.lookback*2+1, center=True)
+        self.df['pivot_low'] = rolling_min(self.df['low'].to_numpy(), self.lookback*2+1, center=True)
         
         self.df['is_pivot_high'] = (self.df['high'] == self.df['pivot_high'])
         self.df['is_pivot_low'] = (self.df['low'] == self.df['pivot_low'])
         
-        # 5. Identify S/R Boxes
-        self.df['sr_support'] = np.nan
-        self.df['sr_resistance'] = np.nan
+        # 5. Identify S/R Boxes (simulating Pine's var box logic)
+        # A level becomes active on the bar where its event fires and stays active
+        # until the next event replaces it, i.e. a forward-fill of level-on-event.
+        # Events are only considered from bar `lookback` onwards, like the Pine script.
+        n = len(self.df)
+        high = self.df['high'].to_numpy()
+        low = self.df['low'].to_numpy()
+        close = self.df['close'].to_numpy()
+        delta_vol = self.df['delta_vol'].to_numpy()
+        in_range = np.arange(n) >= self.lookback
         
-        # Iterate to find boxes (simulating Pine's var box logic)
-        # We need to propagate the *active* support/resistance levels
+        # New Support: Pivot Low + High Buy Volume
+        support_event = in_range & self.df['is_pivot_low'].to_numpy() & (delta_vol > self.df['vol_hi'].to_numpy())
+        # New Resistance: Pivot High + High Sell Volume
+        resistance_event = in_range & self.df['is_pivot_high'].to_numpy() & (delta_vol < self.df['vol_lo'].to_numpy())
         
-        active_support = np.nan
-        active_resistance = np.nan
+        active_support = self.carry_forward(low, support_event)
+        active_resistance = self.carry_forward(high, resistance_event)
         
-        # Lists to store broken levels for confirmation
-        self.df['broken_support'] = False
-        self.df['broken_resistance'] = False
+        self.df['sr_support'] = active_support
+        self.df['sr_resistance'] = active_resistance
         
-        for i in range(self.lookback, len(self.df)):
-            # Check for New Support (Pivot Low + High Buy Volume)
-            if self.df['is_pivot_low'].iloc[i] and self.df['delta_vol'].iloc[i] > self.df['vol_hi'].iloc[i]:
-                active_support = self.df['low'].iloc[i]
-                
-            # Check for New Resistance (Pivot High + High Sell Volume)
-            if self.df['is_pivot_high'].iloc[i] and self.df['delta_vol'].iloc[i] < self.df['vol_lo'].iloc[i]:
-                active_resistance = self.df['high'].iloc[i]
-            
-            # Store current active levels
-            self.df.at[self.df.index[i], 'sr_support'] = active_support
-            self.df.at[self.df.index[i], 'sr_resistance'] = active_resistance
-            
-            # Check Breakouts
-            # Break Support: Close < Support (or High < Support_1 in Pine?)
-            # Pine: brekout_sup := ta.crossunder(high, supportLevel_1) -> Price went BELOW the box bottom
-            # Box bottom = supportLevel - width
-            
-            width = self.df['atr'].iloc[i] * self.box_width_atr
-            
-            if not np.isnan(active_support):
-                support_bottom = active_support - width
-                if self.df['close'].iloc[i] < support_bottom:
-                     self.df.at[self.df.index[i], 'broken_support'] = True
-            
-            if not np.isnan(active_resistance):
-                resistance_top = active_resistance + width
-                if self.df['close'].iloc[i] > resistance_top:
-                    self.df.at[self.df.index[i], 'broken_resistance'] = True
+        # Check Breakouts
+        # Pine: brekout_sup := ta.crossunder(high, supportLevel_1) -> Price went BELOW the box bottom
+        # Box bottom = supportLevel - width, box top = resistanceLevel + width
+        # Comparisons against NaN (no active level / ATR warm-up) are False.
+        width = self.df['atr'].to_numpy() * self.box_width_atr
+        
+        self.df['broken_support'] = close < (active_support - width)
+        self.df['broken_resistance'] = close > (active_resistance + width)
+
+    @staticmethod
+    def carry_forward(values, events):
+        """
+        Returns an array holding, at each bar, values[j] of the most recent bar j <= i
+        where events[j] is True (NaN before the first event). 2-D inputs carry along the last axis.
+        """
+        return carry_forward(values, events)
 
     @staticmethod
     def calculate_atr(df, period=14):
-        high_low = df['high'] - df['low']
-        high_close = np.abs(df['high'] - df['close'].shift())
-        low_close = np.abs(df['low'] - df['close'].shift())
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = ranges.max(axis=1)
-        return true_range.rolling(period).mean()
+        true_range = SRStrategy.true_range(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+        return pd.Series(SRStrategy.window_mean(true_range, period), index=df.index)
+
+    @staticmethod
+    def true_range(high, low, close):
+        """
+        Max of High-Low, |High-PrevClose|, |Low-PrevClose| (High-Low on the first bar).
+        """
+        prev_close = np.concatenate([np.full(close.shape[:-1] + (1,), np.nan), close[..., :-1]], axis=-1)
+        true_range = high - low
+        with np.errstate(invalid='ignore'):
+            true_range = np.fmax(true_range, np.abs(high - prev_close))
+            true_range = np.fmax(true_range, np.abs(low - prev_close))
+        return true_range
+
+    @staticmethod
+    def window_mean(values, period):
+        """
+        Trailing mean over `period` bars (NaN until the window is full).
+        The window is summed oldest to newest in a fixed order so that the mean of
+        the last bar can be reproduced exactly from just the last `period` values
+        (see IncrementalIndicators). 2-D values average along the last axis.
+        """
+        n = values.shape[-1]
+        result = np.full(values.shape, np.nan)
+        if n >= period:
+            total = values[..., :n-period+1].astype(float)
+            for k in range(1, period):
+                total += values[..., k:n-period+1+k]
+            result[..., period-1:] = total / period
+        return result
 
     def get_latest_status(self):
         """
@@ -0,0 +1,147 @@
+import threading
+import broker
+from broker import mt5
+from config import Config
+
+class SymbolRegistry:
+    """
+    Broker symbol names, contract specs and quotes, cached so a trading cycle
+    only makes the terminal calls it has to:
+    - resolve(): base name -> broker name (suffixes like EURUSD.m), looked up
+      once; the broker's symbol list is only fetched for names that need it,
+    - spec(): mt5.symbol_info (point, tick value, volume limits, contract size),
+      refreshed after Config.SYMBOL_SPEC_TTL seconds,
+    - tick(): mt5.symbol_info_tick, reused for Config.TICK_CACHE_TTL seconds.
+    Ages are measured on the broker clock.
+
+    All terminal calls hold `lock` (shared with MarketData, the MT5 API is not thread-safe).
+    """
+    def __init__(self, lock=None):
+        self.lock = threading.RLock() if lock is None else lock
+        self.names = {}     # base symbol -> broker symbol (None = not found)
+        self.retry_at = {}  # base symbol -> time to look for a missing symbol again
+        self.universe = None
+        self.specs = {}     # symbol -> (fetched at, symbol_info)
+        self.ticks = {}     # symbol -> (fetched at, tick)
+        self.calls = 0
+        self.hits = 0
+
+    def resolve(self, base_symbol):
+        """
+        Attempts to find the correct symbol name for the broker (handling suffixes like .m, _i, etc.)
+        """
+        with self.lock:
+            now = broker.timestamp()
+            if base_symbol in self.names and (self.names[base_symbol] is not None or now < self.retry_at[base_symbol]):
+                self.hits += 1
+                return self.names[base_symbol]
+            name = self._lookup(base_symbol)
+            self.names[base_symbol] = name
+            if name is None:
+                self.retry_at[base_symbol] = now + Config.SYMBOL_RETRY_SECONDS
+            return name
+
+    def resolve_all(self, base_symbols):
+        return {base_symbol: self.resolve(base_symbol) for base_symbol in base_symbols}
+
+    def _lookup(self, base_symbol):
+        # 1. Try exact match first
+        self.calls += 1
+        if mt5.symbol_select(base_symbol, True):
+            return base_symbol
+
+        # 2. Search for matches (the symbol list is fetched once)
+        if self.universe is None:
+            self.calls += 1
+            all_symbols = mt5.symbols_get()
+            if all_symbols is None:
+                return None
+            self.universe = [s.name for s in all_symbols]
+
+        for name in self.universe:
+            # Check if symbol starts with base AND is visible or can be selected
+            # limiting length diff to 3 to avoid matching EURUSD -> EURUSDJPY? No, that's different.
+            if name.startswith(base_symbol) and (len(name) - len(base_symbol) <= 3):
+                self.calls += 1
+                if mt5.symbol_select(name, True):
+                    return name
+
+        print(f"❌ Could not find valid symbol for {base_symbol}")
+        return None
+
+    def spec(self, symbol):
+        """
+        Contract spec (mt5.symbol_info) of a selected symbol, or None.
+        """
+        with self.lock:
+            now = broker.timestamp()
+            cached = self.specs.get(symbol)
+            if cached is not None and now - cached[0] < Config.SYMBOL_SPEC_TTL:
+                self.hits += 1
+                return cached[1]
+            self.calls += 1
+            info = mt5.symbol_info(symbol)
+            if info is not None and not info.visible:
+                self.calls += 2
+                if not mt5.symbol_select(symbol, True):
+                    print(f"symbol_select({symbol}) failed")
+                    return None
+                info = mt5.symbol_info(symbol)
+            if info is None:
+                self.specs.pop(symbol, None)
+                return None
+            self.specs[symbol] = (now, info)
+            return info
+
+    def tick(self, symbol, max_age=None):
+        """
+        Latest quote (mt5.symbol_info_tick), at most max_age seconds old
+        (default Config.TICK_CACHE_TTL; 0 always asks the terminal).
+        """
+        max_age = Config.TICK_CACHE_TTL if max_age is None else max_age
+        with self.lock:
+            now = broker.timestamp()
+            cached = self.ticks.get(symbol)
+            if cached is not None and now - cached[0] < max_age:
+                self.hits += 1
+                return cached[1]
+            self.calls += 1
+            tick = mt5.symbol_info_tick(symbol)
+            if tick is None:
+                self.ticks.pop(symbol, None)
+            else:
+                self.ticks[symbol] = (now, tick)
+            return tick
+
+    def invalidate(self, symbol=None):
+        with self.lock:
+            if symbol is None:
+                self.specs.clear()
+                self.ticks.clear()
+            else:
+                self.specs.pop(symbol, None)
+                self.ticks.pop(symbol, None)
+
+    def stats(self):
+        return {'terminal_calls': self.calls, 'cached': self.hits}
+
+# Registry shared by MarketData, RiskManager and Execution (created on first use)
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SymbolRegistry()
+    return _registry
+
+def set_registry(registry):
+    """
+    Replaces the shared registry; returns the previous one.
+    """
+    global _registry
+    previous = _registry
+    _registry = registry
+    return previous
@@ -0,0 +1,149 @@
+import threading
+import numpy as np
+import broker
+from config import Config
+from strategy import TurtleSoupStrategy
+from metrics import timed
+
+class TickWatcher:
+    """
+    Tick-driven LTF entries between scans.
+
+    The scan arms a symbol once its HTF bias is set, handing over the live FVG
+    zones of its LTF timeframes. poll() (every `interval` seconds) checks the
+    quotes of the armed symbols only, and submits the order as soon as the bid
+    trades into a zone instead of waiting for the next scan. A zone is dropped
+    once a tick trades through its mitigation level, or after it was traded.
+    Like check_ltf_entry, no SELL is taken while the forming bar of the zone's
+    timeframe would create a bearish FVG (its high below the low two bars back).
+    """
+    def __init__(self, md, execution, interval=None):
+        self.md = md
+        self.execution = execution
+        self.interval = Config.TICK_POLL_INTERVAL if interval is None else interval
+        self.armed = {}     # base symbol -> setup dict
+        self.traded = {}    # base symbol -> {(timeframe, zone creation time)} already traded
+        self.last_tick = {} # symbol -> time_msc of the last quote checked
+        self.lock = threading.Lock() # arm/disarm are called from the scan threads
+        self.polls = 0
+        self.triggers = 0
+
+    def arm(self, base_symbol, symbol, bias, score, rr_ratio, max_lot_cap, zones, bars=None):
+        """
+        zones: {timeframe: [(top, bottom, level, created_time), ...]} (Analyzer.zones).
+        Timeframes are checked in the given order, like the LTF scan.
+        bars: {timeframe: forming_bar(...)} for the bearish FVG guard of SELL entries.
+        """
+        with self.lock:
+            live = [(tf, *zone) for tf, tf_zones in zones.items() for zone in tf_zones]
+            # Only remember traded zones that are still in the index
+            traded = self.traded.get(base_symbol, set()) & {(zone[0], zone[4]) for zone in live}
+            self.traded[base_symbol] = traded
+            live = [zone for zone in live if (zone[0], zone[4]) not in traded]
+            if not live:
+                self.armed.pop(base_symbol, None)
+                return
+            self.armed[base_symbol] = {
+                'symbol': symbol,
+                'bias': bias,
+                'score': score,
+                'rr_ratio': rr_ratio,
+                'max_lot_cap': max_lot_cap,
+                'zones': live,
+                'bars': dict(bars or {}),
+            }
+
+    def disarm(self, base_symbol):
+        with self.lock:
+            self.armed.pop(base_symbol, None)
+
+    @timed()
+    def poll(self):
+        """
+        Checks the latest quote of every armed symbol once.
+        Returns the number of orders submitted.
+        """
+        with self.lock:
+            armed = list(self.armed.items())
+        fired = 0
+        for base_symbol, setup in armed:
+            tick = self.md.get_tick(setup['symbol'])
+            self.polls += 1
+            if tick is None or self.last_tick.get(setup['symbol']) == tick.time_msc:
+                continue
+            self.last_tick[setup['symbol']] = tick.time_msc
+            if self._check(base_symbol, setup, tick):
+                fired += 1
+        return fired
+
+    @staticmethod
+    def forming_bar(df, timeframe):
+        """
+        State of the forming (last) bar of an LTF frame that ticks keep current:
+        its high/low, the lows of the two bars before it and its end time.
+        """
+        seconds = Config.TIMEFRAME_SECONDS[timeframe]
+        lows = df['low'].to_numpy()
+        opened = int(np.asarray(df['time'].to_numpy()[-1]).astype('datetime64[s]').astype(np.int64))
+        return {
+            'seconds': seconds,
+            'end': opened + seconds,
+            'high': float(df['high'].to_numpy()[-1]),
+            'low': float(lows[-1]),
+            'lows': [float(lows[-3]) if len(lows) > 2 else np.nan, float(lows[-2]) if len(lows) > 1 else np.nan],
+        }
+
+    @staticmethod
+    def _advance_bar(bar, time, price):
+        # A tick past the end of the forming bar opens the next one (MT5 has no bars without ticks)
+        if time >= bar['end']:
+            bar['lows'] = [bar['lows'][1], bar['low']]
+            bar['high'] = bar['low'] = price
+            bar['end'] += ((time - bar['end']) // bar['seconds'] + 1) * bar['seconds']
+        bar['high'] = max(bar['high'], price)
+        bar['low'] = min(bar['low'], price)
+
+    def _check(self, base_symbol, setup, tick):
+        bearish = setup['bias'] == 'BEARISH'
+        price = tick.bid # Bars, and so the zones, are built from bid prices
+        for bar in setup['bars'].values():
+            self._advance_bar(bar, tick.time_msc // 1000, price)
+        for timeframe, top, bottom, level, created in setup['zones']:
+            if not bottom <= price <= top:
+                continue
+            bar = setup['bars'].get(timeframe)
+            if bearish and bar is not None and bar['high'] < bar['lows'][0]:
+                # No entry on the bar that creates a bearish FVG, wait for the retrace
+                continue
+            signal = TurtleSoupStrategy.build_signal('SELL' if bearish else 'BUY', top if bearish else bottom,
+                                                     tick.bid if bearish else tick.ask, setup['rr_ratio'])
+            print(f"[{setup['symbol']}] TICK ENTRY SIGNAL on {timeframe} zone: {signal}")
+            with self.lock:
+                self.traded.setdefault(base_symbol, set()).add((timeframe, created))
+                # One entry per symbol until the next scan re-arms it, like the LTF scan
+                if self.armed.get(base_symbol) is setup:
+                    del self.armed[base_symbol]
+            self.execution.submit({
+                'symbol': setup['symbol'],
+                'timeframe': timeframe,
+                'signal': signal,
+                'score': setup['score'],
+                'max_lot_cap': setup['max_lot_cap'],
+                'signal_time': broker.timestamp(),
+            })
+            self.triggers += 1
+            return True
+
+        # Zones the quote traded through are mitigated
+        live = [zone for zone in setup['zones'] if not (price > zone[3] if bearish else price < zone[3])]
+        if len(live) < len(setup['zones']):
+            with self.lock:
+                if self.armed.get(base_symbol) is setup:
+                    if live:
+                        setup['zones'] = live
+                    else:
+                        del self.armed[base_symbol]
+        return False
+
+    def stats(self):
+        return {'armed': len(self.armed), 'polls': self.polls, 'triggers': self.triggers}
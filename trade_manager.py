@@ -1,9 +1,29 @@
-import MetaTrader5 as mt5
+import numpy as np
+import broker
+from broker import mt5
 from config import Config
+from journal import get_journal
+from metrics import timed
 
 class TradeManager:
-    @staticmethod
-    def manage_positions():
+    """
+    Trailing stop engine for the bot's open positions.
+
+    Keeps per-ticket state between cycles, so manage_positions() can run every
+    second: the initial risk is recorded when a ticket is first seen (its SL is
+    still the entry SL then, and the journal has it for positions opened before
+    start-up), positions whose price and SL did not change are
+    skipped, the R-multiples and target SLs of the rest are computed in one go,
+    and an SL is only moved by at least Config.TRAILING_MIN_STEP_RR and at most
+    once per Config.TRAILING_MIN_INTERVAL seconds per ticket.
+    """
+    def __init__(self):
+        self.tickets = {} # ticket -> per-position state
+        self.started = False
+        self.requests = 0
+
+    @timed()
+    def manage_positions(self):
         """
         Manages open positions:
         1. Checks for Trailing Stop conditions
@@ -11,125 +31,142 @@ class TradeManager:
         if not Config.TRAILING_ENABLE:
             return
 
-        # Filter by Magic Number to avoid managing manual/other bot trades
         positions = mt5.positions_get()
-        if positions is None or len(positions) == 0:
+        if positions is None:
             return
 
+        # Filter by Magic Number to avoid managing manual/other bot trades
+        positions = [pos for pos in positions if pos.magic == Config.MAGIC_NUMBER]
+        open_tickets = {pos.ticket for pos in positions}
+        for ticket in list(self.tickets):
+            if ticket not in open_tickets:
+                del self.tickets[ticket]
+
+        changed = []
         for pos in positions:
-            # Skip trades not belonging to this bot
-            if pos.magic != Config.MAGIC_NUMBER:
+            state = self.tickets.get(pos.ticket)
+            if state is None:
+                state = self._track(pos)
+            elif pos.price_current == state['price'] and pos.sl == state['sl']:
+                continue # Nothing moved since the last cycle
+            state['price'] = pos.price_current
+            state['sl'] = pos.sl
+            if pos.sl != 0 and state['initial_risk'] > 0: # No SL, can't calc R
+                changed.append(pos)
+        self.started = True
+        if not changed:
+            return
+
+        is_buy = np.array([pos.type == mt5.ORDER_TYPE_BUY for pos in changed])
+        current_r, new_sl = TradeManager.trail_targets(
+            is_buy,
+            np.array([pos.price_open for pos in changed]),
+            np.array([pos.price_current for pos in changed]),
+            np.array([pos.sl for pos in changed]),
+            np.array([self.tickets[pos.ticket]['initial_risk'] for pos in changed]))
+
+        now = broker.now()
+        for k in np.flatnonzero(~np.isnan(new_sl)):
+            pos = changed[k]
+            state = self.tickets[pos.ticket]
+            # Rate limit per ticket (also covers a request the server has not applied yet)
+            if state['sent_at'] is not None and (now - state['sent_at']).total_seconds() < Config.TRAILING_MIN_INTERVAL:
+                state['price'] = None # Look at it again next cycle even if nothing moves
                 continue
-                
-            symbol = pos.symbol
-            ticket = pos.ticket
-            entry_price = pos.price_open
-            current_price = pos.price_current
-            sl = pos.sl
-            tp = pos.tp
-            pos_type = pos.type # 0 = BUY, 1 = SELL
-            
-            # Calculate Risk (R) distance
-            # Initial SL distance is needed. Since we don't store it, we can estimate 
-            # or we can just use the current price distance if SL hasn't moved.
-            # But better: We know our strategy uses dynamic SL. 
-            # Let's assume the initial risk was (Entry - SL).
-            # If SL has already been moved, this calculation changes.
-            # A robust way is to check the comment or just use current price vs entry.
-            
-            if pos_type == mt5.ORDER_TYPE_BUY:
-                if sl == 0: continue # No SL, can't calc R
-                
-                # Current R-Multiple
-                # Note: If SL was moved to BE, 'initial_risk' is lost. 
-                # We'll use a simplified logic: 
-                # If Price > Entry + (3.5 * (Entry - OriginalSL)) -> Move SL
-                # Since we don't know OriginalSL, we can infer it or just use a fixed pip trail?
-                # User said "Activate at 1:3.5".
-                # Let's assume the current SL is the initial SL if it's below entry.
-                
-                # Problem: If we moved SL, we lose the reference.
-                # Solution: We can't perfectly know initial risk without a database.
-                # Heuristic: We will trail based on current price distance.
-                # Let's calculate the "Current Profit Pips".
-                
-                profit_points = current_price - entry_price
-                
-                # We need the 'Risk' value. 
-                # Let's try to deduce it from the TP? TP is usually set at 3R, 5R, 7R.
-                # So Risk = (TP - Entry) / RR.
-                # If we can't find RR, we assume a standard risk?
-                # Or better: Just use the current SL if it's below entry.
-                
-                current_risk = entry_price - sl
-                if current_risk <= 0: current_risk = 0.0001 # Prevent div by zero (SL above entry)
-                
-                # If SL is already above entry (locked profit), we use a different logic?
-                # No, let's just use the 'current_risk' as the unit R if SL < Entry.
-                # If SL > Entry, we need to know the original risk.
-                # This is tricky without storage.
-                
-                # ALTERNATIVE: Use the comment! 
-                # We saved "Score:X" in comment. We know Score 1=1:3, 2=1:5, 3=1:7.
-                # So we can reverse calc the risk!
-                
-                rr_target = 3.0
-                if "Score:2" in pos.comment: rr_target = 5.0
-                if "Score:3" in pos.comment: rr_target = 7.0
-                
-                # Initial Risk = (TP - Entry) / rr_target
-                if tp > 0:
-                    initial_risk = (tp - entry_price) / rr_target
-                else:
-                    initial_risk = 0.0010 # Fallback 10 pips
-                
-                current_r = profit_points / initial_risk
-                
-                if current_r >= Config.TRAILING_ACTIVATE_RR:
-                    # Activate Trailing
-                    # Target SL = CurrentPrice - (1.5 * InitialRisk)
-                    new_sl = current_price - (Config.TRAILING_DIST_RR * initial_risk)
-                    
-                    # Only move SL up
-                    if new_sl > sl:
-                        print(f"[TRAIL] Updating BUY {ticket}: Profit {current_r:.2f}R. Moving SL to {new_sl:.5f}")
-                        request = {
-                            "action": mt5.TRADE_ACTION_SLTP,
-                            "position": ticket,
-                            "sl": new_sl,
-                            "tp": tp,
-                            "magic": Config.MAGIC_NUMBER,
-                        }
-                        mt5.order_send(request)
-
-            elif pos_type == mt5.ORDER_TYPE_SELL:
-                if sl == 0: continue
-                
-                profit_points = entry_price - current_price
-                
-                rr_target = 3.0
-                if "Score:2" in pos.comment: rr_target = 5.0
-                if "Score:3" in pos.comment: rr_target = 7.0
-                
-                if tp > 0:
-                    initial_risk = (entry_price - tp) / rr_target
-                else:
-                    initial_risk = 0.0010
-                
-                current_r = profit_points / initial_risk
-                
-                if current_r >= Config.TRAILING_ACTIVATE_RR:
-                    # Target SL = CurrentPrice + (1.5 * InitialRisk)
-                    new_sl = current_price + (Config.TRAILING_DIST_RR * initial_risk)
-                    
-                    # Only move SL down
-                    if new_sl < sl or sl == 0:
-                        print(f"[TRAIL] Updating SELL {ticket}: Profit {current_r:.2f}R. Moving SL to {new_sl:.5f}")
-                        request = {
-                            "action": mt5.TRADE_ACTION_SLTP,
-                            "position": ticket,
-                            "sl": new_sl,
-                            "tp": tp,
-                            "magic": Config.MAGIC_NUMBER,
-                        }
-                        mt5.order_send(request)
+            print(f"[TRAIL] Updating {'BUY' if is_buy[k] else 'SELL'} {pos.ticket}: Profit {current_r[k]:.2f}R. Moving SL to {new_sl[k]:.5f}")
+            request = {
+                "action": mt5.TRADE_ACTION_SLTP,
+                "position": pos.ticket,
+                "sl": float(new_sl[k]),
+                "tp": pos.tp,
+                "magic": Config.MAGIC_NUMBER,
+            }
+            result = mt5.order_send(request)
+            state['sent_at'] = now
+            self.requests += 1
+            journal = get_journal()
+            if journal is not None:
+                journal.record_sl_change(ticket=pos.ticket, time=broker.timestamp(), old_sl=pos.sl,
+                                         new_sl=float(new_sl[k]), price=pos.price_current,
+                                         r_multiple=float(current_r[k]),
+                                         retcode=getattr(result, 'retcode', None))
+
+    def _track(self, pos):
+        is_buy = pos.type == mt5.ORDER_TYPE_BUY
+        if self.started:
+            # New since the last cycle: its SL is still the one set at entry
+            initial_risk = abs(pos.price_open - pos.sl) if pos.sl != 0 else 0.0
+        else:
+            # Opened before start-up, the SL may already have been trailed:
+            # use the risk journaled at entry, else reverse it from the TP
+            journal = get_journal()
+            initial_risk = journal.initial_risk(pos.ticket) if journal is not None else None
+            if initial_risk is None:
+                initial_risk = TradeManager.initial_risk_from_comment(is_buy, pos.price_open, pos.tp, pos.comment)
+        state = {'initial_risk': initial_risk, 'price': None, 'sl': None, 'sent_at': None}
+        self.tickets[pos.ticket] = state
+        return state
+
+    @staticmethod
+    def initial_risk_from_comment(is_buy, entry_price, tp, comment):
+        """
+        Initial SL distance of a position whose entry SL is unknown.
+        """
+        # We saved "Score:X" in comment. We know Score 1=1:3, 2=1:5, 3=1:7.
+        # So we can reverse calc the risk from the TP:
+        # Initial Risk = |TP - Entry| / rr_target
+        rr_target = 3.0
+        if "Score:2" in comment: rr_target = 5.0
+        if "Score:3" in comment: rr_target = 7.0
+        if tp > 0:
+            return (tp - entry_price) / rr_target if is_buy else (entry_price - tp) / rr_target
+        return 0.0010 # Fallback 10 pips
+
+    @staticmethod
+    def trailing_stop(is_buy, entry_price, current_price, sl, initial_risk,
+                      activate_rr=None, dist_rr=None, min_step_rr=None):
+        """
+        Trailing stop rule for one position.
+        Returns (current R-multiple, new SL or None if the SL should not move).
+        """
+        activate_rr = Config.TRAILING_ACTIVATE_RR if activate_rr is None else activate_rr
+        dist_rr = Config.TRAILING_DIST_RR if dist_rr is None else dist_rr
+        min_step_rr = Config.TRAILING_MIN_STEP_RR if min_step_rr is None else min_step_rr
+
+        profit_points = current_price - entry_price if is_buy else entry_price - current_price
+        current_r = profit_points / initial_risk
+
+        if current_r < activate_rr:
+            return current_r, None
+
+        # Activate Trailing
+        # Target SL = CurrentPrice -/+ (TRAILING_DIST_RR * InitialRisk)
+        if is_buy:
+            new_sl = current_price - (dist_rr * initial_risk)
+            # Only move SL up
+            if new_sl > sl and new_sl - sl >= min_step_rr * initial_risk:
+                return current_r, new_sl
+        else:
+            new_sl = current_price + (dist_rr * initial_risk)
+            # Only move SL down
+            if new_sl < sl and sl - new_sl >= min_step_rr * initial_risk or sl == 0:
+                return current_r, new_sl
+        return current_r, None
+
+    @staticmethod
+    def trail_targets(is_buy, entry_price, current_price, sl, initial_risk,
+                      activate_rr=None, dist_rr=None, min_step_rr=None):
+        """
+        trailing_stop for arrays of positions.
+        Returns (current R-multiples, new SLs with NaN where the SL should not move).
+        """
+        activate_rr = Config.TRAILING_ACTIVATE_RR if activate_rr is None else activate_rr
+        dist_rr = Config.TRAILING_DIST_RR if dist_rr is None else dist_rr
+        min_step_rr = Config.TRAILING_MIN_STEP_RR if min_step_rr is None else min_step_rr
+
+        direction = np.where(is_buy, 1.0, -1.0)
+        current_r = direction * (current_price - entry_price) / initial_risk
+        new_sl = current_price - direction * dist_rr * initial_risk
+        step = direction * (new_sl - sl)
+        move = (current_r >= activate_rr) & (((step > 0) & (step >= min_step_rr * initial_risk)) | (~is_buy & (sl == 0)))
+        return current_r, np.where(move, new_sl, np.nan)
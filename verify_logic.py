@@ -1,11 +1,47 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import pandas as pd
 import numpy as np
 from strategy import TurtleSoupStrategy
+from indicators import Indicators
+from strategy_sr import SRStrategy
+from incremental import IncrementalIndicators
+from pivots import PivotTracker
+from panel import Panel
+import kernels
+from kernels import RollingExtreme, rolling_extrema, rolling_min
+from tick_watcher import TickWatcher
+from orchestrator import Orchestrator
+from trade_manager import TradeManager
+from journal import TradeJournal, set_journal
+from symbol_registry import SymbolRegistry
+from metrics import Metrics, Histogram, set_metrics
+import scanner as scanner_module
+from scanner import Analyzer, Scanner
+from risk_manager import RiskManager
+from scheduler import BarScheduler
+from resample import aggregate
+from market_data import MarketData
+from simulator import SimulatedBroker
+from bar_store import RATES_DTYPE, BarStore
+from bar_cache import BarBuffer
+from bar_columns import rate_columns
+from config import Config
+import broker
+from backtest import FX_SPEC, BacktestParams, htf_bias_series, ltf_zone_series
+from optimizer import DEFAULT_SPACE, SharedBars, grid, parse_space, random_search
 
 def create_synthetic_data():
     # Create a sequence of candles
     data = {
-        'time': pd.date_range(start='2023-01-01', periods=100, freq='H'),
+        'time': pd.date_range(start='2023-01-01', periods=100, freq='h'),
         'open': [1.0] * 100,
         'high': [1.0] * 100,
         'low': [1.0] * 100,
@@ -52,6 +88,1138 @@ def create_synthetic_data():
     
     return df
 
+def create_random_data(n=500, seed=0, decimals=None):
+    """
+    Random-walk OHLCV frame shaped like MarketData.get_rates output.
+    Rounding prices (decimals) produces equal highs/lows to exercise ties.
+    """
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0010, n))
+    open_ = np.concatenate([close[:1], close[:-1]])
+    wick_up = np.abs(rng.normal(0, 0.0007, n))
+    wick_down = np.abs(rng.normal(0, 0.0007, n))
+    data = {
+        'time': pd.date_range(start='2023-01-01', periods=n, freq='min'),
+        'open': open_,
+        'high': np.maximum(open_, close) + wick_up,
+        'low': np.minimum(open_, close) - wick_down,
+        'close': close,
+        'tick_volume': rng.integers(50, 500, n),
+        'spread': np.ones(n, dtype=int),
+        'real_volume': np.zeros(n, dtype=int)
+    }
+    df = pd.DataFrame(data)
+    if decimals is not None:
+        df[['open', 'high', 'low', 'close']] = df[['open', 'high', 'low', 'close']].round(decimals)
+    return df
+
+# Reference bar-by-bar implementations (the original loop versions).
+# The vectorized code in indicators.py must reproduce these exactly.
+
+def identify_mss_swings_loop(df, left=2, right=1):
+    df['is_minor_high'] = False
+    df['is_minor_low'] = False
+    
+    for i in range(2, len(df)-1):
+        # Pivot High
+        if (df['high'].iloc[i] > df['high'].iloc[i-1] and 
+            df['high'].iloc[i] > df['high'].iloc[i-2] and 
+            df['high'].iloc[i] > df['high'].iloc[i+1]):
+            df.at[df.index[i], 'is_minor_high'] = True
+            
+        # Pivot Low
+        if (df['low'].iloc[i] < df['low'].iloc[i-1] and 
+            df['low'].iloc[i] < df['low'].iloc[i-2] and 
+            df['low'].iloc[i] < df['low'].iloc[i+1]):
+            df.at[df.index[i], 'is_minor_low'] = True
+            
+    return df
+
+def find_fvg_loop(df):
+    df['bullish_fvg'] = False
+    df['bearish_fvg'] = False
+    df['fvg_top'] = np.nan
+    df['fvg_bottom'] = np.nan
+    
+    for i in range(2, len(df)):
+        # Bullish FVG
+        if df['low'].iloc[i] > df['high'].iloc[i-2]:
+            df.at[df.index[i], 'bullish_fvg'] = True
+            df.at[df.index[i], 'fvg_top'] = df['low'].iloc[i]
+            df.at[df.index[i], 'fvg_bottom'] = df['high'].iloc[i-2]
+            
+        # Bearish FVG
+        if df['high'].iloc[i] < df['low'].iloc[i-2]:
+            df.at[df.index[i], 'bearish_fvg'] = True
+            df.at[df.index[i], 'fvg_top'] = df['low'].iloc[i-2]
+            df.at[df.index[i], 'fvg_bottom'] = df['high'].iloc[i]
+            
+    return df
+
+def sr_levels_loop(sr):
+    """
+    Original bar-by-bar S/R box loop of SRStrategy.process_data, run on a
+    frame that already has the pivot/volume/ATR columns.
+    """
+    df = sr.df
+    df['sr_support'] = np.nan
+    df['sr_resistance'] = np.nan
+    
+    active_support = np.nan
+    active_resistance = np.nan
+    
+    df['broken_support'] = False
+    df['broken_resistance'] = False
+    
+    for i in range(sr.lookback, len(df)):
+        if df['is_pivot_low'].iloc[i] and df['delta_vol'].iloc[i] > df['vol_hi'].iloc[i]:
+            active_support = df['low'].iloc[i]
+            
+        if df['is_pivot_high'].iloc[i] and df['delta_vol'].iloc[i] < df['vol_lo'].iloc[i]:
+            active_resistance = df['high'].iloc[i]
+        
+        df.at[df.index[i], 'sr_support'] = active_support
+        df.at[df.index[i], 'sr_resistance'] = active_resistance
+        
+        width = df['atr'].iloc[i] * sr.box_width_atr
+        
+        if not np.isnan(active_support):
+            support_bottom = active_support - width
+            if df['close'].iloc[i] < support_bottom:
+                 df.at[df.index[i], 'broken_support'] = True
+        
+        if not np.isnan(active_resistance):
+            resistance_top = active_resistance + width
+            if df['close'].iloc[i] > resistance_top:
+                df.at[df.index[i], 'broken_resistance'] = True
+    return df
+
+def sweep_bar_loop(df, level, start_time, end_time, type):
+    # Reference for the sweep search: iterate the bars after the swing
+    subset = df.loc[start_time:end_time].iloc[1:]
+    for idx, row in subset.iterrows():
+        if type == 'HIGH' and row['high'] > level:
+            return idx
+        if type == 'LOW' and row['low'] < level:
+            return idx
+    return None
+
+def analyze_htf_loop(df, current_index=-1):
+    # Reference for TurtleSoupStrategy.analyze_htf with label slicing and iterrows
+    curr_idx = df.index[current_index]
+    last_major_highs = df[df['is_swing_high']].loc[:curr_idx].tail(5)
+    if not last_major_highs.empty:
+        major_high = last_major_highs.iloc[-1]
+        sweep_bar = sweep_bar_loop(df, major_high['high'], major_high.name, curr_idx, 'HIGH')
+        if sweep_bar and df['broken_support'].loc[sweep_bar:curr_idx].any():
+            return 'BEARISH'
+    last_major_lows = df[df['is_swing_low']].loc[:curr_idx].tail(5)
+    if not last_major_lows.empty:
+        major_low = last_major_lows.iloc[-1]
+        sweep_bar = sweep_bar_loop(df, major_low['low'], major_low.name, curr_idx, 'LOW')
+        if sweep_bar and df['broken_resistance'].loc[sweep_bar:curr_idx].any():
+            return 'BULLISH'
+    return None
+
+def ltf_entry_loop(df, bias, current_index, length=120, mitigation='Proximal'):
+    # Reference for check_ltf_entry: rescan every FVG of the last `length` bars
+    # and the bars since it formed to see whether it is still live
+    i = range(len(df))[current_index]
+    bearish = bias == 'BEARISH'
+    flags = df['bearish_fvg' if bearish else 'bullish_fvg']
+    if bearish and df['bearish_fvg'].iloc[i]:
+        return None
+    price = df['high' if bearish else 'low'].iloc[i]
+    for c in range(max(0, i - length), i):
+        if not flags.iloc[c]:
+            continue
+        top, bottom = df['fvg_top'].iloc[c], df['fvg_bottom'].iloc[c]
+        level = {'Proximal': bottom if bearish else top, '50 % OB': (top + bottom) / 2,
+                 'Distal': top if bearish else bottom}[mitigation]
+        later = df.iloc[c+1:i]
+        if bearish and (later['high'] > level).any() or not bearish and (later['low'] < level).any():
+            continue
+        if bottom <= price <= top:
+            return top if bearish else bottom
+    return None
+
+def assert_columns_equal(expected, actual, columns):
+    for col in columns:
+        pd.testing.assert_series_equal(expected[col], actual[col], check_names=True)
+
+def test_vectorized_indicators():
+    print("Checking vectorized MSS swings / FVG against loop versions...")
+    frames = [create_synthetic_data(), create_random_data(0), create_random_data(1),
+              create_random_data(3), create_random_data(2000, seed=7),
+              create_random_data(2000, seed=8, decimals=3)]
+    for df in frames:
+        expected = find_fvg_loop(identify_mss_swings_loop(df.copy()))
+        actual = Indicators.find_fvg(Indicators.identify_mss_swings(df.copy()))
+        assert_columns_equal(expected, actual, ['is_minor_high', 'is_minor_low',
+                                                'bullish_fvg', 'bearish_fvg',
+                                                'fvg_top', 'fvg_bottom'])
+    print("SUCCESS: Vectorized indicators match loop versions.")
+
+SR_COLUMNS = ['sr_support', 'sr_resistance', 'broken_support', 'broken_resistance']
+
+def test_vectorized_sr():
+    print("Checking vectorized S/R levels against loop version...")
+    frames = [create_synthetic_data(), create_random_data(0), create_random_data(15),
+              create_random_data(60), create_random_data(3000, seed=5),
+              create_random_data(3000, seed=6, decimals=3)]
+    for df in frames:
+        for lookback, vol_len, box_width_atr in [(20, 2, 1.0), (5, 4, 0.5), (1, 1, 0.0)]:
+            actual = SRStrategy(df.copy(), lookback, vol_len, box_width_atr)
+            expected = sr_levels_loop(SRStrategy(df.copy(), lookback, vol_len, box_width_atr))
+            assert_columns_equal(expected, actual.df, SR_COLUMNS)
+    print("SUCCESS: Vectorized S/R levels match loop version.")
+
+def test_rolling_kernels():
+    print("Checking rolling extrema kernels against pandas...")
+    rng = np.random.default_rng(3)
+    for n in [0, 1, 7, 64, 1000]:
+        values = np.round(rng.normal(0, 1, n).cumsum(), 1) # ties
+        if n > 10:
+            values[n // 3] = np.nan
+        series = pd.Series(values)
+        windows = [1, 2, 3, 4, 41, 101, n, n + 1] if n else [1, 5]
+        for center in (False, True):
+            maxima, minima = rolling_extrema(values, windows, center=center)
+            for w, high, low in zip(windows, maxima, minima):
+                assert np.array_equal(high, series.rolling(w, center=center).max().to_numpy(), equal_nan=True), \
+                    f"max n={n} w={w} center={center}"
+                assert np.array_equal(low, series.rolling(w, center=center).min().to_numpy(), equal_nan=True), \
+                    f"min n={n} w={w} center={center}"
+
+    # Streaming: one deque answers every trailing window ending at the last closed bar
+    values = np.round(rng.normal(0, 1, 3000).cumsum(), 1)
+    stream = RollingExtreme('min')
+    expected = {w: rolling_min(values, w) for w in (5, 20, 60)}
+    for i, value in enumerate(values):
+        if i >= 60:
+            for w, lows in expected.items():
+                assert stream.best(np.inf, since=i - w) == lows[i - 1], f"window {w} at {i}"
+        stream.push(i, value)
+        stream.evict_before(i + 1 - 60)
+    print("SUCCESS: Rolling kernels match pandas.")
+
+def test_jit_kernels():
+    compiled = kernels.numba is not None and Config.JIT_ENABLE
+    print(f"Checking the stateful kernels: NumPy vs plain loop vs default ({'numba' if compiled else 'no numba'})...")
+
+    def identical(a, b):
+        a, b = np.asarray(a), np.asarray(b)
+        return a.dtype == b.dtype and a.shape == b.shape and np.array_equal(a, b, equal_nan=True)
+
+    rng = np.random.default_rng(41)
+    df = create_random_data(600, seed=41, decimals=3) # ties
+    for values, events in [(df['low'].to_numpy(), rng.random(600) < 0.05),
+                           (df['high'].to_numpy().astype(np.float32), rng.random(600) < 0.3),
+                           (rng.normal(size=(4, 150)), rng.random((4, 150)) < 0.1),
+                           (np.arange(10.0), np.zeros(10, dtype=bool)),
+                           (np.zeros(0), np.zeros(0, dtype=bool))]:
+        expected = kernels.carry_forward(values, events, jit=False)
+        looped = np.empty(values.shape)
+        if values.size:
+            kernels.carry_forward_loop(values.reshape(-1, values.shape[-1]), events.reshape(-1, values.shape[-1]),
+                                       looped.reshape(-1, values.shape[-1]))
+        assert identical(looped, expected), "carry_forward loop differs"
+        assert identical(kernels.carry_forward(values, events), expected), "carry_forward differs"
+
+    for column in ('high', 'low'):
+        values = df[column].to_numpy()
+        above = column == 'high'
+        expected = kernels.first_breaches(values, above, jit=False)
+        looped = np.full(len(values), len(values), dtype=np.int64)
+        kernels.first_breaches_loop(values, above, looped)
+        assert identical(looped, expected), "first_breaches loop differs"
+        assert identical(kernels.first_breaches(values, above), expected), "first_breaches differs"
+        for swing in range(0, len(values), 7):
+            for end in (swing, swing + 3, swing + 40, len(values) - 1):
+                expected = kernels.first_breach(values, swing, end, above, jit=False)
+                hit = kernels.first_breach_loop(values, swing, end, above)
+                assert (None if hit < 0 else hit) == expected, f"first_breach loop differs at {swing}, {end}"
+                assert kernels.first_breach(values, swing, end, above) == expected, f"first_breach differs at {swing}, {end}"
+    print("SUCCESS: Stateful kernels are identical on every path.")
+
+def test_incremental_indicators():
+    print("Checking IncrementalIndicators against the batch path...")
+    # The second set shares the swing and S/R pivot columns (equal windows)
+    for params, seed_bars in [(dict(swing_period=5, sr_lookback=4, vol_len=3, box_width_atr=0.5), 0),
+                              (dict(swing_period=5, sr_lookback=4, vol_len=3, box_width_atr=0.5), 3),
+                              (dict(swing_period=5, sr_lookback=4, vol_len=3, box_width_atr=0.5), 40),
+                              (dict(swing_period=4, sr_lookback=4, vol_len=1, box_width_atr=1.0), 10)]:
+        df = create_random_data(300, seed=seed_bars, decimals=4)
+        stream = IncrementalIndicators(**params)
+        stream.seed(df.iloc[:seed_bars])
+        for i, bar in enumerate(df.iloc[seed_bars:].to_dict('records'), start=seed_bars):
+            # Feed a still-forming version of the bar first, then the closed bar
+            forming = dict(bar, high=max(bar['open'], bar['close']), low=min(bar['open'], bar['close']))
+            stream.update(forming)
+            if i % 50 == 0:
+                history = pd.concat([df.iloc[:i], pd.DataFrame([forming])], ignore_index=True)
+                batch = TurtleSoupStrategy(history, **params)
+                pd.testing.assert_frame_equal(batch.df, stream.frame())
+                streamed = TurtleSoupStrategy(stream.frame(), processed=True, fvg_zones=stream.fvg_zones)
+                for direction in ('BEARISH', 'BULLISH'):
+                    assert streamed.check_ltf_entry(direction) == batch.check_ltf_entry(direction), \
+                        f"{direction} entry differs at bar {i}"
+            stream.update(bar)
+        pd.testing.assert_frame_equal(TurtleSoupStrategy(df.copy(), **params).df, stream.frame())
+    
+    # Bounded memory: rows kept after compaction still match the full-history batch
+    df = create_random_data(1500, seed=4)
+    stream = IncrementalIndicators(max_bars=150)
+    stream.seed(df.iloc[:10])
+    for bar in df.iloc[10:].to_dict('records'):
+        stream.update(bar)
+    frame = stream.frame()
+    expected = TurtleSoupStrategy(df.copy()).df.iloc[-len(frame):].reset_index(drop=True)
+    pd.testing.assert_frame_equal(expected, frame)
+    print("SUCCESS: Incremental indicators match the batch path.")
+
+def test_compact_bars():
+    print("Checking compact bar and indicator storage...")
+    saved = Config.BAR_PRICE_DTYPE
+    try:
+        Config.BAR_PRICE_DTYPE = "float32"
+        rates = random_rates(1000)
+        rates['tick_volume'][-1] = 2 ** 40
+        buffer = BarBuffer(600)
+        buffer.replace(rates[:700], 600)
+        buffer.merge(rates[699:])
+        frame = buffer.frame(600)
+        assert frame['close'].dtype == np.float32 and frame['tick_volume'].dtype == np.uint32
+        assert frame['tick_volume'].iloc[-1] == 2 ** 32 - 1, "Volumes must saturate"
+        assert np.shares_memory(buffer.epoch, buffer.columns['time'])
+        assert np.array_equal(buffer.records(int(rates['time'][500]))['time'], rates['time'][500:])
+        assert np.array_equal(frame['close'].to_numpy(), rates['close'][-600:].astype(np.float32))
+    finally:
+        Config.BAR_PRICE_DTYPE = saved
+
+    # Indicators of a float32 frame: same flags as the batch path, levels in float32
+    df = create_random_data(3000, seed=11).astype({'open': np.float32, 'high': np.float32, 'low': np.float32,
+                                                    'close': np.float32, 'tick_volume': np.uint32,
+                                                    'spread': np.int32, 'real_volume': np.uint32})
+    batch = TurtleSoupStrategy(df.copy()).df
+    stream = IncrementalIndicators(max_bars=500)
+    stream.seed(df.iloc[:2000])
+    for bar in df.iloc[2000:].to_dict('records'):
+        stream.update(bar)
+    frame = stream.frame(tail=500)
+    expected = batch.iloc[-500:].reset_index(drop=True)
+    for name in stream.FLAG_COLUMNS:
+        assert np.array_equal(frame[name], expected[name]), f"{name} differs"
+    for name in stream.LEVEL_COLUMNS + ['fvg_top', 'fvg_bottom', 'vol_hi', 'vol_lo', 'delta_vol']:
+        assert np.allclose(frame[name], expected[name], rtol=1e-6, equal_nan=True), f"{name} differs"
+    assert frame['atr'].dtype == np.float32
+    per_row = stream.nbytes / len(stream.columns['time'])
+    processed = TurtleSoupStrategy(create_random_data(3000, seed=11)).df
+    batch_row = processed.memory_usage(index=False).sum() / len(processed)
+    assert per_row * 2.5 < batch_row, f"{per_row:.0f} bytes per row, batch frame {batch_row:.0f}"
+    print(f"SUCCESS: {per_row:.0f} bytes per bar stored vs {batch_row:.0f} in a processed frame.")
+
+def test_pivot_tracker():
+    print("Checking confirmed pivots against the batch swings...")
+    df = create_random_data(3000, seed=21, decimals=3) # ties
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+    for left, right in [(5, 5), (3, 1), (50, 50)]:
+        tracker = PivotTracker(left, right, keep=15)
+        seeded = PivotTracker(left, right, keep=15)
+        seeded.seed(high[:1000], low[:1000])
+        for i in range(len(df)):
+            for side, c, price in tracker.close_bar(i, high[i], low[i]):
+                assert c == i - right, "Pivot confirmed late"
+            if i >= 1000:
+                seeded.close_bar(i, high[i], low[i])
+        # Brute force over the closed bars: the extreme of [c - left, c + right]
+        for side, values, best in (('high', high, np.max), ('low', low, np.min)):
+            expected = [(c, values[c]) for c in range(left, len(df) - right)
+                        if values[c] == best(values[c - left:c + right + 1])][-15:]
+            pivots = tracker.highs if side == 'high' else tracker.lows
+            assert list(pivots) == expected, f"{side} pivots differ ({left}, {right})"
+            assert list(seeded.highs if side == 'high' else seeded.lows) == expected
+
+    # analyze_htf reading the stream's tracker matches the scan over the swing flags
+    stream = IncrementalIndicators(max_bars=300)
+    for mode in ('forming', 'close'):
+        stream.seed(df.iloc[:400])
+        for i, bar in enumerate(df.iloc[400:1400].to_dict('records'), start=400):
+            stream.update(bar)
+            if i % 7 == 0:
+                frame = stream.frame(tail=250)
+                fast = TurtleSoupStrategy(frame, processed=True, pivots=stream.pivots,
+                                          bar_offset=stream.first_bar(tail=250), swing_confirmation=mode)
+                slow = TurtleSoupStrategy(frame, processed=True, swing_confirmation=mode)
+                for side in ('high', 'low'):
+                    assert fast.last_swing(side, len(frame) - 1) == slow.last_swing(side, len(frame) - 1), \
+                        f"{mode} {side} swing differs at bar {i}"
+                assert fast.analyze_htf() == slow.analyze_htf()
+    print("SUCCESS: Pivots are confirmed when their window closes.")
+
+def test_panel():
+    print("Checking the symbol x bar panel against per-symbol strategies...")
+    # Histories of different lengths, so the shorter ones are padded
+    frames = [create_random_data(n, seed=seed, decimals=decimals)
+              for n, seed, decimals in [(400, 23, 3), (330, 35, 3), (260, 63, 4), (300, 12, 4), (45, 7, 3)]]
+    seen = set()
+    for settings in [dict(swing_period=8, sr_lookback=2, vol_len=2, box_width_atr=0.0, fvg_length=30),
+                     dict(swing_period=5, sr_lookback=4, vol_len=3, box_width_atr=0.5,
+                          fvg_length=20, fvg_mitigation='50 % OB', swing_confirmation='close')]:
+        for cut in range(0, 200, 3):
+            panel_frames = {f"SYM{k}": df.iloc[:max(len(df) - cut, 1)] for k, df in enumerate(frames)}
+            panel = Panel(panel_frames, **settings)
+            biases = panel.htf_biases()
+            entries = {bias: panel.ltf_signals(dict.fromkeys(panel_frames, bias)) for bias in ('BEARISH', 'BULLISH')}
+            for symbol, df in panel_frames.items():
+                strategy = TurtleSoupStrategy(df.copy(), **settings)
+                bias = strategy.analyze_htf()
+                assert biases.loc[symbol, 'bias'] == bias, f"{symbol} bias differs at cut {cut}"
+                expected = strategy.breakout_levels()
+                actual = biases.loc[symbol, ['support_break', 'resistance_break']].to_numpy(dtype=float)
+                np.testing.assert_array_equal(actual, expected, f"{symbol} breakout levels differ at cut {cut}")
+                seen.add(bias)
+                for direction, table in entries.items():
+                    signal = strategy.check_ltf_entry(direction)
+                    row = table.loc[symbol]
+                    if signal is None:
+                        assert row['signal'] is None, f"Unexpected {direction} entry for {symbol} at cut {cut}"
+                    else:
+                        built = TurtleSoupStrategy.build_signal(row['signal'], row['zone_edge'], row['entry'], 3.0)
+                        assert built == signal, f"{direction} entry of {symbol} differs at cut {cut}"
+                        seen.add(row['signal'])
+    assert seen >= {'BEARISH', 'BULLISH', 'SELL', 'BUY'}, f"Setups not exercised: {seen}"
+    print("SUCCESS: Panel matches the per-symbol strategies.")
+
+def test_sweep_index():
+    print("Checking index-based sweep detection against the iterrows version...")
+    # Seeds/periods picked so both BEARISH and BULLISH setups occur
+    for df, swing_period in [(create_random_data(400, seed=23, decimals=3), 8),
+                             (create_random_data(400, seed=35, decimals=3), 12),
+                             (create_random_data(400, seed=63, decimals=3), 12)]:
+        for above, column in [(True, 'high'), (False, 'low')]:
+            values = df[column].to_numpy()
+            breaches = Indicators.first_breaches(values, above)
+            for k in range(len(values)):
+                expected = Indicators.first_breach(values, k, len(values) - 1, above)
+                assert breaches[k] == (len(values) if expected is None else expected), f"Breach differs at bar {k}"
+        strategy = TurtleSoupStrategy(df.copy(), swing_period=swing_period, sr_lookback=2, vol_len=2, box_width_atr=0.0)
+        for i in range(len(df)):
+            assert strategy.analyze_htf(current_index=i) == analyze_htf_loop(strategy.df, current_index=i), \
+                f"HTF bias differs at bar {i}"
+    print("SUCCESS: Sweep index matches the iterrows version.")
+
+def test_fvg_zones():
+    print("Checking the FVG zone index against a rescan of every zone...")
+    frames = [create_synthetic_data(), create_random_data(400, seed=31, decimals=4),
+              create_random_data(400, seed=32, decimals=3)]
+    entries = 0
+    for length, mitigation in [(120, 'Proximal'), (15, '50 % OB'), (40, 'Distal')]:
+        for df in frames:
+            strategy = TurtleSoupStrategy(df.copy(), fvg_length=length, fvg_mitigation=mitigation)
+            for i in range(len(df)):
+                for direction, signal in [('BEARISH', 'SELL'), ('BULLISH', 'BUY')]:
+                    edge = ltf_entry_loop(strategy.df, direction, i, length, mitigation)
+                    actual = strategy.check_ltf_entry(direction, current_index=i)
+                    if edge is None:
+                        assert actual is None, f"Unexpected {direction} entry at bar {i}"
+                    else:
+                        close = strategy.df['close'].iloc[i]
+                        assert actual == TurtleSoupStrategy.build_signal(signal, edge, close, 3.0), \
+                            f"{direction} entry differs at bar {i}"
+                        entries += 1
+    assert entries > 0, "No FVG entries exercised"
+    print("SUCCESS: FVG zone index matches the rescan.")
+
+def test_backtest_signals():
+    print("Checking backtest signal series against per-bar strategy rebuilds...")
+    frames = [create_synthetic_data(), create_random_data(400, seed=11, decimals=3),
+              create_random_data(400, seed=12, decimals=4)]
+    for settings in [dict(swing_period=5, sr_lookback=4, vol_len=3, box_width_atr=0.5),
+                     dict(swing_period=3, sr_lookback=2, vol_len=2, box_width_atr=0.0,
+                          fvg_length=20, fvg_mitigation='Distal')]:
+        params = BacktestParams(**settings)
+        for df in frames:
+            bias = htf_bias_series(df, params)
+            sell_top, buy_bottom = ltf_zone_series(df, params)
+            for i in range(len(df)):
+                strategy = TurtleSoupStrategy(df.iloc[:i+1].copy(), **settings)
+                expected = {'BULLISH': 1, 'BEARISH': -1, None: 0}[strategy.analyze_htf()]
+                assert bias[i] == expected, f"HTF bias differs at bar {i}: {bias[i]} != {expected}"
+                for direction, edges in [('BEARISH', sell_top), ('BULLISH', buy_bottom)]:
+                    signal = strategy.check_ltf_entry(direction)
+                    if signal is None:
+                        assert np.isnan(edges[i]), f"Unexpected {direction} zone at bar {i}"
+                    else:
+                        built = TurtleSoupStrategy.build_signal(signal['signal'], edges[i], signal['entry'], 3.0)
+                        assert built == signal, f"{direction} signal differs at bar {i}"
+    print("SUCCESS: Backtest signals match per-bar strategy rebuilds.")
+
+def test_optimizer():
+    print("Checking optimizer shared bars and search spaces...")
+    # Odd length, so the int32 and bool columns end off an 8-byte boundary
+    df = create_random_data(7, seed=3)
+    df['spread'] = df['spread'].astype(np.int32)
+    df['flag'] = df['close'] > df['open']
+    shared = SharedBars({'EURUSD': {'M5': df}})
+    try:
+        name, length, columns = shared.layout[('EURUSD', 'M5')]
+        assert length == len(df) and [column[0] for column in columns] == list(df.columns)
+        assert all(start % 8 == 0 for _, _, start in columns), f"Unaligned columns: {columns}"
+        data, blocks = SharedBars.attach(shared.layout)
+        try:
+            frame = data['EURUSD']['M5']
+            pd.testing.assert_frame_equal(frame, df)
+            for column in df.columns:
+                array = frame[column].to_numpy()
+                assert array.dtype == df[column].dtype and not array.flags.writeable, f"{column} not a read-only view"
+                assert np.shares_memory(array, np.ndarray(blocks[0].size, dtype=np.uint8, buffer=blocks[0].buf)), \
+                    f"{column} copied out of shared memory"
+            del frame, data, array
+        finally:
+            for block in blocks:
+                block.close()
+    finally:
+        shared.close()
+    assert shared.blocks == []
+
+    space = {'swing_period': [30, 50, 70], 'vol_len': [2, 4], 'trailing_enable': [True, False]}
+    assert len(list(grid(space))) == 12
+    points = list(random_search(space, 5, seed=1))
+    assert len(points) == 5 and len({tuple(point.values()) for point in points}) == 5
+    assert all(point in list(grid(space)) for point in points)
+    # More samples than combinations: every combination once
+    points = list(random_search(space, 50))
+    assert sorted(map(str, points)) == sorted(map(str, grid(space)))
+    assert list(random_search(space, 5, seed=1)) == list(random_search(space, 5, seed=1))
+
+    space = parse_space(['trailing_enable=true,0', 'box_width_atr=0.5,1', 'fvg_mitigation=Proximal'])
+    assert space['trailing_enable'] == [True, False] and space['box_width_atr'] == [0.5, 1.0]
+    assert space['fvg_mitigation'] == ['Proximal'] and space['swing_period'] == DEFAULT_SPACE['swing_period']
+    try:
+        parse_space(['swing_periods=10'])
+        raise AssertionError("Unknown parameter accepted")
+    except ValueError:
+        pass
+    print("SUCCESS: Optimizer shares aligned read-only bars and builds its search spaces.")
+
+def test_scheduler():
+    print("Checking when memoized analyses are reused...")
+    def frame(close, high=1.1050, low=1.0950, time='2023-01-02 10:00'):
+        # Two closed bars and the forming one
+        return pd.DataFrame({'time': pd.to_datetime(['2023-01-02 09:00', '2023-01-02 09:30', time]),
+                             'high': [1.2, 1.2, high], 'low': [1.0, 1.0, low], 'close': [1.1, 1.1, close]})
+
+    scheduler = BarScheduler()
+    key = ('EURUSD', 'H1', 'HTF')
+    assert scheduler.lookup(key, frame(1.1000)) is None, "Hit without a stored result"
+    scheduler.store(key, frame(1.1000), 'BEARISH', close_levels=[1.0990, np.nan, 1.1020])
+    assert scheduler.lookup(key, frame(1.1000)).result == 'BEARISH', "Miss on an unchanged forming bar"
+    # A new bar, or a forming bar whose high/low extended
+    assert scheduler.lookup(key, frame(1.1000, time='2023-01-02 11:00')) is None
+    assert scheduler.lookup(key, frame(1.1000, high=1.1051)) is None
+    assert scheduler.lookup(key, frame(1.1000, low=1.0949)) is None
+    # Close moves between the levels (the NaN level is ignored) or crosses / touches one
+    assert scheduler.lookup(key, frame(1.1015)) is not None and scheduler.lookup(key, frame(1.0991)) is not None
+    assert scheduler.lookup(key, frame(1.0989)) is None and scheduler.lookup(key, frame(1.1021)) is None
+    assert scheduler.lookup(key, frame(1.1020)) is None, "Close on a level not treated as a change"
+    assert scheduler.entries[key].close_levels == [1.0990, 1.1020]
+
+    # Signals priced off the close are only reused for the same close
+    signal_key = ('EURUSD', 'M5', 'LTF', 'BEARISH', 3.0)
+    scheduler.store(signal_key, frame(1.1000), {'signal': 'SELL'}, close_sensitive=True)
+    assert scheduler.lookup(signal_key, frame(1.1000)) is not None
+    assert scheduler.lookup(signal_key, frame(1.1000 + 1e-9)) is None
+    # Without levels and not close sensitive, any close within the bar's range is reused
+    scheduler.store(signal_key, frame(1.1000), None)
+    assert scheduler.lookup(signal_key, frame(1.0960)) is not None
+
+    hits, misses = scheduler.stats()['reused'], scheduler.stats()['computed']
+    assert (hits, misses) == (5, 8), f"Counted {hits} reused / {misses} computed"
+    scheduler.forget('EURUSD')
+    assert not scheduler.entries
+    print("SUCCESS: Memoized analyses are reused only while they cannot change.")
+
+def test_threaded_scan():
+    print("Checking orders of a threaded scan against the sequential scan...")
+    symbols = [f"SYM{k}" for k in range(12)]
+    frame = pd.DataFrame({'time': pd.to_datetime(['2023-01-02 10:00']), 'high': [1.2], 'low': [1.0], 'close': [1.1]})
+    md = SimpleNamespace(lock=threading.RLock(), resolve_symbol=lambda base: base,
+                         get_rates=lambda symbol, tf, num_bars: frame)
+
+    def analyze(base_symbol, method, symbol, tf, df, *args):
+        # Uneven analysis times so the threads finish out of symbol order
+        k = symbols.index(symbol)
+        time.sleep(0.002 * ((k * 7) % 5))
+        if method == 'htf':
+            return (None if k % 4 == 3 else 'BULLISH' if k % 2 else 'BEARISH'), []
+        if k % 3 == 0 or tf != Config.LTF_TIMEFRAMES[k % len(Config.LTF_TIMEFRAMES)]:
+            return None
+        side = 'BUY' if k % 2 else 'SELL'
+        return {'signal': side, 'entry': 1.1, 'sl': 1.1 + (-0.001 if k % 2 else 0.001), 'tp': 1.1, 'comment': ''}
+
+    placed, in_flight, senders = [], [], set()
+
+    def calculate_lot_size(symbol, **kwargs):
+        in_flight.append(symbol)
+        assert len(in_flight) == 1, "Orders sized concurrently"
+        time.sleep(0.001)
+        in_flight.remove(symbol)
+        return 0.01
+
+    def place_order(symbol, **kwargs):
+        in_flight.append(symbol)
+        assert len(in_flight) == 1, "Orders sent concurrently"
+        time.sleep(0.002)
+        placed.append((symbol, kwargs['timeframe'], kwargs['order_type']))
+        senders.add(threading.current_thread() is threading.main_thread())
+        in_flight.remove(symbol)
+
+    saved = scanner_module.Execution, scanner_module.RiskManager, Config.SYMBOLS
+    previous = broker.set_backend(ClockBackend(end=float('inf')))
+    results = []
+    try:
+        scanner_module.Execution = SimpleNamespace(place_order=place_order)
+        scanner_module.RiskManager = SimpleNamespace(calculate_lot_size=calculate_lot_size,
+                                                     confluence_tier=RiskManager.confluence_tier)
+        Config.SYMBOLS = symbols
+        for workers in (1, 4):
+            placed.clear()
+            senders.clear()
+            scanner = Scanner(md, SimpleNamespace(is_news_impact=lambda symbol: False), workers=workers,
+                              processes=0, tick_mode=False, panel=False)
+            scanner._analyze = analyze
+            submitted = []
+            submit = scanner.execution.submit
+            scanner.execution.submit = lambda order: (submitted.append(order['symbol']), submit(order))
+            scanner.scan(10000.0)
+            # scan() returns once the execution thread has handled every order
+            assert [order[0] for order in placed] == submitted, "Orders not placed in submission order"
+            assert senders == {workers == 1}, "Orders of a threaded scan must go through the execution thread"
+            results.append(list(placed))
+            scanner.shutdown()
+    finally:
+        scanner_module.Execution, scanner_module.RiskManager, Config.SYMBOLS = saved
+        broker.set_backend(previous)
+    sequential, threaded = results
+    ordered = [order[0] for order in sequential]
+    assert len(ordered) == 6 and ordered == sorted(ordered, key=symbols.index), f"Sequential orders {ordered}"
+    # Threads hand orders over as symbols finish, the orders themselves are those of the sequential scan
+    assert sorted(threaded) == sorted(sequential), f"{threaded} != {sequential}"
+    print("SUCCESS: Threaded scans place the sequential scan's orders one at a time.")
+
+def test_tick_watcher():
+    print("Checking tick-driven FVG entries...")
+    ticks = []
+    md = SimpleNamespace(get_tick=lambda symbol: ticks[-1])
+    orders = []
+    watcher = TickWatcher(md, SimpleNamespace(submit=orders.append), interval=0.25)
+    zone = (1.0300, 1.0200, 1.0200, pd.Timestamp('2023-01-01 00:48'))
+
+    def quote(bid):
+        ticks.append(SimpleNamespace(time_msc=len(ticks), bid=bid, ask=bid + 0.0001))
+        return watcher.poll()
+
+    watcher.arm('EURUSD', 'EURUSD', 'BEARISH', 2, 5.0, 0.06, {'M1': [zone]})
+    assert quote(1.0150) == 0 and not orders, "Entry below the zone"
+    assert quote(1.0250) == 1, "No entry on touch"
+    assert orders[0]['signal'] == TurtleSoupStrategy.build_signal('SELL', 1.0300, 1.0250, 5.0)
+    assert quote(1.0260) == 0 and 'EURUSD' not in watcher.armed, "Symbol still armed after entry"
+    # The traded zone is not armed again by the next scan
+    watcher.arm('EURUSD', 'EURUSD', 'BEARISH', 2, 5.0, 0.06, {'M1': [zone]})
+    assert 'EURUSD' not in watcher.armed, "Traded zone armed again"
+
+    # A quote through the mitigation level (bullish Distal = bottom) drops the zone
+    watcher.arm('GBPUSD', 'GBPUSD', 'BULLISH', 1, 3.0, 0.03, {'M5': [(1.2600, 1.2500, 1.2500, None)]})
+    assert quote(1.2450) == 0 and 'GBPUSD' not in watcher.armed, "Mitigated zone still armed"
+
+    # No SELL while the forming bar would create a bearish FVG, like check_ltf_entry
+    df = create_synthetic_data().iloc[:49].copy() # bar 48 (high 1.0200 < low of bar 46, 1.0300) is forming
+    strategy = TurtleSoupStrategy(df.copy(), swing_period=5)
+    assert strategy.df['bearish_fvg'].iloc[-1] and strategy.check_ltf_entry('BEARISH') is None
+    bar = TickWatcher.forming_bar(df, 'H1')
+    assert bar['high'] == 1.0200 and bar['lows'] == [1.0300, 1.0200]
+    opened = int(df['time'].iloc[-1].timestamp()) * 1000
+    orders.clear()
+    watcher.arm('USDCHF', 'USDCHF', 'BEARISH', 1, 3.0, 0.03, {'H1': [(1.0250, 1.0150, 1.0250, None)]}, {'H1': bar})
+    assert quote(1.0210) == 0 and not orders, "SELL on the bar that creates a bearish FVG"
+    # A new bar: two bars back is now bar 47 (low 1.0200), so a high of 1.0210 no longer makes a gap
+    ticks.append(SimpleNamespace(time_msc=opened + 3600 * 1000, bid=1.0210, ask=1.0211))
+    assert watcher.poll() == 1 and orders[0]['signal']['signal'] == 'SELL', "No SELL after the gap bar closed"
+    assert watcher.stats()['armed'] == 0
+    # Without bar state (e.g. an older caller) the guard is off
+    watcher.arm('AUDUSD', 'AUDUSD', 'BEARISH', 1, 3.0, 0.03, {'H1': [(1.0250, 1.0150, 1.0250, None)]})
+    assert quote(1.0220) == 1
+    print("SUCCESS: Tick watcher enters on touch and drops mitigated zones.")
+
+class ClockBackend:
+    # Broker backend with its own clock and an empty account, ends after `end` seconds
+    def __init__(self, end):
+        self.clock = 0.0
+        self.end = end
+
+    def now(self):
+        return datetime(1970, 1, 1) + timedelta(seconds=self.clock)
+
+    def sleep(self, seconds):
+        self.clock += seconds
+        if self.clock >= self.end:
+            raise KeyboardInterrupt()
+
+    def account_info(self):
+        return SimpleNamespace(balance=1000.0, equity=1000.0)
+
+    def positions_get(self, *args, **kwargs):
+        return ()
+
+class PositionsBackend(ClockBackend):
+    # Open positions and the SLTP requests sent for them
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    TRADE_ACTION_SLTP = 6
+
+    def __init__(self, positions):
+        super().__init__(end=float('inf'))
+        self.positions = positions
+        self.requests = []
+
+    def positions_get(self, *args, **kwargs):
+        return tuple(SimpleNamespace(**p) for p in self.positions)
+
+    def order_send(self, request):
+        self.requests.append(request)
+
+def test_trade_manager():
+    print("Checking the batched trailing stop engine...")
+    rng = np.random.default_rng(3)
+    n = 2000
+    is_buy = rng.random(n) < 0.5
+    entry = 1.1 + rng.normal(0, 0.01, n)
+    risk = np.abs(rng.normal(0.002, 0.001, n)) + 1e-5
+    current = entry + rng.normal(0, 0.01, n)
+    sl = np.where(rng.random(n) < 0.1, 0.0, current + rng.normal(0, 0.005, n))
+    current_r, targets = TradeManager.trail_targets(is_buy, entry, current, sl, risk)
+    for k in range(n):
+        r, new_sl = TradeManager.trailing_stop(is_buy[k], entry[k], current[k], sl[k], risk[k])
+        assert r == current_r[k] and (new_sl is None and np.isnan(targets[k]) or new_sl == targets[k]), \
+            f"Trailing rule differs for position {k}"
+
+    position = dict(ticket=1, magic=Config.MAGIC_NUMBER, type=0, price_open=1.1000, price_current=1.1000,
+                    sl=1.0990, tp=1.1050, comment="Turtle Soup M1 Score:1")
+    backend = PositionsBackend([position])
+    previous = broker.set_backend(backend)
+    journal_enabled, Config.JOURNAL_ENABLE = Config.JOURNAL_ENABLE, False
+    try:
+        manager = TradeManager()
+        manager.started = True # Opened while running: the entry SL gives the risk
+        manager.manage_positions()
+        assert manager.tickets[1]['initial_risk'] == abs(1.1000 - 1.0990)
+        position['price_current'] = 1.1040 # 4R: trail to 2R behind
+        manager.manage_positions()
+        manager.manage_positions() # Unchanged position, no new request
+        assert [r['sl'] for r in backend.requests] == [1.1040 - 2.0 * abs(1.1000 - 1.0990)], backend.requests
+        position['sl'] = backend.requests[-1]['sl']
+        position['price_current'] = 1.1050 # Enough of a move, but too soon after the last request
+        backend.clock += 1
+        manager.manage_positions()
+        assert len(backend.requests) == 1, "SL request not rate limited"
+        backend.clock += Config.TRAILING_MIN_INTERVAL
+        manager.manage_positions()
+        assert len(backend.requests) == 2, "Throttled SL update never sent"
+        position['sl'] = backend.requests[-1]['sl']
+        position['price_current'] = 1.10505 # Below the minimum step
+        backend.clock += Config.TRAILING_MIN_INTERVAL
+        manager.manage_positions()
+        assert len(backend.requests) == 2, "SL moved by less than the minimum step"
+    finally:
+        broker.set_backend(previous)
+        Config.JOURNAL_ENABLE = journal_enabled
+    print("SUCCESS: Trailing engine matches the per-position rule and limits requests.")
+
+def random_rates(n, seed=0):
+    # M1 rates array of create_random_data
+    df = create_random_data(n, seed=seed)
+    rates = np.zeros(n, dtype=RATES_DTYPE)
+    rates['time'] = df['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    for name in RATES_DTYPE.names[1:]:
+        rates[name] = df[name].to_numpy()
+    return rates
+
+def test_bar_store():
+    print("Checking the on-disk bar store...")
+    rates = random_rates(300)
+    times = rates['time']
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(tmp)
+        # Appends skip bars already stored
+        assert store.append('EURUSD', 'M1', rates[:100]) == 100
+        assert store.append('EURUSD', 'M1', rates[50:150]) == 50
+        assert store.append('EURUSD', 'M1', rates[100:150]) == 0
+        # A torn record (interrupted write) is ignored on read and dropped by the next append
+        with open(store.path('EURUSD', 'M1'), 'ab') as f:
+            f.write(rates[150:151].tobytes()[:20])
+        assert len(store.records('EURUSD', 'M1')) == 150
+        assert store.append('EURUSD', 'M1', rates[150:160]) == 10
+        assert np.array_equal(store.records('EURUSD', 'M1'), rates[:160])
+        assert os.path.getsize(store.path('EURUSD', 'M1')) == 64 + 160 * RATES_DTYPE.itemsize
+
+        # tail/slice are read-only views of the file
+        records = store.records('EURUSD', 'M1')
+        tail = store.tail('EURUSD', 'M1', 20)
+        window = store.slice('EURUSD', 'M1', int(times[10]), pd.Timestamp(times[20], unit='s'))
+        assert np.array_equal(tail, rates[140:160]) and np.array_equal(window, rates[10:20])
+        for view in (tail, window):
+            assert isinstance(view, np.memmap) and not view.flags.writeable and np.shares_memory(view, records)
+        assert len(store.slice('NONE', 'M1')) == 0 and store.records('NONE', 'M1') is None
+
+        # A hole is found and merge fills it by replacing the file in one step
+        store.append('GBPUSD', 'M1', rates[:50])
+        store.append('GBPUSD', 'M1', rates[80:120])
+        assert store.gaps('GBPUSD', 'M1') == [(int(times[49]), int(times[80]))]
+        assert store.gaps('GBPUSD', 'M1', min_missing=31) == []
+        before = store.records('GBPUSD', 'M1')
+        assert store.merge('GBPUSD', 'M1', rates[40:90]) == 30
+        assert np.array_equal(store.records('GBPUSD', 'M1'), rates[:120]) and store.gaps('GBPUSD', 'M1') == []
+        # Readers holding the old map keep a consistent file, no temporary file is left
+        assert len(before) == 90 and np.array_equal(before, np.concatenate([rates[:50], rates[80:120]]))
+        assert sorted(os.listdir(tmp)) == ['EURUSD_M1.bars', 'GBPUSD_M1.bars']
+        assert store.merge('GBPUSD', 'M1', rates[:10]) == 0
+
+        # A cold start seeds from the store only if the delta starts at the last stored bar
+        saved = Config.BAR_STORE_ENABLE
+        previous = broker.get_backend()
+        delta = []
+        try:
+            Config.BAR_STORE_ENABLE = False
+            md = MarketData()
+            md.bar_store = store
+            broker.set_backend(SimpleNamespace(copy_rates_range=lambda *args: delta[-1]))
+            delta.append(rates[161:170]) # bar 160 unknown
+            assert md._load_stored('EURUSD', 'M1', 1, 100) is None
+            delta.append(rates[0:0])
+            assert md._load_stored('EURUSD', 'M1', 1, 100) is None
+            assert md._load_stored('EURUSD', 'M1', 1, 500) is None, "Seeded from too few stored bars"
+            delta.append(rates[159:170])
+            buffer = md._load_stored('EURUSD', 'M1', 1, 100)
+            assert buffer is not None and buffer.last_time() == times[169]
+            # The closed bars of the delta are written through, the forming one is not
+            assert store.last_time('EURUSD', 'M1') == times[168]
+        finally:
+            broker.set_backend(previous)
+            Config.BAR_STORE_ENABLE = saved
+    print("SUCCESS: Bar store appends, slices, fills gaps and seeds cold starts.")
+
+def test_bar_cache():
+    print("Checking cached rates against fresh downloads...")
+    m1 = random_rates(9000, seed=5)
+    # Six hours without bars (market closed)
+    gap_start, gap_end = int(m1['time'][7000]), int(m1['time'][7360])
+    m1 = np.concatenate([m1[:7000], m1[7360:]])
+    timeframes = ['M1', 'M5', 'M15', 'H1', 'H4']
+    num_bars = 20
+    bars = {'EURUSD': {tf: aggregate(m1, Config.TIMEFRAME_SECONDS[tf]) for tf in timeframes}}
+    start = int(m1['time'][6000]) + 17
+    record = RATES_DTYPE.itemsize
+    saved = Config.BAR_CACHE_ENABLE, Config.BAR_STORE_ENABLE, Config.RESAMPLE_ENABLE
+    previous = broker.get_backend()
+    try:
+        Config.BAR_CACHE_ENABLE = True
+        Config.BAR_STORE_ENABLE = False
+        for resample in (False, True):
+            Config.RESAMPLE_ENABLE = resample
+            sim = SimulatedBroker(bars, start=start)
+            broker.set_backend(sim)
+            md = MarketData()
+            # Same bar, an M1 bar closing, jumps past the buffer capacity (2 x num_bars M1 bars),
+            # into the gap and out of it, then random steps
+            steps = [0, 10, 50, 25 * 60, 50 * 60]
+            rng = np.random.default_rng(6)
+            compacted = False
+            previous_end = 0
+            for k in range(300):
+                if k < len(steps):
+                    step = steps[k]
+                elif k == len(steps):
+                    step = gap_start + 3 * 3600 - int(sim.clock)
+                elif k == len(steps) + 1:
+                    step = 4 * 3600
+                else:
+                    step = int(rng.integers(1, 600))
+                sim.clock += step
+                stats = md.cache_stats()
+                for tf in timeframes:
+                    frame = md.get_rates('EURUSD', tf, num_bars=num_bars)
+                    expected = pd.DataFrame(rate_columns(sim.copy_rates_from_pos('EURUSD', tf, 0, num_bars)))
+                    assert frame.equals(expected), f"{tf} differs from the terminal at {sim.now()} (resample={resample})"
+                    assert not frame['close'].to_numpy().flags.writeable
+                buffer = md.bar_cache.buffers[('EURUSD', 'M1')]
+                compacted |= buffer.end < previous_end
+                previous_end = buffer.end
+                if not resample and k in (0, 1, 2):
+                    # A full download per timeframe, then one delta fetch each from the forming bar
+                    delta = md.cache_stats()
+                    fetched = (delta['bytes_fetched'] - stats['bytes_fetched']) // record
+                    assert (delta['hits'] - stats['hits'], delta['misses'] - stats['misses'], fetched) == \
+                        [(0, 5, 5 * num_bars), (5, 0, 5), (5, 0, 6)][k], f"Step {k}: {delta}"
+            assert sim.clock > gap_end and compacted, "Gap or compaction not reached"
+            stats = md.cache_stats()
+            assert (resample or stats['misses'] == 5) and stats['hits'] > 0
+            assert stats['cached_bytes'] > 0 and stats['cached_bars'] >= 5 * num_bars
+    finally:
+        broker.set_backend(previous)
+        Config.BAR_CACHE_ENABLE, Config.BAR_STORE_ENABLE, Config.RESAMPLE_ENABLE = saved
+    print("SUCCESS: Cached rates match fresh downloads across new bars, compactions and gaps.")
+
+def test_resample():
+    print("Checking higher timeframes built from M1 bars...")
+    m1 = random_rates(3000)
+    # 2% of the bars missing, like a thin market
+    m1 = m1[np.random.default_rng(1).random(len(m1)) > 0.02]
+    frame = pd.DataFrame(m1).set_index(pd.to_datetime(m1['time'], unit='s'))
+    for tf in ('M5', 'H1', 'H4'):
+        expected = frame.resample(f"{Config.TIMEFRAME_SECONDS[tf]}s", origin='epoch').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'tick_volume': 'sum'}).dropna()
+        bars = aggregate(m1, Config.TIMEFRAME_SECONDS[tf])
+        assert np.array_equal(pd.to_datetime(bars['time'], unit='s'), expected.index)
+        for name in ('open', 'high', 'low', 'close', 'tick_volume'):
+            assert np.array_equal(bars[name], expected[name].to_numpy()), f"{tf} {name} differs"
+    shifted = aggregate(m1, 3600, offset=1800)
+    assert (shifted['time'] % 3600 == 1800).all()
+
+    # The bot's frames are the same with and without resampling, with one fetch per step
+    m1 = random_rates(20000)
+    timeframes = Config.HTF_TIMEFRAMES + Config.LTF_TIMEFRAMES
+    bars = {'EURUSD': {tf: aggregate(m1, Config.TIMEFRAME_SECONDS[tf]) for tf in timeframes}}
+    start = int(m1['time'][15000]) + 17
+    saved = Config.BAR_STORE_ENABLE, Config.RESAMPLE_ENABLE
+    sims = [SimulatedBroker(bars, start=start), SimulatedBroker(bars, start=start)]
+    previous = broker.get_backend()
+    try:
+        Config.BAR_STORE_ENABLE = False
+        mds = []
+        for resample in (False, True):
+            Config.RESAMPLE_ENABLE = resample
+            mds.append(MarketData())
+        steps = np.random.default_rng(2).integers(1, 600, 40)
+        for step in [0] + list(steps):
+            frames = []
+            for sim, md in zip(sims, mds):
+                broker.set_backend(sim)
+                sim.clock += step
+                frames.append([md.get_rates('EURUSD', tf, num_bars=50) for tf in timeframes])
+            for tf, plain, resampled in zip(timeframes, *frames):
+                assert plain.equals(resampled), f"{tf} differs at {sims[0].now()}"
+        assert mds[1].cache_stats()['hits'] == len(steps), "More than one fetch per step"
+        assert mds[1].cache_stats()['folds'] > 0
+    finally:
+        broker.set_backend(previous)
+        Config.BAR_STORE_ENABLE, Config.RESAMPLE_ENABLE = saved
+    print("SUCCESS: Resampled timeframes match the broker's bars.")
+
+def test_simulated_broker():
+    print("Checking simulated fills, stops and SL/TP modifies...")
+    t0 = 1700000000 // 60 * 60
+    rates = np.zeros(20, dtype=RATES_DTYPE)
+    rates['time'] = t0 + 60 * np.arange(20)
+    rates['open'] = rates['close'] = 1.1000
+    rates['high'] = 1.1005
+    rates['low'] = 1.0995
+    rates['spread'] = 10 # 1 pip with 5-digit pricing
+    rates['high'][8] = 1.1035 # crosses the buy TP, not the moved sell SL
+    rates['high'][12] = 1.1045 # crosses the moved sell SL
+    sim = SimulatedBroker({'EURUSD': {'M1': rates}}, start=t0 + 5 * 60 + 1, slippage_points=20, seed=4)
+    point = FX_SPEC.point
+    bid, ask = 1.1000, 1.1001
+
+    def order(order_type, **fields):
+        request = {'action': sim.TRADE_ACTION_DEAL, 'symbol': 'EURUSD', 'volume': 0.1, 'type': order_type}
+        request.update(fields)
+        return sim.order_send(request)
+
+    # Market orders fill up to slippage_points away from the quote, against the trader
+    buy = order(sim.ORDER_TYPE_BUY, sl=1.0990, tp=1.1030)
+    assert buy.retcode == sim.TRADE_RETCODE_DONE and ask < buy.price <= ask + 20 * point, buy
+    sell = order(sim.ORDER_TYPE_SELL, sl=1.1020, tp=1.0900)
+    assert sell.retcode == sim.TRADE_RETCODE_DONE and bid - 20 * point <= sell.price < bid, sell
+    assert order(sim.ORDER_TYPE_BUY, price=ask, deviation=0).retcode == sim.TRADE_RETCODE_REQUOTE
+    assert order(sim.ORDER_TYPE_BUY, volume=0.015).retcode == sim.TRADE_RETCODE_INVALID_VOLUME
+    assert order(sim.ORDER_TYPE_SELL, sl=1.0990).retcode == sim.TRADE_RETCODE_INVALID_STOPS
+    assert len(sim.positions) == 2
+
+    # SLTP modify: stops on the wrong side are refused, valid ones replace both levels
+    modify = {'action': sim.TRADE_ACTION_SLTP, 'position': sell.order, 'sl': 1.0990, 'tp': 0.0}
+    assert sim.order_send(modify).retcode == sim.TRADE_RETCODE_INVALID_STOPS
+    modify['sl'] = 1.1040
+    assert sim.order_send(modify).retcode == sim.TRADE_RETCODE_DONE
+    assert sim.positions[sell.order]['sl'] == 1.1040 and sim.positions[sell.order]['tp'] == 0.0
+    assert sim.order_send(dict(modify, position=99)).retcode == sim.TRADE_RETCODE_INVALID
+
+    # Bar 8 closes: the buy hits its TP, the sell stays open (its old SL would have been hit)
+    sim.sleep(4 * 60)
+    assert list(sim.positions) == [sell.order]
+    deal = sim.deals[0]
+    assert deal['reason'] == 'TP' and deal['price_close'] == 1.1030 and deal['close_time'] == t0 + 9 * 60 + 1
+    assert abs(deal['profit'] - (1.1030 - buy.price) / point * 0.1) < 1e-9
+
+    # Bar 12 closes: the sell is stopped out at the moved SL, checked against the ask
+    sim.sleep(4 * 60)
+    assert sim.positions == {} and sim.deals[1]['reason'] == 'SL' and sim.deals[1]['price_close'] == 1.1040
+    assert abs(sim.balance - 10000.0 - sum(d['profit'] for d in sim.deals)) < 1e-9
+    assert sim.summary()['closed_trades'] == 2 and sim.calls == 8
+    print("SUCCESS: Simulated broker fills with slippage, closes at SL/TP and applies modifies.")
+
+def test_journal():
+    print("Checking the trade journal...")
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = TradeJournal(os.path.join(tmp, 'journal.sqlite3'))
+        for k in range(100):
+            journal.record_order(ticket=k, symbol='EURUSD', side='BUY' if k % 2 else 'SELL', signal_time=1000.0 + k,
+                                 request_time=1000.5 + k, fill_time=1001.0 + k, requested_price=1.1,
+                                 filled_price=1.1 + (0.0001 if k % 2 else -0.0001), sl=1.09, initial_risk=0.01 + k)
+        journal.record_order(ticket=None, symbol='EURUSD', side='BUY', request_time=1.0, retcode=10004)
+        journal.record_sl_change(ticket=7, time=2000.0, old_sl=1.09, new_sl=1.095, price=1.12, r_multiple=3.6)
+        latency = journal.latency_percentiles()
+        assert latency['orders'] == 100 and np.isclose(latency['signal_to_fill'][50], 1.0) \
+            and np.isclose(latency['request_to_fill'][99], 0.5), latency
+        slippage = journal.slippage_percentiles()
+        assert np.allclose(list(slippage['slippage'].values()), 0.0001), slippage
+        assert journal.initial_risk(7) == 0.01 + 7 and journal.initial_risk(1000) is None
+
+        # Positions open at start-up take their initial risk from the journal
+        backend = PositionsBackend([dict(ticket=7, magic=Config.MAGIC_NUMBER, type=0, price_open=1.1, price_current=1.1,
+                                         sl=1.099, tp=1.13, comment="Turtle Soup M1 Score:1")])
+        previous = broker.set_backend(backend)
+        previous_journal = set_journal(journal)
+        try:
+            manager = TradeManager()
+            manager.manage_positions()
+            assert manager.tickets[7]['initial_risk'] == 0.01 + 7
+        finally:
+            broker.set_backend(previous)
+            set_journal(previous_journal)
+        journal.close()
+    print("SUCCESS: Journal records orders and reports latency / slippage.")
+
+class SymbolsBackend(ClockBackend):
+    # Broker whose symbols carry a ".m" suffix, counting terminal calls
+    def __init__(self):
+        super().__init__(end=float('inf'))
+        self.calls = {}
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def symbol_select(self, symbol, enable=True):
+        self._count('symbol_select')
+        return symbol in ('EURUSD.m', 'XAUUSD.m')
+
+    def symbols_get(self):
+        self._count('symbols_get')
+        return (SimpleNamespace(name='EURUSD.m'), SimpleNamespace(name='XAUUSD.m'))
+
+    def symbol_info(self, symbol):
+        self._count('symbol_info')
+        return SimpleNamespace(name=symbol, visible=True, point=0.00001, trade_tick_value=1.0,
+                               volume_min=0.01, volume_max=100.0, volume_step=0.01)
+
+    def symbol_info_tick(self, symbol):
+        self._count('symbol_info_tick')
+        return SimpleNamespace(time_msc=int(self.clock * 1000), bid=1.1, ask=1.1001)
+
+def test_symbol_registry():
+    print("Checking the symbol registry caches...")
+    backend = SymbolsBackend()
+    previous = broker.set_backend(backend)
+    try:
+        registry = SymbolRegistry()
+        assert registry.resolve_all(['EURUSD', 'XAUUSD', 'GBPUSD']) == \
+            {'EURUSD': 'EURUSD.m', 'XAUUSD': 'XAUUSD.m', 'GBPUSD': None}
+        calls = dict(backend.calls)
+        assert calls['symbols_get'] == 1, "Symbol list fetched more than once"
+        for _ in range(10):
+            assert registry.resolve('EURUSD') == 'EURUSD.m' and registry.resolve('GBPUSD') is None
+        assert backend.calls == calls, "Resolved names looked up again"
+        backend.clock += Config.SYMBOL_RETRY_SECONDS
+        registry.resolve('GBPUSD')
+        assert backend.calls['symbol_select'] > calls['symbol_select'], "Missing symbol never retried"
+
+        for _ in range(10):
+            registry.spec('EURUSD.m')
+            registry.tick('EURUSD.m')
+        assert backend.calls['symbol_info'] == 1 and backend.calls['symbol_info_tick'] == 1
+        backend.clock += Config.TICK_CACHE_TTL
+        assert registry.tick('EURUSD.m').time_msc == int(backend.clock * 1000), "Stale quote served"
+        backend.clock += Config.SYMBOL_SPEC_TTL
+        registry.spec('EURUSD.m')
+        assert backend.calls['symbol_info'] == 2, "Contract spec never refreshed"
+    finally:
+        broker.set_backend(previous)
+    print("SUCCESS: Symbol names, specs and quotes are served from the registry.")
+
+def test_metrics():
+    print("Checking stage timing histograms...")
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.add(float(ms))
+    assert histogram.count == 100 and histogram.max == 100.0
+    # Percentiles are bucket upper bounds: at most 2x the exact value
+    for p in (50, 90, 99):
+        assert p <= histogram.percentile(p) <= 2 * p, (p, histogram.percentile(p))
+
+    metrics = Metrics(enabled=True, profile_mode='cprofile')
+    previous = set_metrics(metrics)
+    try:
+        df = create_random_data(600)
+        metrics.run(Analyzer().htf, 'EURUSD', 'H1', df)
+        TurtleSoupStrategy(df.copy())
+        snapshot = json.loads(json.dumps(metrics.snapshot()))
+        series = {(row['stage'], row['symbol'], row['timeframe']) for row in snapshot['series']}
+        assert ('IncrementalIndicators.sync', 'EURUSD', 'H1') in series
+        assert ('TurtleSoupStrategy.analyze_htf', 'EURUSD', 'H1') in series
+        for stage in ('Indicators.find_fvg', 'Indicators.identify_mss_swings', 'SRStrategy.process_data'):
+            assert (stage, None, None) in series, f"{stage} not timed"
+
+        server = metrics.serve(0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/") as response:
+            assert 'TurtleSoupStrategy.analyze_htf' in json.load(response)['stages']
+        with tempfile.TemporaryDirectory() as tmp:
+            profile = metrics.profiler.dump(os.path.join(tmp, 'profile'))
+            assert 'scanner.py' in profile, "Profiled stage missing from the profile report"
+            assert os.path.getsize(os.path.join(tmp, 'profile.pstats')) > 0
+        metrics.close()
+    finally:
+        set_metrics(previous)
+
+    disabled = Metrics(enabled=False, profile_mode='')
+    with disabled.timer('stage'), disabled.context('EURUSD'):
+        pass
+    assert not disabled.histograms, "Disabled metrics recorded a stage"
+    print("SUCCESS: Stages are timed per symbol/timeframe and served as JSON.")
+
+def test_orchestrator():
+    print("Checking task cadences of the orchestrator in simulated time...")
+    backend = ClockBackend(end=600)
+    previous = broker.set_backend(backend)
+    # No metrics task, which would write Config.METRICS_PATH into the working tree
+    previous_metrics = set_metrics(Metrics(enabled=False))
+    try:
+        scans = []
+        trails = []
+        scanner = SimpleNamespace(watcher=None, scan=lambda balance: scans.append(backend.clock),
+                                  stats=lambda: {'reused': 0, 'computed': 0})
+        md = SimpleNamespace(lock=threading.RLock(), cache_stats=lambda: {'hits': 0, 'misses': 0, 'bytes_fetched': 0})
+        orchestrator = Orchestrator(md, scanner, SimpleNamespace(refresh_calendar=lambda: None))
+        orchestrator.manage_positions = lambda: trails.append(backend.clock)
+        asyncio.run(orchestrator.run())
+    finally:
+        broker.set_backend(previous)
+        set_metrics(previous_metrics)
+    bar = min(Config.TIMEFRAME_SECONDS[tf] for tf in Config.LTF_TIMEFRAMES)
+    assert scans[1:] == [k * bar + Config.SCAN_DELAY for k in range(1, len(scans))], f"Scans off the bar close: {scans}"
+    assert len(trails) >= 600 // Config.TRAILING_INTERVAL, f"Only {len(trails)} trailing updates"
+    print("SUCCESS: Orchestrator tasks keep their cadences.")
+
 def test_strategy():
     print("Creating synthetic data...")
     df = create_synthetic_data()
@@ -60,7 +1228,7 @@ def test_strategy():
     strategy = TurtleSoupStrategy(df)
     
     print("Checking for Signal at index 55 (Retrace into FVG)...")
-    signal = strategy.check_signal(current_index=55)
+    signal = strategy.check_ltf_entry('BEARISH', current_index=55)
     
     if signal:
         print("SUCCESS: Signal Detected!")
@@ -71,4 +1239,28 @@ def test_strategy():
         print(df.iloc[55])
 
 if __name__ == "__main__":
+    test_vectorized_indicators()
+    test_vectorized_sr()
+    test_rolling_kernels()
+    test_jit_kernels()
+    test_incremental_indicators()
+    test_compact_bars()
+    test_pivot_tracker()
+    test_panel()
+    test_sweep_index()
+    test_fvg_zones()
+    test_backtest_signals()
+    test_optimizer()
+    test_scheduler()
+    test_threaded_scan()
+    test_tick_watcher()
+    test_orchestrator()
+    test_symbol_registry()
+    test_metrics()
+    test_trade_manager()
+    test_simulated_broker()
+    test_journal()
+    test_bar_store()
+    test_bar_cache()
+    test_resample()
     test_strategy()